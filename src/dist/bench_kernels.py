@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import argparse
+import time
+
+import numpy as np
+
+import kernels
+from compute_portfolio import backtest_arrays, position_events, simulate_portfolio, simulate_portfolio_loop
+from super_smoother import super_smoother_coefficients, two_pole_super_smoother_loop
+
+# ----------------------------------------------------------------------------
+# Speedup of every compiled kernel (see kernels.py) over its Python
+# reference, and whether their results are identical.
+#
+#   python3 bench_kernels.py --sizes 100000 1000000
+#
+# The smoother runs on a random walk around 100, the portfolio on random
+# trades of every label. 'portfolio' is simulate_portfolio (one scenario of
+# compute_portfolio.backtest, including the conversion of the trade tuples
+# to arrays and of the closed trades back to dicts) against the state
+# machine of simulate_portfolio_loop. 'backtest' runs --scenarios margins
+# from 1 to --margin through the batched kernel against its numpy version
+# (compute_portfolio.backtest_arrays); both must also match
+# simulate_portfolio_loop in every scenario. The first kernel call, which compiles
+# (or loads the compiled kernel from __pycache__), is not timed.
+# ----------------------------------------------------------------------------
+
+parser = argparse.ArgumentParser(description="Benchmark the compiled kernels against their Python references.")
+parser.add_argument("--sizes", type=int, nargs="+", default=[10**5, 10**6], help="Bars / trades per run.")
+parser.add_argument("--period", type=float, default=20, help="Smoother period, like filt_per (default 20).")
+parser.add_argument("--margin", type=float, default=20, help="Portfolio margin, like Margin (default 20).")
+parser.add_argument("--scenarios", type=int, default=20, help="Backtest scenarios (default 20).")
+parser.add_argument("--repeat", type=int, default=3, help="Best of N runs (default 3).")
+args = parser.parse_args()
+
+
+def best_time(call, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def random_trades(rng, size):
+    labels = ["upstart", "downstart", "upend", "downend", "tempend", "utempstart"]
+    prices = 100 + np.cumsum(rng.normal(0, 0.05, size))
+    picks = rng.integers(len(labels), size=size)
+    return [(i, "buy", price, labels[pick]) for i, (price, pick) in enumerate(zip(prices.tolist(), picks.tolist()))]
+
+
+if __name__ == "__main__":
+    if not kernels.JIT:
+        raise SystemExit("numba is not installed: the kernels run as their Python references.")
+
+    rng = np.random.default_rng(0)
+    c1, c2, c3 = super_smoother_coefficients(args.period)
+    kernels.super_smoother_kernel(np.ones(4), c1, c2, c3)
+    margins = np.linspace(1, args.margin, args.scenarios)
+    one_x = margins == 1
+    rates = np.full(args.scenarios, 0.002)
+    capitals = np.full(args.scenarios, 1000.0)
+    warmup = position_events(random_trades(rng, 10))
+    kernels.backtest_kernel(warmup["side"], warmup["open"], warmup["gain"], margins, rates, capitals,
+                            len(warmup["trade"]))
+
+    print(f"{'kernel':<16} {'size':>10} {'python s':>9} {'jit s':>8} {'speedup':>8} {'identical':>9}")
+    for size in args.sizes:
+        prices = 100 + np.cumsum(rng.normal(0, 0.05, size))
+        loop_s, loop = best_time(lambda: two_pole_super_smoother_loop(prices, args.period), args.repeat)
+        jit_s, fast = best_time(lambda: kernels.super_smoother_kernel(prices, c1, c2, c3), args.repeat)
+        print(f"{'super_smoother':<16} {size:>10} {loop_s:>9.4f} {jit_s:>8.4f} {loop_s / jit_s:>7.0f}x "
+              f"{str(np.array_equal(loop, fast)):>9}")
+
+        trades = random_trades(rng, size)
+        loop_s, loop = best_time(lambda: simulate_portfolio_loop(trades, args.margin, 0.002, 1000.0), args.repeat)
+        jit_s, fast = best_time(
+            lambda: simulate_portfolio(trades, margin=args.margin, fee=0.002, margin_fee=0.002, capital=1000.0),
+            args.repeat)
+        print(f"{'portfolio':<16} {size:>10} {loop_s:>9.4f} {jit_s:>8.4f} {loop_s / jit_s:>7.1f}x "
+              f"{str(loop == fast):>9}")
+
+        events = position_events(trades)
+        count = len(events["trade"])
+        arrays_s, batched = best_time(lambda: backtest_arrays(events, one_x, margins, rates, capitals, count), args.repeat)
+        kernel_s, result = best_time(lambda: kernels.backtest_kernel(
+            events["side"], events["open"], events["gain"], margins, rates, capitals, count), args.repeat)
+        reference = np.array([simulate_portfolio_loop(trades, margin, 0.002, 1000.0)[0] for margin in margins])
+        identical = all(np.array_equal(a, b) for a, b in zip(batched, result)) and np.array_equal(reference, result[0])
+        print(f"{'backtest':<16} {size:>10} {arrays_s:>9.4f} {kernel_s:>8.4f} {arrays_s / kernel_s:>7.0f}x "
+              f"{str(identical):>9}")
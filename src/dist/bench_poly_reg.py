@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import argparse
+import time
+
+import numpy as np
+
+from polyreg_engine import rolling_poly_reg, rolling_poly_reg_loop
+
+# ----------------------------------------------------------------------------
+# Throughput of the rolling polynomial regression (LSMA).
+#
+#   python3 bench_poly_reg.py --per 10 --order 2
+#
+# The per-bar LU loop is only timed up to --loop-max bars; for those sizes
+# the largest relative deviation between the two is printed as well.
+# ----------------------------------------------------------------------------
+
+parser = argparse.ArgumentParser(description="Benchmark the rolling polynomial regression.")
+parser.add_argument("--per", type=int, default=10, help="Regression sample length (default 10).")
+parser.add_argument("--order", type=int, default=2, help="Polynomial order (default 2).")
+parser.add_argument("--calc-offs", type=int, default=0, help="Regression offset (default 0).")
+parser.add_argument("--equ-from", type=int, default=0, help="Forecast from X bars ago (default 0).")
+parser.add_argument("--sizes", type=int, nargs="+", default=[10**4, 10**5, 10**6, 10**7], help="Series lengths in bars.")
+parser.add_argument("--loop-max", type=int, default=10**5, help="Largest series the LU loop is timed on (default 10^5).")
+args = parser.parse_args()
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    params = (args.per, args.order, args.calc_offs, args.equ_from)
+    print(f"per {args.per}, order {args.order}, calc_offs {args.calc_offs}, equ_from {args.equ_from}")
+    print(f"{'bars':>10} {'weights s':>10} {'Mbars/s':>8} {'loop s':>8} {'speedup':>8} {'max rel err':>12}")
+
+    for size in args.sizes:
+        prices = 100 + np.cumsum(rng.normal(0, 0.05, size))
+        started = time.perf_counter()
+        fast = rolling_poly_reg(prices, *params)
+        fast_s = time.perf_counter() - started
+        line = f"{size:>10} {fast_s:>10.4f} {size / fast_s / 1e6:>8.1f}"
+
+        if size <= args.loop_max:
+            started = time.perf_counter()
+            loop = rolling_poly_reg_loop(prices, *params)
+            loop_s = time.perf_counter() - started
+            valid = ~np.isnan(loop)
+            err = np.max(np.abs(fast[valid] - loop[valid]) / np.abs(loop[valid]))
+            line += f" {loop_s:>8.2f} {loop_s / fast_s:>7.0f}x {err:>12.2e}"
+        print(line)
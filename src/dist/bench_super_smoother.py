@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import argparse
+import time
+
+import numpy as np
+
+import kernels
+from super_smoother import lfilter, two_pole_super_smoother, two_pole_super_smoother_loop
+
+# ----------------------------------------------------------------------------
+# Throughput of the two-pole super smoother at 10^5, 10^6 and 10^7 bars.
+#
+#   python3 bench_super_smoother.py --period 20
+#
+# The price series is a random walk around 100. The Python loop is skipped
+# above --loop-max bars (it needs several seconds per 10^7 bars); for the
+# sizes it does run, the largest deviation from the loop is printed too.
+# ----------------------------------------------------------------------------
+
+parser = argparse.ArgumentParser(description="Benchmark the two-pole super smoother.")
+parser.add_argument("--period", type=float, default=20, help="Filter period, like filt_per (default 20).")
+parser.add_argument("--sizes", type=int, nargs="+", default=[10**5, 10**6, 10**7], help="Series lengths in bars.")
+parser.add_argument("--loop-max", type=int, default=10**6, help="Largest series the Python loop is timed on (default 10^6).")
+parser.add_argument("--repeat", type=int, default=3, help="Best of N runs (default 3).")
+args = parser.parse_args()
+
+
+def best_time(call, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    if kernels.JIT:
+        backend = "numba kernel"
+    else:
+        backend = "scipy lfilter" if lfilter is not None else "python loop (scipy not installed)"
+    print(f"Backend: {backend}, period {args.period:g}")
+    print(f"{'bars':>10} {'filter s':>9} {'Mbars/s':>8} {'loop s':>8} {'Mbars/s':>8} {'speedup':>8} {'max rel err':>12}")
+
+    for size in args.sizes:
+        prices = 100 + np.cumsum(rng.normal(0, 0.05, size))
+        fast_s, fast = best_time(lambda: two_pole_super_smoother(prices, args.period), args.repeat)
+        line = f"{size:>10} {fast_s:>9.4f} {size / fast_s / 1e6:>8.1f}"
+
+        if size <= args.loop_max:
+            loop_s, loop = best_time(lambda: two_pole_super_smoother_loop(prices, args.period), 1)
+            # Initial conditions must match exactly
+            assert fast[0] == loop[0] and fast[1] == loop[1]
+            err = np.max(np.abs(fast - loop) / np.abs(loop))
+            line += f" {loop_s:>8.3f} {size / loop_s / 1e6:>8.1f} {loop_s / fast_s:>7.0f}x {err:>12.2e}"
+        print(line)
@@ -0,0 +1,51 @@
+# ----------------------------------------------------------------------------
+# Where the scripts talk to Binance
+#
+# By default everything goes to the live endpoints (or the futures testnet for
+# the binance_testnet scripts). Setting "rest_base_url" / "ws_base_url" in
+# apikey-crypto.json redirects every REST call and the kline WebSocket, e.g.
+# to the local stand-in in src/python/binance_mock:
+#
+#   "rest_base_url": "http://127.0.0.1:8765",
+#   "ws_base_url": "ws://127.0.0.1:8765",
+# ----------------------------------------------------------------------------
+
+REST_BASE_URL = "https://api.binance.com"
+WS_BASE_URL = "wss://stream.binance.com:9443"
+
+
+def rest_base_url(config):
+    """Base URL of the REST API (no trailing slash)."""
+    return (config.get("rest_base_url") or REST_BASE_URL).rstrip("/")
+
+
+def ws_base_url(config):
+    """Base URL of the market data WebSocket (no trailing slash)."""
+    return (config.get("ws_base_url") or WS_BASE_URL).rstrip("/")
+
+
+def make_client(config, api_key, api_secret, **kwargs):
+    """
+    python-binance Client honouring "rest_base_url". Spot, margin and futures
+    (live and testnet) requests are all sent to that one host, which is what
+    the local stand-in serves. Without the setting this is a plain Client.
+    """
+    from binance.client import Client
+
+    base_url = config.get("rest_base_url")
+    if not base_url:
+        return Client(api_key, api_secret, **kwargs)
+    base_url = base_url.rstrip("/")
+
+    # The URLs are class attributes read (and pinged) in Client.__init__,
+    # so they have to be overridden on a subclass, not on the instance
+    class LocalClient(Client):
+        API_URL = f"{base_url}/api"
+        API_TESTNET_URL = f"{base_url}/api"
+        MARGIN_API_URL = f"{base_url}/sapi"
+        FUTURES_URL = f"{base_url}/fapi"
+        FUTURES_TESTNET_URL = f"{base_url}/fapi"
+        FUTURES_DATA_URL = f"{base_url}/futures/data"
+        FUTURES_DATA_TESTNET_URL = f"{base_url}/futures/data"
+
+    return LocalClient(api_key, api_secret, **kwargs)
@@ -1,60 +1,105 @@
 import os
 import json5
+import pandas as pd
 from datetime import datetime, timezone
-from tqdm import tqdm
+from kline_store import is_store, COLUMNS
+from kline_pyramid import TIMEFRAMES, aggregate, read_timeframe
 
 # Define paths
 config_file = "apikey-crypto.json"
 output_file = "../view/output/asset.txt"
 
-# Ensure the output directory exists
-os.makedirs(os.path.dirname(output_file), exist_ok=True)
+# Price column exported to asset.txt: the 4th field (index 3) of a kline row,
+# whether it is read from a kline store or a '|' separated CSV input_file
+PRICE_COLUMN = COLUMNS[3]
 
-# Read the JSON configuration file
-with open(config_file, "r") as json_file:
-    config = json5.load(json_file)
+
+def load_config(path=config_file):
+    """Read the JSON configuration file."""
+    with open(path, "r") as json_file:
+        return json5.load(json_file)
+
+
+def date_range(config):
+    """
+    (input_file, start_ts, end_ts, timeframe) from the configuration, with the
+    dates as Unix epoch seconds.
+    """
     input_file = config.get("input_file")  # Extract the input file from the JSON
     start_date_str = config.get("start_date")  # Extract the start date (as string)
     end_date_str = config.get("end_date")      # Extract the end date (as string)
+    timeframe = config.get("timeframe", "1m")  # Bar size of asset.txt (1m, 5m, 15m, 1h, 1d)
+
+    # Check if the input file and date range are specified
+    if not input_file:
+        raise ValueError("Input file is not specified in the JSON configuration.")
+    if not start_date_str or not end_date_str:
+        raise ValueError("Start and/or end dates are not specified in the JSON configuration.")
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Unknown timeframe '{timeframe}' in the JSON configuration, expected one of {', '.join(TIMEFRAMES)}.")
+
+    # Convert start_date_str and end_date_str to timezone-aware datetime objects
+    # Adjust the strptime format to match your JSON date/time string, e.g. "YYYY-MM-DD HH:MM:SS"
+    start_date = datetime.strptime(start_date_str, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    end_date = datetime.strptime(end_date_str, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    return input_file, int(start_date.timestamp()), int(end_date.timestamp()), timeframe
+
+
+def read_asset(config, columns=("Timestamp", PRICE_COLUMN)):
+    """
+    Timestamps and prices of asset.txt as a dict of numpy arrays
+    ("Timestamp" and PRICE_COLUMN), read without writing anything.
+    'columns' selects other kline fields (see kline_store.COLUMNS) of the
+    same bars, e.g. High and Low.
+    """
+    input_file, start_ts, end_ts, timeframe = date_range(config)
+    columns = list(columns)
+
+    # A kline store (see kline_store.py) is memory-mapped and sliced by binary search:
+    # no line is parsed, whatever the length of the history. Coarser timeframes come
+    # pre-aggregated from its pyramid levels (see kline_pyramid.py)
+    if is_store(input_file):
+        return read_timeframe(input_file, timeframe, start_ts, end_ts, columns=columns)
+
+    # Plain CSV: only the requested fields are parsed (all of them to roll bars up)
+    names = COLUMNS if timeframe != "1m" else [name for name in COLUMNS if name in columns or name == "Timestamp"]
+    df = pd.read_csv(input_file, sep="|", header=None, usecols=[COLUMNS.index(name) for name in names])
+    df.columns = names
+    df = df[(df["Timestamp"] >= start_ts) & (df["Timestamp"] <= end_ts)]
+    if timeframe != "1m":
+        # Roll the 1m rows up on the fly
+        bars = aggregate(df.sort_values("Timestamp").drop_duplicates(subset="Timestamp"), TIMEFRAMES[timeframe])
+        return {name: bars[name] for name in columns}
+    return {name: df[name].to_numpy() for name in columns}
+
+
+def write_asset(columns, path=output_file):
+    """Write 'timestamp,price' lines without a header."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.DataFrame(columns).to_csv(path, header=False, index=False)
+
+
+def write_coarser_levels(config, path=output_file):
+    """
+    With a kline store input_file, write asset_<tf>.txt for every level coarser
+    than the configured timeframe, for the viewer (binance_sim.js?tf=1h).
+    """
+    input_file, start_ts, end_ts, timeframe = date_range(config)
+    if not is_store(input_file):
+        return
+    for level in list(TIMEFRAMES)[list(TIMEFRAMES).index(timeframe) + 1:]:
+        bars = read_timeframe(input_file, level, start_ts, end_ts, columns=["Timestamp", PRICE_COLUMN])
+        write_asset(bars, path.replace(".txt", f"_{level}.txt"))
+
+
+def main():
+    config = load_config()
+    columns = read_asset(config)
+    write_asset(columns)
+    write_coarser_levels(config)
+    lines_written = len(columns["Timestamp"])
+    print(f"Filtered data has been processed and saved to {output_file}. Total lines written: {lines_written}")
+
 
-# Check if the input file and date range are specified
-if not input_file:
-    raise ValueError("Input file is not specified in the JSON configuration.")
-if not start_date_str or not end_date_str:
-    raise ValueError("Start and/or end dates are not specified in the JSON configuration.")
-
-# Convert start_date_str and end_date_str to timezone-aware datetime objects
-# Adjust the strptime format to match your JSON date/time string, e.g. "YYYY-MM-DD HH:MM:SS"
-start_date = datetime.strptime(start_date_str, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
-end_date = datetime.strptime(end_date_str, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
-
-# Initialize a counter for the number of lines written
-lines_written = 0
-
-# Count the total lines in the input file for progress bar initialization
-with open(input_file, "r") as infile:
-    total_lines = sum(1 for _ in infile)
-
-# Process the data from the input file
-with open(input_file, "r") as infile, open(output_file, "w") as outfile:
-    for line in tqdm(infile, total=total_lines, desc="Processing lines", unit="lines"):
-        # Split the line by the pipe character
-        parts = line.strip().split("|")
-
-        # Extract the timestamp (first column) and closing price (4th column)
-        if len(parts) >= 4:
-            try:
-                # Convert the Unix epoch timestamp to a timezone-aware datetime object
-                line_date = datetime.fromtimestamp(int(parts[0]), tz=timezone.utc)
-            except ValueError:
-                # Skip lines with invalid timestamps
-                continue
-
-            # Check if the date falls within the specified range
-            if start_date <= line_date <= end_date:
-                closing_price = parts[3]  # 4th column is index 3
-                # Write the filtered data to the output file in Unix epoch time
-                outfile.write(f"{parts[0]},{closing_price}\n")
-                lines_written += 1
-
-print(f"Filtered data has been processed and saved to {output_file}. Total lines written: {lines_written}")
+if __name__ == "__main__":
+    main()
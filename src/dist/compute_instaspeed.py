@@ -4,27 +4,44 @@ import numpy as np
 POLYREG_FILE = "../view/output/polyreg.txt"
 POLYACC_FILE = "../view/output/polyacc.txt"
 
-# 1. Load the polyreg data
-#    First line has headers "Timestamp,LSMA", so we use header=0
-df = pd.read_csv(POLYREG_FILE, header=0, names=["Timestamp", "LSMA"])
+def compute_acceleration(timestamps, lsma):
+    """
+    (timestamps, acceleration) of the bars with an LSMA, sorted by time:
+        acceleration[i] = (LSMA[i] - LSMA[i-1]) / LSMA[i] * 1000
+    The first bar has no acceleration and is left out.
+    """
+    df = pd.DataFrame({"Timestamp": timestamps, "LSMA": lsma})
 
-# 2. Drop rows with missing LSMA
-df = df.dropna(subset=["LSMA"])
+    # Drop rows with missing LSMA
+    df = df.dropna(subset=["LSMA"])
 
-# Make sure Timestamp is numeric
-df["Timestamp"] = pd.to_numeric(df["Timestamp"])
+    # Sort by Timestamp (in case the input isn't strictly ordered)
+    df = df.sort_values(by="Timestamp").reset_index(drop=True)
 
-# 3. Sort by Timestamp (in case file isn't strictly ordered)
-df = df.sort_values(by="Timestamp").reset_index(drop=True)
+    df["Acceleration"] = df["LSMA"].diff() / df["LSMA"] * 1000
 
-# 4. Calculate acceleration:
-#    acceleration[i] = (LSMA[i] - LSMA[i-1]) / LSMA[i]
-df["Acceleration"] = df["LSMA"].diff() / df["LSMA"] * 1000
+    # Drop the first row where Acceleration is NaN
+    acc_result = df.dropna(subset=["Acceleration"])
+    return acc_result["Timestamp"].to_numpy(), acc_result["Acceleration"].to_numpy()
 
-# 5. Drop the first row where Acceleration is NaN
-acc_result = df.dropna(subset=["Acceleration"])[["Timestamp", "Acceleration"]]
+def write_acceleration(timestamps, acceleration, path=POLYACC_FILE):
+    """Write acceleration to polyacc.txt without headers or index."""
+    pd.DataFrame({"Timestamp": timestamps, "Acceleration": acceleration}).to_csv(path, index=False, header=False)
 
-# 6. Write acceleration to polyacc.txt without headers or index
-acc_result.to_csv(POLYACC_FILE, index=False, header=False)
+def main():
+    # 1. Load the polyreg data
+    #    First line has headers "Timestamp,LSMA", so we use header=0
+    #    round_trip parses the LSMA text back to the exact floats it was written from
+    df = pd.read_csv(POLYREG_FILE, header=0, names=["Timestamp", "LSMA"], float_precision="round_trip")
 
-print(f"Acceleration values have been saved to {POLYACC_FILE}.")
+    # Make sure Timestamp is numeric
+    df["Timestamp"] = pd.to_numeric(df["Timestamp"])
+
+    # 2. Calculate acceleration and write it to polyacc.txt
+    acc_ts, acc = compute_acceleration(df["Timestamp"].to_numpy(), df["LSMA"].to_numpy())
+    write_acceleration(acc_ts, acc)
+
+    print(f"Acceleration values have been saved to {POLYACC_FILE}.")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 import pandas as pd
+import numpy as np
+
+from compute_polyupdown import read_polyreg_segments
 
 THRESHOLD = 0.20  # Adjust as needed
 
 POLYREG_FILE       = "../view/output/polyreg.txt"
-POLYUP_FILE        = "../view/output/polyup.txt"
-POLYDOWN_FILE      = "../view/output/polydown.txt"
+SEGMENTS_FILE      = "../view/output/polysegments.txt"
 POLYACC_FILE_UP    = "../view/output/polyacc_abs_up.txt"
 POLYACC_FILE_DOWN  = "../view/output/polyacc_abs_down.txt"
 
@@ -14,7 +16,12 @@ def load_polyreg(polyreg_file):
     Load the polyreg data into a DataFrame and compute the Acceleration column.
     Returns a DataFrame with columns: [Timestamp, LSMA, Acceleration].
     """
-    df = pd.read_csv(polyreg_file, header=0, names=["Timestamp", "LSMA"])
+    df = pd.read_csv(polyreg_file, header=0, names=["Timestamp", "LSMA"], float_precision="round_trip")
+    return polyreg_acceleration(df)
+
+
+def polyreg_acceleration(df):
+    """Acceleration of a [Timestamp, LSMA] DataFrame (see load_polyreg)."""
     df = df.dropna(subset=["LSMA"])
     
     # Convert Timestamp to numeric and sort
@@ -32,150 +39,82 @@ def load_polyreg(polyreg_file):
     return df
 
 
-def parse_segmented_file(filepath):
+def first_qualifying(line_ts, seg_ids, df_polyreg, threshold, mode="up", limit=3):
     """
-    Reads a file that uses lines containing '---' as segment delimiters.
-    
-    Each segment has:
-      - One 'delimiter line' that has '---' in the second field
-      - Several 'data lines' with numeric values until the next 'delimiter line'
-    Returns a list of segments, where each segment is a dict:
-      {
-          "delimiter_timestamp": <float or str>,
-          "lines": [(timestamp_float, lsma_float), (ts, val), ...]
-      }
+    Mask of the first 'limit' lines of each segment whose acceleration meets
+    the mode's condition: mode="up" => Acceleration >= threshold,
+    mode="down" => Acceleration <= -threshold.
+    'seg_ids' gives the segment of every line and must be non-decreasing.
     """
-    segments = []
-    current_segment = {
-        "delimiter_timestamp": None,
-        "lines": []
-    }
-    
-    with open(filepath, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split(",")
-            if len(parts) < 2:
-                continue
-            
-            # If we encounter '---' in the second column => start of a new segment
-            if parts[1].strip() == "---":
-                # If the current segment already has a delimiter defined, 
-                # it means we've encountered a new segment. Save the old one.
-                if current_segment["delimiter_timestamp"] is not None or current_segment["lines"]:
-                    segments.append(current_segment)
-                
-                # Begin a fresh segment
-                current_segment = {
-                    "delimiter_timestamp": parts[0].strip(),  # keep as string or float
-                    "lines": []
-                }
-            else:
-                # This is a data line in the current segment
-                try:
-                    ts_val = float(parts[0].strip())
-                    lsma_val = float(parts[1].strip())
-                    current_segment["lines"].append((ts_val, lsma_val))
-                except ValueError:
-                    # If parsing fails, skip that line
-                    continue
-    
-    # If we ended with a segment that never got appended:
-    if current_segment["delimiter_timestamp"] is not None or current_segment["lines"]:
-        segments.append(current_segment)
-    
-    return segments
+    # Acceleration of each line: binary search in the sorted polyreg timestamps
+    # (the first row on duplicates); lines without an exact match never qualify
+    poly_ts = df_polyreg["Timestamp"].to_numpy(dtype=float)
+    poly_acc = df_polyreg["Acceleration"].to_numpy(dtype=float)
+    pos = np.searchsorted(poly_ts, line_ts, side="left")
+    found = pos < len(poly_ts)
+    found[found] = poly_ts[pos[found]] == line_ts[found]
+    acc = np.full(len(line_ts), np.nan)
+    acc[found] = poly_acc[pos[found]]
+
+    if mode == "up":
+        condition_met = found & (acc >= threshold)
+    else:
+        condition_met = found & (acc <= -threshold)
+
+    # Running count of qualifying lines within each segment
+    running = np.cumsum(condition_met)
+    seg_start = np.searchsorted(seg_ids, seg_ids, side="left")
+    before_seg = np.concatenate([[0], running])[seg_start]
+    return condition_met & (running - before_seg <= limit)
 
 
-def filter_segments_by_acceleration(segments, df_polyreg, threshold, mode="up"):
+def filter_updown_by_acceleration(timestamps, mask, df_polyreg, threshold, mode="up"):
     """
-    Given a list of segments (from parse_segmented_file) and a DataFrame df_polyreg
-    that has columns [Timestamp, LSMA, Acceleration], filter each segment to:
-    
-      - Keep at most 3 timestamps whose acceleration meets the mode’s condition:
-          mode="up"   => Acceleration >= threshold
-          mode="down" => Acceleration <= -threshold
-      - Preserve the order of lines
-      - Return the new list of filtered segments
-    
-    Each returned segment will keep the same delimiter_timestamp, but only 3 or fewer lines.
+    At most 3 rows per segment of an up/down mask over the polyreg rows (see
+    compute_polyupdown.py) whose acceleration meets the threshold. Returns
+    the mask of the kept rows.
     """
-    filtered_segments = []
-    
-    for seg in segments:
-        delimiter_ts = seg["delimiter_timestamp"]
-        data_lines   = seg["lines"]
-        
-        # We only allow up to 3 in this segment
-        kept = []
-        count = 0
-        
-        for (ts_val, lsma_val) in data_lines:
-            # Find the row in df_polyreg for this timestamp (if multiple, take the first)
-            row = df_polyreg.loc[df_polyreg["Timestamp"] == ts_val]
-            if row.empty:
-                # If we don’t find an exact match, skip
-                continue
-            
-            acc_val = row["Acceleration"].values[0]
-            
-            if mode == "up":
-                condition_met = (acc_val >= threshold)
-            else:
-                condition_met = (acc_val <= -threshold)
-            
-            if condition_met:
-                kept.append((ts_val, lsma_val))
-                count += 1
-                if count >= 3:
-                    break
-        
-        filtered_segments.append({
-            "delimiter_timestamp": delimiter_ts,
-            "lines": kept
-        })
-    
-    return filtered_segments
+    lines = np.flatnonzero(mask)
+    # Each placeholder row starts a new segment; the header line starts the first
+    seg_ids = np.cumsum(~mask)[lines]
+    keep = np.zeros(len(mask), dtype=bool)
+    keep[lines] = first_qualifying(np.asarray(timestamps, dtype=float)[lines], seg_ids,
+                                   df_polyreg, threshold, mode)
+    return keep
 
 
-def write_segments_to_file(segments, output_file):
+def write_filtered_updown(output_file, timestamps, lsma, mask, keep):
     """
-    Writes out the segments with the original delimiter line (timestamp,---),
-    followed by each kept data line. All without headers or index.
+    Writes the kept rows of each segment of an up/down mask over the polyreg
+    rows (see compute_polyupdown.py), each segment after a delimiter line
+    (timestamp,---): every row outside the mask is one, the header line the
+    first one.
     """
-    with open(output_file, "w") as f:
-        for seg in segments:
-            delimiter_ts = seg["delimiter_timestamp"]
-            data_lines   = seg["lines"]
-            
-            # Write the delimiter line first: e.g. 1704936480,---
-            f.write(f"{delimiter_ts},---\n")
-            for (ts_val, lsma_val) in data_lines:
-                f.write(f"{ts_val},{lsma_val}\n")
+    timestamps = np.asarray(timestamps)
+    rows = ~mask | keep
+    ts_text = np.where(mask, timestamps.astype(float).astype(str), timestamps.astype(str))[rows]
+    values = np.where(mask, lsma, np.nan)[rows]
+    pd.DataFrame({"Timestamp": ts_text, "LSMA": values}).to_csv(
+        output_file, index=False, header=["Timestamp", "---"], na_rep="---")
 
 
 def main():
-    # 1. Load polyreg and compute acceleration
-    df_polyreg = load_polyreg(POLYREG_FILE)
-    
-    # 2. Parse the polyup file into segments
-    up_segments = parse_segmented_file(POLYUP_FILE)
-    #    Filter those segments by acceleration >= THRESHOLD
-    filtered_up = filter_segments_by_acceleration(up_segments, df_polyreg, THRESHOLD, mode="up")
-    #    Write them out to polyacc_abs_up.txt
-    write_segments_to_file(filtered_up, POLYACC_FILE_UP)
-    
+    # 1. Load polyreg with the up / down masks of the segment table
+    timestamps, lsma, is_up, is_down = read_polyreg_segments(POLYREG_FILE, SEGMENTS_FILE)
+    #    and compute acceleration
+    df_polyreg = polyreg_acceleration(pd.DataFrame({"Timestamp": timestamps, "LSMA": lsma}))
+
+    # 2. Keep at most 3 rows with acceleration >= THRESHOLD per up segment
+    #    and write them out to polyacc_abs_up.txt
+    keep_up = filter_updown_by_acceleration(timestamps, is_up, df_polyreg, THRESHOLD, mode="up")
+    write_filtered_updown(POLYACC_FILE_UP, timestamps, lsma, is_up, keep_up)
+
     print(f"Filtered up-segments written to {POLYACC_FILE_UP}")
-    
-    # 3. Parse the polydown file into segments
-    down_segments = parse_segmented_file(POLYDOWN_FILE)
-    #    Filter those segments by acceleration <= -THRESHOLD
-    filtered_down = filter_segments_by_acceleration(down_segments, df_polyreg, THRESHOLD, mode="down")
-    #    Write them out to polyacc_abs_down.txt
-    write_segments_to_file(filtered_down, POLYACC_FILE_DOWN)
-    
+
+    # 3. Same for the down segments with acceleration <= -THRESHOLD
+    keep_down = filter_updown_by_acceleration(timestamps, is_down, df_polyreg, THRESHOLD, mode="down")
+    write_filtered_updown(POLYACC_FILE_DOWN, timestamps, lsma, is_down, keep_down)
+
     print(f"Filtered down-segments written to {POLYACC_FILE_DOWN}")
 
 
@@ -1,66 +1,103 @@
 import pandas as pd
 import numpy as np
 
+from compute_polyupdown import read_segment_table, table_bounds
+
 ASSET_FILE = "../view/output/asset.txt"
-POLYUP_FILE = "../view/output/polyup.txt"
-POLYDOWN_FILE = "../view/output/polydown.txt"
+POLYREG_FILE = "../view/output/polyreg.txt"
+SEGMENTS_FILE = "../view/output/polysegments.txt"
 LINREG_FILE = "../view/output/linreg.txt"
 LINREG_SLOPE_FILE = "../view/output/linreg_slopes.txt"
 
 VERTICAL_OFFSET = 700
 
-def parse_segments(filename):
+def fit_segments(timestamps, prices, segments):
     """
-    Parse the given poly-file (either polyup or polydown) looking for segments
-    separated by lines containing '---'. Each numeric line is 'timestamp, value'.
+    Least-squares line through the asset points of every (start_ts, end_ts)
+    segment. 'timestamps' must be sorted.
+
+    Returns (keep, lo, hi, slope, intercept): 'keep' flags the segments with
+    at least 2 points, and kept segment i covers the points lo[i]:hi[i].
 
-    Returns a list of (start_ts, end_ts) tuples, where:
-        start_ts = min of all timestamps in that segment,
-        end_ts = max of all timestamps in that segment.
+    Segment bounds come from searchsorted and the segment means from prefix
+    sums of x and y. Prefix sums of x*x and x*y would cancel catastrophically
+    on epoch timestamps, so the second moments are summed over all segment
+    points at once, centered on each segment's mean.
+    """
+    starts = np.array([s for s, _ in segments], dtype=np.int64)
+    ends = np.array([e for _, e in segments], dtype=np.int64)
+    lo = np.searchsorted(timestamps, starts, side="left")
+    hi = np.searchsorted(timestamps, ends, side="right")
+    keep = hi - lo >= 2
+    lo, hi = lo[keep], hi[keep]
+    count = hi - lo
+
+    # x relative to the first bar keeps the prefix sums small
+    x = (timestamps - timestamps[0]).astype(float)
+    cum_x = np.concatenate([[0.0], np.cumsum(x)])
+    cum_y = np.concatenate([[0.0], np.cumsum(prices)])
+    mean_x = (cum_x[hi] - cum_x[lo]) / count
+    mean_y = (cum_y[hi] - cum_y[lo]) / count
+
+    # Index of every point of every segment (segments may share bars)
+    seg = np.repeat(np.arange(len(lo)), count)
+    idx = np.arange(len(seg)) - np.repeat(np.cumsum(count) - count, count) + lo[seg]
+    dx = x[idx] - mean_x[seg]
+    dy = prices[idx] - mean_y[seg]
+    sxx = np.bincount(seg, weights=dx * dx, minlength=len(lo))
+    sxy = np.bincount(seg, weights=dx * dy, minlength=len(lo))
+
+    slope = sxy / sxx
+    intercept = mean_y - slope * (mean_x + timestamps[0])
+    return keep, lo, hi, slope, intercept
+
+def compute_linreg(timestamps, prices, up_segments, down_segments):
+    """
+    Fit every up and down segment (lists of (start_ts, end_ts)) on the sorted
+    asset arrays. Returns a dict of arrays over the segments with at least 2
+    points, in start order: start_ts, is_up, lo, hi, slope, intercept.
+    """
+    # Label them: 'up' or 'down'
+    labeled_segments = [(start_ts, end_ts, "up")   for (start_ts, end_ts) in up_segments] + \
+                       [(start_ts, end_ts, "down") for (start_ts, end_ts) in down_segments]
+
+    # Sort all segments by their start time
+    labeled_segments.sort(key=lambda x: x[0])
+
+    if not labeled_segments or len(timestamps) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return {"start_ts": empty, "is_up": np.empty(0, dtype=bool), "lo": empty, "hi": empty,
+                "slope": np.empty(0), "intercept": np.empty(0)}
+
+    keep, lo, hi, slope, intercept = fit_segments(
+        timestamps, prices, [(start_ts, end_ts) for (start_ts, end_ts, _) in labeled_segments])
+    start_ts = np.array([start for (start, _, _) in labeled_segments], dtype=np.int64)[keep]
+    is_up = np.array([segment_type == "up" for (_, _, segment_type) in labeled_segments])[keep]
+    return {"start_ts": start_ts, "is_up": is_up, "lo": lo, "hi": hi, "slope": slope, "intercept": intercept}
+
+def write_linreg(timestamps, fit, linreg_file=LINREG_FILE, slope_file=LINREG_SLOPE_FILE):
+    """
+    Write the offset regression curves to linreg_file and the slope of each
+    segment, keyed by its start, to slope_file.
     """
-    segments = []
-    current_timestamps = []  # hold timestamps for the current segment
-
-    with open(filename, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue  # skip empty lines if any
-
-            parts = line.split(",")
-            if len(parts) != 2:
-                continue  # skip malformed lines
-
-            ts_str, val_str = parts[0], parts[1]
-
-            try:
-                ts = int(ts_str)
-            except ValueError:
-                # If we can't parse the timestamp, skip the line
-                continue
-
-            if val_str == "---":
-                # A delimiter: close the current segment, if any
-                if current_timestamps:
-                    start_ts = min(current_timestamps)
-                    end_ts = max(current_timestamps)
-                    segments.append((start_ts, end_ts))
-                    current_timestamps = []
-            else:
-                # A numeric line
-                try:
-                    float_val = float(val_str)  # just to confirm it's numeric
-                    current_timestamps.append(ts)
-                except ValueError:
-                    pass  # Not numeric, ignore
-
-    # If file did not end with '---' and there's a leftover segment
-    if current_timestamps:
-        start_ts = min(current_timestamps)
-        end_ts = max(current_timestamps)
-        segments.append((start_ts, end_ts))
-
-    return segments
+    lo, hi, slope, intercept = fit["lo"], fit["hi"], fit["slope"], fit["intercept"]
+    pd.DataFrame({"ts": fit["start_ts"], "slope": slope}).to_csv(slope_file, header=False, index=False)
+
+    # Up segments are shifted down, down segments up
+    offset = np.where(fit["is_up"], -VERTICAL_OFFSET, VERTICAL_OFFSET)
+
+    # Every point of a segment followed by a break line at its last
+    # timestamp; the break's NaN value is written as '---'
+    count = hi - lo + 1
+    seg = np.repeat(np.arange(len(lo)), count)
+    pos = np.arange(len(seg)) - np.repeat(np.cumsum(count) - count, count)
+    is_break = pos == count[seg] - 1
+    idx = np.where(is_break, hi[seg] - 1, lo[seg] + pos)
+    ts_out = timestamps[idx]
+    values = slope[seg] * ts_out.astype(float) + intercept[seg] + offset[seg]
+    values[is_break] = np.nan
+    pd.DataFrame({"ts": ts_out, "value": values}).to_csv(
+        linreg_file, header=False, index=False, na_rep="---")
 
 def main():
     # 1) Read asset data
@@ -72,56 +109,20 @@ def main():
     )
     # Ensure ascending order by timestamp
     df_asset.sort_values("timestamp", inplace=True)
+    timestamps = df_asset["timestamp"].to_numpy()
+    prices = df_asset["price"].to_numpy()
 
-    # 2) Parse segments from polyup and polydown
-    up_segments = parse_segments(POLYUP_FILE)
-    down_segments = parse_segments(POLYDOWN_FILE)
-
-    # Label them: 'up' or 'down'
-    labeled_segments = [(start_ts, end_ts, "up")   for (start_ts, end_ts) in up_segments] + \
-                       [(start_ts, end_ts, "down") for (start_ts, end_ts) in down_segments]
-
-    # Sort all segments by their start time
-    labeled_segments.sort(key=lambda x: x[0])
+    # 2) Up and down segments from the segment table: (start_ts, end_ts)
+    #    of their first and last polyreg rows
+    poly_ts = pd.read_csv(POLYREG_FILE, header=0, usecols=[0]).iloc[:, 0].to_numpy()
+    up_segments, down_segments = table_bounds(poly_ts, read_segment_table(SEGMENTS_FILE))
 
     # 3) Perform linear regression for each segment.
     #    Write the offset regression curves to LINREG_FILE
     #    and write the slope for each segment to LINREG_SLOPE_FILE
     print("Computing linear regressions and writing results...")
-
-    with open(LINREG_FILE, "w") as f_out, open(LINREG_SLOPE_FILE, "w") as f_slope:
-        for (start_ts, end_ts, segment_type) in labeled_segments:
-            # Subset asset data for [start_ts, end_ts]
-            mask = (df_asset["timestamp"] >= start_ts) & (df_asset["timestamp"] <= end_ts)
-            df_sub = df_asset.loc[mask].copy()
-
-            # Skip if fewer than 2 points
-            if len(df_sub) < 2:
-                continue
-
-            x = df_sub["timestamp"].values.astype(float)
-            y = df_sub["price"].values
-
-            slope, intercept = np.polyfit(x, y, 1)
-
-            # Write the slope info at the beginning of each segment
-            f_slope.write(f"{start_ts},{slope}\n")
-
-            # Determine offset direction for up vs. down segments
-            if segment_type == "up":
-                offset = -VERTICAL_OFFSET
-            else:  # segment_type == "down"
-                offset = VERTICAL_OFFSET
-
-            # Write each point with its Y-value shifted (up or down)
-            for ts_val in x:
-                shifted_val = slope * ts_val + intercept + offset
-                f_out.write(f"{int(ts_val)},{shifted_val}\n")
-
-            # After writing a segment, write a break line
-            # (using the last timestamp for clarity)
-            last_timestamp = int(x[-1])
-            f_out.write(f"{last_timestamp},---\n")
+    fit = compute_linreg(timestamps, prices, up_segments, down_segments)
+    write_linreg(timestamps, fit)
 
 if __name__ == "__main__":
     main()
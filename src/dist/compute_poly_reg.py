@@ -1,202 +1,209 @@
+import io
 import os
+import json
+import hashlib
 import json5
 import pandas as pd
 import numpy as np
 
+from super_smoother import two_pole_super_smoother
+from polyreg_engine import rolling_poly_reg
+
 # ---------------------
 # File paths
 # ---------------------
 CONFIG_FILE = "apikey-crypto.json"
 ASSET_FILE = "../view/output/asset.txt"
 POLYREG_FILE = "../view/output/polyreg.txt"
-
-# Create output directory if needed
-os.makedirs(os.path.dirname(POLYREG_FILE), exist_ok=True)
-
-# ---------------------
-# Load configuration
-# ---------------------
-try:
-    with open(CONFIG_FILE, 'r') as file:
-        config = json5.load(file)
-except FileNotFoundError:
-    print(f"Configuration file {CONFIG_FILE} not found. Using defaults.")
-    config = {}
-
-# ---------------------
-# Read asset data
-# ---------------------
-try:
-    asset_data = pd.read_csv(ASSET_FILE, header=None, names=["Timestamp", "Price"])
-    asset_data["Timestamp"] = pd.to_numeric(asset_data["Timestamp"])  # Ensure numeric
-    asset_data = asset_data.sort_values(by="Timestamp")              # Sort by time
-except FileNotFoundError:
-    print(f"Asset file {ASSET_FILE} not found.")
-    exit(1)
+STATE_FILE = "../view/output/polyreg_state.json"
 
 # ----------------------------------------------------------------------
 # Configurable parameters (defaults can be changed or extended)
 # ----------------------------------------------------------------------
-use_filt = config.get("use_filt", True)   # Smooth data before curve fitting
-filt_per = config.get("filt_per", 200)    # Period for Super Smoother filter -- 10
-per      = config.get("per", 10)          # Regression sample length
-order    = config.get("order", 2)         # Polynomial order
-calc_offs= config.get("calc_offs", 0)     # Regression offset
-ndev     = config.get("ndev", 2.0)        # Channel width coefficient
-equ_from = config.get("equ_from", 0)      # "Forecast from X bars ago"
+def polyreg_params(config):
+    return {
+        "use_filt": config.get("use_filt", True),   # Smooth data before curve fitting
+        "filt_per": config.get("filt_per", 200),    # Period for Super Smoother filter -- 10
+        "per":      config.get("per", 10),          # Regression sample length
+        "order":    config.get("order", 2),         # Polynomial order
+        "calc_offs":config.get("calc_offs", 0),     # Regression offset
+        "ndev":     config.get("ndev", 2.0),        # Channel width coefficient
+        "equ_from": config.get("equ_from", 0),      # "Forecast from X bars ago"
+    }
+
+def params_hash(params):
+    """Everything the output depends on besides asset.txt; a change means a full recompute."""
+    keys = ["use_filt", "filt_per", "per", "order", "calc_offs", "equ_from"]
+    return hashlib.sha256(json.dumps([params[k] for k in keys]).encode()).hexdigest()
+
+def window_len(params):
+    """Filtered values the next LSMA bar needs from before it."""
+    return max(params["per"] - 1 + params["equ_from"], 0)
 
 # ----------------------------------------------------------------------
-# 1) Two-Pole Super Smoother
+# 1) Two-Pole Super Smoother (compiled IIR filter, see super_smoother.py)
+# 2) Polynomial regression (precomputed window weights, see polyreg_engine.py)
 # ----------------------------------------------------------------------
-def two_pole_super_smoother(series, length):
-    """
-    Applies a 2-pole super smoother filter on 'series' with period 'length'.
-    Returns a smoothed numpy array.
-    """
-    src = series.to_numpy(dtype=float)
-    out = np.zeros_like(src)
-
-    t = float(length)
-    omega = 2 * np.arctan(1) * 4 / t
-    a = np.exp(-np.sqrt(2) * np.arctan(1) * 4 / t)
-    b = 2 * a * np.cos((np.sqrt(2)/2) * omega)
-    c2 = b
-    c3 = -(a**2)
-    c1 = 1 - c2 - c3
-
-    # Initialize first values
-    if len(src) > 0:
-        out[0] = src[0]
-    if len(src) > 1:
-        out[1] = src[1]
-
-    for i in range(2, len(src)):
-        out[i] = c1 * src[i] + c2 * out[i-1] + c3 * out[i-2]
-
-    return out
-
-if use_filt:
-    asset_data["Filtered"] = two_pole_super_smoother(asset_data["Price"], filt_per)
-else:
-    asset_data["Filtered"] = asset_data["Price"]
+def compute_lsma(prices, params):
+    """(filtered, lsma) numpy arrays for a price series sorted by time."""
+    if params["use_filt"]:
+        filtered = two_pole_super_smoother(prices, params["filt_per"])
+    else:
+        filtered = np.asarray(prices, dtype=float)
+    lsma = rolling_poly_reg(filtered, params["per"], params["order"], params["calc_offs"], params["equ_from"])
+    return filtered, lsma
+
+def write_polyreg(timestamps, lsma, path=POLYREG_FILE):
+    """Output only Timestamp and LSMA (bars without a fit are left empty)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.DataFrame({"Timestamp": timestamps, "LSMA": lsma}).to_csv(path, index=False)
 
 # ----------------------------------------------------------------------
-# 2) Polynomial regression via LU decomposition
+# Checkpoint
+#
+# After every run STATE_FILE records how much of asset.txt has been
+# consumed (byte offset plus its first and last consumed lines), the last
+# two smoother outputs and the trailing LSMA window. When asset.txt still
+# starts with the same lines and only grew, the next run smooths and fits
+# the new bars alone and appends them to polyreg.txt.
 # ----------------------------------------------------------------------
-def get_val(mat, r, c, rowlen):
-    return mat[r * rowlen + c]
-
-def set_val(mat, r, c, rowlen, val):
-    mat[r * rowlen + c] = val
-
-def lu_decompose(A, B_size):
-    L = [np.nan]*(B_size**2)
-    U = [np.nan]*(B_size**2)
-
-    # First row of U, first column of L
-    for c in range(B_size):
-        set_val(U, 0, c, B_size, get_val(A, 0, c, B_size))
-    set_val(L, 0, 0, B_size, 1.0)
-    denom0 = get_val(U, 0, 0, B_size)
-    for r in range(1, B_size):
-        val_r0 = get_val(A, r, 0, B_size) / denom0
-        set_val(L, r, 0, B_size, val_r0)
-
-    for r in range(B_size):
-        for c in range(B_size):
-            if r == c:
-                set_val(L, r, c, B_size, 1.0)
-            if r < c:
-                set_val(L, r, c, B_size, 0.0)
-            if r > c:
-                set_val(U, r, c, B_size, 0.0)
-
-    for r in range(B_size):
-        for c in range(B_size):
-            if np.isnan(get_val(L, r, c, B_size)) and r > c:
-                temp = get_val(A, r, c, B_size)
-                for k in range(c):
-                    temp -= get_val(U, k, c, B_size)*get_val(L, r, k, B_size)
-                val_rc = temp / get_val(U, c, c, B_size)
-                set_val(L, r, c, B_size, val_rc)
-
-            if np.isnan(get_val(U, r, c, B_size)) and r <= c:
-                temp = get_val(A, r, c, B_size)
-                for k in range(r):
-                    temp -= get_val(U, k, c, B_size)*get_val(L, r, k, B_size)
-                set_val(U, r, c, B_size, temp)
-
-    return (L, U)
-
-def forward_substitution(L, B):
-    B_size = len(B)
-    Y = [0.0]*B_size
-    Y[0] = B[0] / get_val(L, 0, 0, B_size)
-    for r in range(1, B_size):
-        temp = B[r]
-        for k in range(r):
-            temp -= get_val(L, r, k, B_size)*Y[k]
-        denom = get_val(L, r, r, B_size)
-        Y[r] = temp / denom
-    return Y
-
-def backward_substitution(U, Y):
-    B_size = len(Y)
-    X = [0.0]*B_size
-    X[B_size-1] = Y[B_size-1] / get_val(U, B_size-1, B_size-1, B_size)
-    for r in range(B_size-2, -1, -1):
-        temp = Y[r]
-        for k in range(r+1, B_size):
-            temp -= get_val(U, r, k, B_size) * X[k]
-        denom = get_val(U, r, r, B_size)
-        X[r] = temp / denom
-    return X
-
-def solve_poly_reg(x_array, y_array, poly_order):
-    x_powsums = [np.sum(x_array**k) for k in range(2*poly_order + 1)]
-    xy_powsums = [np.sum((x_array**k)*y_array) for k in range(poly_order + 1)]
-
-    size_mat = (poly_order+1)**2
-    xp_matrix = [0.0]*size_mat
-
-    for r in range(poly_order+1):
-        for c in range(poly_order+1):
-            val = x_powsums[r + c]
-            set_val(xp_matrix, r, c, (poly_order+1), val)
-
-    L, U = lu_decompose(xp_matrix, poly_order+1)
-    Y_sol = forward_substitution(L, xy_powsums)
-    coefs = backward_substitution(U, Y_sol)
-    return coefs
-
-def evaluate_polynomial(coefs, x):
-    val = 0.0
-    for i, c in enumerate(coefs):
-        val += c * (x**i)
-    return val
-
-asset_data["LSMA"] = np.nan
-prices_np = asset_data["Filtered"].to_numpy()
-N = len(asset_data)
-
-for i in range(N):
-    if i - per + 1 - equ_from < 0:
-        continue
-    fit_end = i - equ_from
-    fit_start = fit_end - (per - 1)
-    window_prices = prices_np[fit_start : fit_end+1]
-    if len(window_prices) < per:
-        continue
-    x_array = np.arange(1, per+1, dtype=float)
-    coefs = solve_poly_reg(x_array, window_prices, order)
-    # Evaluate at x = per - (calc_offs - equ_from).
-    final_x = float(per) - (calc_offs - equ_from)
-    lsma_val = evaluate_polynomial(coefs, final_x)
-    asset_data.at[i, "LSMA"] = lsma_val
-
-# ---------------------
-# Output only Timestamp and LSMA
-# ---------------------
-asset_data[["Timestamp", "LSMA"]].to_csv(POLYREG_FILE, index=False)
-
-print(f"Polynomial regression (timestamp, lsma) results written to {POLYREG_FILE}")
+def load_state():
+    try:
+        with open(STATE_FILE, 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def save_state(state):
+    tmp_file = STATE_FILE + ".tmp"
+    with open(tmp_file, 'w') as file:
+        json.dump(state, file)
+    os.replace(tmp_file, STATE_FILE)
+
+def drop_state():
+    """Forget the checkpoint, e.g. after polyreg.txt was written by someone else."""
+    if os.path.exists(STATE_FILE):
+        os.remove(STATE_FILE)
+
+def read_new_rows(state, params):
+    """
+    (rows, new_bytes) for the lines appended to asset.txt since the checkpoint,
+    or None when the checkpoint doesn't describe the current files and a full
+    run is needed.
+    """
+    if state is None or state.get("params") != params_hash(params):
+        return None
+    # With a negative equ_from the last bars are fitted on bars that don't
+    # exist yet and would have to be rewritten once they arrive
+    if params["equ_from"] < 0 or state["bars"] < 2:
+        return None
+    if not os.path.exists(POLYREG_FILE) or os.path.getsize(POLYREG_FILE) != state["polyreg_size"]:
+        return None
+
+    offset = state["asset_offset"]
+    head = state["asset_head"].encode()
+    tail = state["asset_tail"].encode()
+    if os.path.getsize(ASSET_FILE) < offset:
+        return None
+    with open(ASSET_FILE, 'rb') as file:
+        if file.read(len(head)) != head:
+            return None
+        file.seek(offset - len(tail))
+        if file.read(len(tail)) != tail:
+            return None
+        new_bytes = file.read()
+
+    # Only complete lines; a partially written one waits for the next run
+    new_bytes = new_bytes[:new_bytes.rfind(b"\n") + 1]
+    rows = parse_asset(new_bytes)
+    if len(rows) and (rows["Timestamp"].iloc[0] <= state["last_timestamp"]
+                      or not rows["Timestamp"].is_monotonic_increasing):
+        return None
+    return rows, new_bytes
+
+def parse_asset(data):
+    """DataFrame of the 'Timestamp,Price' lines in 'data' (bytes)."""
+    if not data:
+        return pd.DataFrame({"Timestamp": np.empty(0, dtype=np.int64), "Price": np.empty(0)})
+    rows = pd.read_csv(io.BytesIO(data), header=None, names=["Timestamp", "Price"])
+    rows["Timestamp"] = pd.to_numeric(rows["Timestamp"])  # Ensure numeric
+    return rows
+
+def main():
+    # ---------------------
+    # Load configuration
+    # ---------------------
+    try:
+        with open(CONFIG_FILE, 'r') as file:
+            config = json5.load(file)
+    except FileNotFoundError:
+        print(f"Configuration file {CONFIG_FILE} not found. Using defaults.")
+        config = {}
+
+    if not os.path.exists(ASSET_FILE):
+        print(f"Asset file {ASSET_FILE} not found.")
+        exit(1)
+
+    params = polyreg_params(config)
+    state = load_state()
+    incremental = read_new_rows(state, params)
+
+    if incremental is None:
+        # ---------------------
+        # Full run: read asset data
+        # ---------------------
+        with open(ASSET_FILE, 'rb') as file:
+            asset_bytes = file.read()
+        asset_bytes = asset_bytes[:asset_bytes.rfind(b"\n") + 1]
+        asset_data = parse_asset(asset_bytes)
+        asset_data = asset_data.sort_values(by="Timestamp")  # Sort by time
+
+        history, lsma = compute_lsma(asset_data["Price"].to_numpy(dtype=float), params)
+        write_polyreg(asset_data["Timestamp"].to_numpy(), lsma)
+
+        lines = asset_bytes.splitlines(keepends=True)
+        state = {
+            "params": params_hash(params),
+            "asset_head": lines[0].decode() if lines else "",
+            "asset_tail": lines[-1].decode() if lines else "",
+            "asset_offset": len(asset_bytes),
+            "bars": len(asset_data),
+            "last_timestamp": int(asset_data["Timestamp"].iloc[-1]) if lines else None,
+        }
+        filtered_tail = history[-2:]
+        print(f"Polynomial regression (timestamp, lsma) results written to {POLYREG_FILE}")
+    else:
+        # ---------------------
+        # Incremental run: only the bars appended to asset.txt
+        # ---------------------
+        new_data, new_bytes = incremental
+
+        if params["use_filt"]:
+            new_filtered = two_pole_super_smoother(new_data["Price"], params["filt_per"], state=state["filtered_tail"])
+        else:
+            new_filtered = new_data["Price"].to_numpy(dtype=float)
+
+        # The trailing window is the history the first new bars are fitted on
+        window = np.asarray(state["window"], dtype=float)
+        history = np.concatenate([window, new_filtered])
+        new_data["LSMA"] = rolling_poly_reg(history, params["per"], params["order"],
+                                            params["calc_offs"], params["equ_from"])[len(window):]
+        new_data[["Timestamp", "LSMA"]].to_csv(POLYREG_FILE, mode="a", header=False, index=False)
+        filtered_tail = np.concatenate([state["filtered_tail"], new_filtered])[-2:]
+
+        if len(new_data):
+            state["asset_tail"] = new_bytes.splitlines(keepends=True)[-1].decode()
+            state["asset_offset"] += len(new_bytes)
+            state["bars"] += len(new_data)
+            state["last_timestamp"] = int(new_data["Timestamp"].iloc[-1])
+        print(f"Polynomial regression: {len(new_data)} new bars appended to {POLYREG_FILE}")
+
+    # Smoother outputs and LSMA window the next run continues from
+    keep = window_len(params)
+    state["filtered_tail"] = filtered_tail.tolist()
+    state["window"] = history[max(len(history) - keep, 0):].tolist() if keep else []
+    state["polyreg_size"] = os.path.getsize(POLYREG_FILE)
+    save_state(state)
+
+if __name__ == "__main__":
+    main()
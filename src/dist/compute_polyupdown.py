@@ -2,10 +2,112 @@
 
 import os
 
+import numpy as np
+import pandas as pd
+
 POLYREG_FILE  = "../view/output/polyreg.txt"
 POLYACC_FILE  = "../view/output/polyacc.txt"
 POLYUP_FILE   = "../view/output/polyup.txt"
 POLYDOWN_FILE = "../view/output/polydown.txt"
+SEGMENTS_FILE = "../view/output/polysegments.txt"
+
+def split_updown(timestamps, acc_ts, acc):
+    """
+    (is_up, is_down) masks over the polyreg rows 'timestamps': a row with a
+    positive acceleration goes up, one with any other acceleration goes down,
+    and a row without acceleration is a placeholder in both.
+    'acc_ts' must be sorted.
+    """
+    timestamps = np.asarray(timestamps)
+    acc_ts = np.asarray(acc_ts)
+    pos = np.searchsorted(acc_ts, timestamps)
+    found = pos < len(acc_ts)
+    found[found] = acc_ts[pos[found]] == timestamps[found]
+    rising = np.zeros(len(timestamps), dtype=bool)
+    rising[found] = np.asarray(acc)[pos[found]] > 0
+    return found & rising, found & ~rising
+
+def updown_runs(mask):
+    """(lo, hi) index arrays of the runs of True in 'mask' (rows lo:hi)."""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def segment_table(is_up, is_down):
+    """
+    The up and down segments in start order, as a dict of arrays: start and
+    end (inclusive) polyreg row indices, is_up, and open for a segment that
+    reaches the last row, i.e. is still running.
+    """
+    up_lo, up_hi = updown_runs(is_up)
+    down_lo, down_hi = updown_runs(is_down)
+    start = np.concatenate([up_lo, down_lo])
+    order = np.argsort(start, kind="stable")
+    end = np.concatenate([up_hi, down_hi])[order] - 1
+    return {
+        "start": start[order],
+        "end": end,
+        "is_up": np.concatenate([np.ones(len(up_lo), dtype=bool), np.zeros(len(down_lo), dtype=bool)])[order],
+        "open": end == len(is_up) - 1,
+    }
+
+def table_masks(table, rows):
+    """(is_up, is_down) masks over 'rows' polyreg rows of a segment table."""
+    masks = []
+    for direction in (table["is_up"], ~table["is_up"]):
+        edges = np.zeros(rows + 1, dtype=np.int64)
+        np.add.at(edges, table["start"][direction], 1)
+        np.add.at(edges, table["end"][direction] + 1, -1)
+        masks.append(np.cumsum(edges[:-1]) > 0)
+    return masks[0], masks[1]
+
+def table_bounds(timestamps, table):
+    """
+    ([(start_ts, end_ts)] of the up segments, same for the down segments):
+    the timestamps of their first and last polyreg rows.
+    """
+    timestamps = np.asarray(timestamps)
+    bounds = list(zip(timestamps[table["start"]].tolist(), timestamps[table["end"]].tolist()))
+    up = table["is_up"].tolist()
+    return ([bound for bound, is_up in zip(bounds, up) if is_up],
+            [bound for bound, is_up in zip(bounds, up) if not is_up])
+
+def write_segment_table(table, path=SEGMENTS_FILE):
+    """One 'start,end,direction,open' line per segment, after a header."""
+    pd.DataFrame({
+        "start": table["start"],
+        "end": table["end"],
+        "direction": np.where(table["is_up"], "up", "down"),
+        "open": table["open"].astype(np.int8),
+    }).to_csv(path, index=False)
+
+def read_segment_table(path=SEGMENTS_FILE):
+    df = pd.read_csv(path, dtype={"start": np.int64, "end": np.int64, "direction": str, "open": np.int8})
+    return {
+        "start": df["start"].to_numpy(),
+        "end": df["end"].to_numpy(),
+        "is_up": (df["direction"] == "up").to_numpy(),
+        "open": df["open"].to_numpy().astype(bool),
+    }
+
+def read_polyreg_segments(polyreg_file=POLYREG_FILE, segments_file=SEGMENTS_FILE):
+    """
+    (timestamps, lsma, is_up, is_down) from polyreg.txt and the segment
+    table, the masks as split_updown returns them.
+    """
+    # Parse the LSMA text back to the exact floats it was written from
+    df_reg = pd.read_csv(polyreg_file, header=0, names=["Timestamp", "LSMA"], float_precision="round_trip")
+    is_up, is_down = table_masks(read_segment_table(segments_file), len(df_reg))
+    return df_reg["Timestamp"].to_numpy(), df_reg["LSMA"].to_numpy(), is_up, is_down
+
+def write_updown(path, timestamps, lsma, mask):
+    """
+    One line per polyreg row: 'timestamp,lsma' where 'mask' is set and the
+    'timestamp,---' placeholder elsewhere. The polyreg header line has no
+    acceleration either, so the file starts with 'Timestamp,---'.
+    """
+    values = np.where(mask, lsma, np.nan)
+    pd.DataFrame({"Timestamp": timestamps, "LSMA": values}).to_csv(
+        path, index=False, header=["Timestamp", "---"], na_rep="---")
 
 def main():
     print("Placing each timestamp into both polyup.txt and polydown.txt with placeholders if needed")
@@ -18,72 +120,20 @@ def main():
         print(f"Error: {POLYACC_FILE} does not exist.")
         return
 
-    # 1) Read polyacc.txt into a dictionary keyed by timestamp (string),
-    #    storing the numeric value (float).
-    acc_dict = {}
-    with open(POLYACC_FILE, 'r') as f_acc:
-        for line in f_acc:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split(',')
-            if len(parts) != 2:
-                # Skip malformed lines
-                continue
-            
-            ts_str, val_str = parts
-            ts_str = ts_str.strip()
-            val_str = val_str.strip()
-            if not ts_str or not val_str:
-                continue
-
-            try:
-                acc_value = float(val_str)
-            except ValueError:
-                # Skip if not convertible to float
-                continue
-            
-            acc_dict[ts_str] = acc_value
-
-    # 2) For each line in polyreg.txt, figure out how to write to polyup and polydown
-    with open(POLYREG_FILE, 'r') as f_reg, \
-         open(POLYUP_FILE, 'w') as f_up, \
-         open(POLYDOWN_FILE, 'w') as f_down:
-
-        for line in f_reg:
-            line_stripped = line.strip()
-            if not line_stripped:
-                # If empty line, skip or handle as you prefer
-                continue
-
-            parts = line_stripped.split(',')
-            if len(parts) != 2:
-                # Skip if line not "timestamp,value"
-                continue
-
-            ts_str = parts[0].strip()
-            reg_val = parts[1].strip()
-
-            # 3) Determine if there's a matching timestamp in acc_dict
-            acc_val = acc_dict.get(ts_str, None)
-
-            if acc_val is None:
-                # If no match, put placeholders in both files
-                # Using the same timestamp from polyreg, but value is '---'
-                f_up.write(f"{ts_str},---\n")
-                f_down.write(f"{ts_str},---\n")
-            else:
-                # If matched, decide which file gets the real line vs the placeholder
-                if acc_val > 0:
-                    # polyup: real line
-                    f_up.write(line_stripped + "\n")
-                    # polydown: placeholder
-                    f_down.write(f"{ts_str},---\n")
-                else:
-                    # polydown: real line
-                    f_down.write(line_stripped + "\n")
-                    # polyup: placeholder
-                    f_up.write(f"{ts_str},---\n")
+    # Parse the LSMA text back to the exact floats it was written from
+    df_reg = pd.read_csv(POLYREG_FILE, header=0, names=["Timestamp", "LSMA"], float_precision="round_trip")
+    df_acc = pd.read_csv(POLYACC_FILE, header=None, names=["Timestamp", "Acceleration"])
+    df_acc = df_acc.sort_values("Timestamp")
+
+    timestamps = df_reg["Timestamp"].to_numpy()
+    lsma = df_reg["LSMA"].to_numpy()
+    is_up, is_down = split_updown(timestamps, df_acc["Timestamp"].to_numpy(), df_acc["Acceleration"].to_numpy())
+
+    # polyup.txt / polydown.txt are drawn by the viewer; the compute stages
+    # after this one read the segment table
+    write_updown(POLYUP_FILE, timestamps, lsma, is_up)
+    write_updown(POLYDOWN_FILE, timestamps, lsma, is_down)
+    write_segment_table(segment_table(is_up, is_down))
 
 
 if __name__ == "__main__":
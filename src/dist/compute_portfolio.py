@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
 
+import argparse
 import csv
 from datetime import datetime, timezone
 
+import numpy as np
+
+import compute_asset
+import kernels
+
 # Adjust these paths/variables as needed
 input_file = "../view/output/trades.txt"
 output_file = "../view/output/portfolio.txt"
@@ -20,8 +26,15 @@ margin_fee_1x = 0.002
 # If Margin=1, margin is effectively disabled (as if no leverage).
 Margin = 20
 
-def compute_portfolio_value(trades_path, output_path):
-    # 1. Read and parse trades
+# Margin and fee_rate are the fallbacks: the script and sweep.py take the
+# config's "margin" and "trade_fee_percentage" (see portfolio_params).
+# backtest() runs any number of (margin, fee, capital) scenarios at once;
+# the per-trade report is only written with --report:
+#
+#   python3 compute_portfolio.py --margin 1,4,20 --fee 0.001,0.002 --report
+
+def read_trades(trades_path):
+    """(timestamp, side, price, label) tuples of trades.txt, sorted by timestamp."""
     with open(trades_path, 'r') as f:
         reader = csv.reader(f)
         trades = []
@@ -33,208 +46,267 @@ def compute_portfolio_value(trades_path, output_path):
             price     = float(row[2])
             label     = row[3].strip().lower()
             trades.append((timestamp, side, price, label))
-    
-    # 2. Sort trades by timestamp ascending
-    trades.sort(key=lambda x: x[0])
-
-    # 3. Set up tracking
-    portfolio = initial_capital
-    
-    in_up_position = False
-    up_open_price  = 0.0
-    up_notional    = 0.0
-    up_portfolio_before_open = 0.0  # We store the portfolio value before opening the long
-
-    in_down_position = False
-    down_open_price  = 0.0
-    down_notional    = 0.0
-    down_portfolio_before_open = 0.0  # We store the portfolio value before opening the short
-
-    # For output lines
-    output_lines = []
-    trade_count = 0
-    trade_pnls = []  # Each trade’s net PnL, including opening+closing fees
 
-    def timestamp_to_str(ts):
-        # Convert to a human-readable format (timezone-aware UTC)
-        return datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
-    
-    def current_fee_rate():
-        # Return correct fee rate depending on margin
-        return margin_fee_1x if Margin == 1 else fee_rate
+    # Sort trades by timestamp ascending
+    trades.sort(key=lambda x: x[0])
+    return trades
+
+def simulate_portfolio(trades, margin=None, fee=None, margin_fee=None, capital=None):
+    """
+    Runs the trades (sorted, labels lowercase) through the portfolio.
+    Returns (final_value, closed): one dict per closed trade with its
+    timestamp, direction, portfolio before open, entry and exit price,
+    price-based gain and the portfolio before and after the close fee.
+    Unset arguments take the module settings. A single scenario of
+    backtest().
+    """
+    result = backtest(trades, margin, fee, capital, margin_fee)
+    closed = [{
+        "timestamp": timestamp,
+        "direction": "Long" if long else "Short",
+        "before_open": before,
+        "entry": entry,
+        "exit": exit_price,
+        "pnl_percent": pnl_percent,
+        "before_fee": value,
+        "after_fee": after,
+    } for timestamp, long, before, entry, exit_price, pnl_percent, value, after in zip(
+        result["timestamp"].tolist(), result["is_long"].tolist(), result["before_open"][0].tolist(),
+        result["entry"].tolist(), result["exit"].tolist(), result["gain"][~result["open"]].tolist(),
+        result["before_fee"][0].tolist(), result["after_fee"][0].tolist())]
+    return float(result["final_value"][0]), closed
+
+def simulate_portfolio_loop(trades, margin, rate, portfolio):
+    """
+    Reference implementation: the position state machine in Python, with
+    'rate' the fee rate already chosen by margin. backtest() must match it
+    bit for bit (see bench_kernels.py).
+    """
+    # Open positions: {'up'/'down': (open_price, notional, portfolio_before_open)}
+    # We store the portfolio value *before* paying the opening fee
+    positions = {}
+    closed = []
 
-    # 4. Process trades
     for (timestamp, side, price, label) in trades:
-        ts_str = timestamp_to_str(timestamp)
-
-        # We'll fill these if it's a closing trade
-        entry_price_str = "N/A"
-        exit_price_str  = "N/A"
-        pct_gain_str    = "N/A"
-
         #
-        # ============ OPENING A LONG (UP) POSITION ============
+        # ============ OPENING A LONG (UP) / SHORT (DOWN) POSITION ============
         #
-        if label == 'upstart':
-            if in_up_position:
-                # Already in a long; ignore or handle as you wish
+        if label in ('upstart', 'downstart'):
+            direction = label[:-5]
+            if direction in positions:
+                # Already in a position; ignore or handle as you wish
                 continue
 
-            # Store the portfolio value *before* paying the opening fee
-            up_portfolio_before_open = portfolio
-
-            # Now pay the fee and adjust
-            if Margin == 1:
-                fee = portfolio * current_fee_rate()
-                portfolio -= fee
-                up_open_price = price
-                in_up_position = True
-                up_notional = portfolio  # 1x means notional ~ portfolio
+            before_open = portfolio
+            if margin == 1:
+                portfolio -= portfolio * rate
+                notional = portfolio  # 1x means notional ~ portfolio
             else:
-                notional = portfolio * Margin
-                open_fee = notional * current_fee_rate()
-                portfolio -= open_fee
-                up_open_price = price
-                in_up_position = True
-                up_notional = notional
+                notional = portfolio * margin
+                portfolio -= notional * rate
+            positions[direction] = (price, notional, before_open)
 
         #
-        # ============ OPENING A SHORT (DOWN) POSITION ============
+        # ============ CLOSING A LONG / SHORT POSITION ============
         #
-        elif label == 'downstart':
-            if in_down_position:
-                # Already in a short; ignore or handle as you wish
-                continue
+        elif label in ('upend', 'downend') and label[:-3] in positions:
+            direction = label[:-3]
+            open_price, notional, before_open = positions.pop(direction)
 
-            down_portfolio_before_open = portfolio
-
-            if Margin == 1:
-                fee = portfolio * current_fee_rate()
-                portfolio -= fee
-                down_open_price = price
-                in_down_position = True
-                down_notional = portfolio
+            # PnL% for a long; a short is (entry - exit)/entry
+            if direction == 'up':
+                pnl_percent = (price - open_price) / open_price
             else:
-                notional = portfolio * Margin
-                open_fee = notional * current_fee_rate()
-                portfolio -= open_fee
-                down_open_price = price
-                in_down_position = True
-                down_notional   = notional
+                pnl_percent = (open_price - price) / open_price
 
-        #
-        # ============ CLOSING A LONG POSITION ============
-        #
-        elif label == 'upend' and in_up_position:
-            trade_count += 1
-            entry_price_str = f"{up_open_price:.2f}"
-            exit_price_str  = f"{price:.2f}"
-
-            # PnL% for a long
-            pnl_percent = (price - up_open_price) / up_open_price
-            pct_gain_str = f"{pnl_percent * 100:.2f}%"
-
-            # Calculate new portfolio after the price move and fee
-            if Margin == 1:
+            if margin == 1:
                 # Gains/loss are on 'portfolio' capital (since no real leverage).
                 # Then we subtract the close fee.
                 new_val_before_fee = portfolio * (1.0 + pnl_percent)
-                portfolio = new_val_before_fee
-                close_fee = portfolio * current_fee_rate()
-                portfolio -= close_fee
+                portfolio = new_val_before_fee - new_val_before_fee * rate
             else:
-                # Gains/loss are on up_notional.
+                # Gains/loss are on the notional.
                 # Then we pay close fee on the notional as well.
-                pnl = up_notional * pnl_percent
-                new_val_before_fee = portfolio + pnl
-                portfolio = new_val_before_fee
-                close_fee = up_notional * current_fee_rate()
-                portfolio -= close_fee
-
-            new_val_after_fee = portfolio
-
-            # Net trade PnL = (portfolio AFTER close) - (portfolio BEFORE open)
-            trade_pnl = new_val_after_fee - up_portfolio_before_open
-            trade_pnls.append(trade_pnl)
-
-            # Write results for this trade
-            block = [
-                f"============= ** Trade: {trade_count} ** ===============",
-                f"Timestamp (human readable): {ts_str}",
-                f"Portfolio before open: {up_portfolio_before_open:.2f}",
-                f"Direction: Long",
-                f"Entry price: {entry_price_str}",
-                f"Exit price: {exit_price_str}",
-                f"Percentage gain (price-based): {pct_gain_str}",
-                f"New portfolio value (before close fee): {new_val_before_fee:.2f}",
-                f"New portfolio value (after close fee): {new_val_after_fee:.2f}",
-                f"Trade PnL (net of fees): {trade_pnl:.2f}",
-            ]
-            output_lines.extend(block)
-            output_lines.append("")
-
-            # Reset
-            in_up_position = False
-            up_open_price  = 0.0
-            up_notional    = 0.0
-            up_portfolio_before_open = 0.0
-
-        #
-        # ============ CLOSING A SHORT POSITION ============
-        #
-        elif label == 'downend' and in_down_position:
-            trade_count += 1
-            entry_price_str = f"{down_open_price:.2f}"
-            exit_price_str  = f"{price:.2f}"
+                new_val_before_fee = portfolio + notional * pnl_percent
+                portfolio = new_val_before_fee - notional * rate
+
+            closed.append({
+                "timestamp": timestamp,
+                "direction": "Long" if direction == 'up' else "Short",
+                "before_open": before_open,
+                "entry": open_price,
+                "exit": price,
+                "pnl_percent": pnl_percent,
+                "before_fee": new_val_before_fee,
+                "after_fee": portfolio,
+            })
 
-            # PnL% for a short is (entry - exit)/entry
-            pnl_percent = (down_open_price - price) / down_open_price
-            pct_gain_str = f"{pnl_percent * 100:.2f}%"
+        # else: ignore any other label or situation
 
-            if Margin == 1:
-                new_val_before_fee = portfolio * (1.0 + pnl_percent)
-                portfolio = new_val_before_fee
-                close_fee = portfolio * current_fee_rate()
-                portfolio -= close_fee
+    return portfolio, closed
+
+def portfolio_params(config):
+    """
+    Default (margin, fee) of the config: its "margin" and
+    "trade_fee_percentage" (in percent), else the module settings.
+    """
+    margin = config.get("margin", Margin)
+    fee = config["trade_fee_percentage"] / 100.0 if "trade_fee_percentage" in config else fee_rate
+    return margin, fee
+
+def position_events(trades):
+    """
+    The opens and closes simulate_portfolio acts on, as arrays: per event
+    its side (0 long, 1 short), whether it opens and the price-based gain
+    of a close; per closed trade its trade index, direction, entry and exit
+    price and gain. Opens of a side already in a position and closes of a
+    side without one are left out, as the state machine ignores them.
+    """
+    sides, opens, gains = [], [], []
+    closes, is_long, entry, exit_price = [], [], [], []
+    open_price = {}
+    for i, (_, _, price, label) in enumerate(trades):
+        if label in ('upstart', 'downstart'):
+            direction = label[:-5]
+            if direction in open_price:
+                continue
+            open_price[direction] = price
+            sides.append(0 if direction == 'up' else 1)
+            opens.append(True)
+            gains.append(0.0)
+        elif label in ('upend', 'downend') and label[:-3] in open_price:
+            direction = label[:-3]
+            entry_price = open_price.pop(direction)
+            if direction == 'up':
+                pnl_percent = (price - entry_price) / entry_price
             else:
-                pnl = down_notional * pnl_percent
-                new_val_before_fee = portfolio + pnl
-                portfolio = new_val_before_fee
-                close_fee = down_notional * current_fee_rate()
-                portfolio -= close_fee
-
-            new_val_after_fee = portfolio
-
-            # Net trade PnL = (portfolio AFTER close) - (portfolio BEFORE open)
-            trade_pnl = new_val_after_fee - down_portfolio_before_open
-            trade_pnls.append(trade_pnl)
-
-            # Write results for this trade
-            block = [
-                f"============= ** Trade: {trade_count} ** ===============",
-                f"Timestamp (human readable): {ts_str}",
-                f"Portfolio before open: {down_portfolio_before_open:.2f}",
-                f"Direction: Short",
-                f"Entry price: {entry_price_str}",
-                f"Exit price: {exit_price_str}",
-                f"Percentage gain (price-based): {pct_gain_str}",
-                f"New portfolio value (before close fee): {new_val_before_fee:.2f}",
-                f"New portfolio value (after close fee): {new_val_after_fee:.2f}",
-                f"Trade PnL (net of fees): {trade_pnl:.2f}",
-            ]
-            output_lines.extend(block)
-            output_lines.append("")
-
-            in_down_position = False
-            down_open_price  = 0.0
-            down_notional    = 0.0
-            down_portfolio_before_open = 0.0
+                pnl_percent = (entry_price - price) / entry_price
+            sides.append(0 if direction == 'up' else 1)
+            opens.append(False)
+            gains.append(pnl_percent)
+            closes.append(i)
+            is_long.append(direction == 'up')
+            entry.append(entry_price)
+            exit_price.append(price)
+
+    return {
+        "side": np.array(sides, dtype=np.int64),
+        "open": np.array(opens, dtype=bool),
+        "gain": np.array(gains, dtype=float),
+        "trade": np.array(closes, dtype=np.int64),
+        "timestamp": np.array([trades[i][0] for i in closes], dtype=np.int64),
+        "is_long": np.array(is_long, dtype=bool),
+        "entry": np.array(entry, dtype=float),
+        "exit": np.array(exit_price, dtype=float),
+    }
+
+def backtest(trades, margin=None, fee=None, capital=None, margin_fee=None):
+    """
+    simulate_portfolio for a batch of scenarios in one pass: 'margin', 'fee'
+    and 'capital' are scalars or arrays broadcast against each other, one
+    scenario per element (unset ones take the module settings); a margin of
+    1 pays 'margin_fee', as in simulate_portfolio. Returns
+    position_events(trades) plus "margin", "rate", "capital" and
+    "final_value" per scenario and "before_open", "before_fee" and
+    "after_fee" as (scenarios x closed trades) arrays.
+    """
+    margin = Margin if margin is None else margin
+    fee = fee_rate if fee is None else fee
+    margin_fee = margin_fee_1x if margin_fee is None else margin_fee
+    capital = initial_capital if capital is None else capital
+    margins, fees, capitals = (np.array(values, dtype=float).ravel()
+                               for values in np.broadcast_arrays(margin, fee, capital))
+
+    # Fee rate depending on margin
+    one_x = margins == 1
+    rates = np.where(one_x, margin_fee, fees)
+
+    events = position_events(trades)
+    count = len(events["trade"])
+    if kernels.JIT:
+        final_value, before_open, before_fee, after_fee = kernels.backtest_kernel(
+            events["side"], events["open"], events["gain"], margins, rates, capitals, count)
+    else:
+        final_value, before_open, before_fee, after_fee = backtest_arrays(
+            events, one_x, margins, rates, capitals, count)
+
+    return dict(events, margin=margins, rate=rates, capital=capitals, final_value=final_value,
+                before_open=before_open, before_fee=before_fee, after_fee=after_fee)
+
+def backtest_arrays(events, one_x, margins, rates, capitals, count):
+    """backtest_kernel in numpy: one step per event over the scenario arrays."""
+    portfolio = capitals.copy()
+    notional = np.zeros((2, len(margins)))
+    open_before = np.zeros((2, len(margins)))
+    before_open = np.empty((len(margins), count))
+    before_fee = np.empty((len(margins), count))
+    after_fee = np.empty((len(margins), count))
+
+    row = 0
+    for side, opens, pnl_percent in zip(events["side"].tolist(), events["open"].tolist(), events["gain"].tolist()):
+        if opens:
+            open_before[side] = portfolio
+            leveraged = portfolio * margins
+            portfolio_1x = portfolio - portfolio * rates
+            notional[side] = np.where(one_x, portfolio_1x, leveraged)
+            portfolio = np.where(one_x, portfolio_1x, portfolio - leveraged * rates)
+        else:
+            value = np.where(one_x, portfolio * (1.0 + pnl_percent), portfolio + notional[side] * pnl_percent)
+            portfolio = np.where(one_x, value - value * rates, value - notional[side] * rates)
+            before_open[:, row] = open_before[side]
+            before_fee[:, row] = value
+            after_fee[:, row] = portfolio
+            row += 1
+
+    return portfolio, before_open, before_fee, after_fee
+
+def write_report(result, scenario, output_path):
+    """
+    The human-readable report of one backtest scenario: a block per closed
+    trade, then the totals. Returns (final_value, trade_count, total_pnl,
+    avg_pnl, pct_increase).
+    """
 
-        # else: ignore any other label or situation
+    def timestamp_to_str(ts):
+        # Convert to a human-readable format (timezone-aware UTC)
+        return datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
 
-    # 5. Final portfolio value and summary
-    final_value = portfolio
+    capital = result["capital"][scenario]
+    final_value = result["final_value"][scenario]
+    before_open = result["before_open"][scenario].tolist()
+    before_fee = result["before_fee"][scenario].tolist()
+    after_fee = result["after_fee"][scenario].tolist()
 
+    # For output lines
+    output_lines = []
+    trade_pnls = []  # Each trade’s net PnL, including opening+closing fees
+
+    for trade_count, (ts, long, entry, exit_price, pnl_percent, before, value, after) in enumerate(zip(
+            result["timestamp"].tolist(), result["is_long"].tolist(), result["entry"].tolist(),
+            result["exit"].tolist(), result["gain"][~result["open"]].tolist(),
+            before_open, before_fee, after_fee), start=1):
+        # Net trade PnL = (portfolio AFTER close) - (portfolio BEFORE open)
+        trade_pnl = after - before
+        trade_pnls.append(trade_pnl)
+
+        # Write results for this trade
+        block = [
+            f"============= ** Trade: {trade_count} ** ===============",
+            f"Timestamp (human readable): {timestamp_to_str(ts)}",
+            f"Portfolio before open: {before:.2f}",
+            f"Direction: {'Long' if long else 'Short'}",
+            f"Entry price: {entry:.2f}",
+            f"Exit price: {exit_price:.2f}",
+            f"Percentage gain (price-based): {pnl_percent * 100:.2f}%",
+            f"New portfolio value (before close fee): {value:.2f}",
+            f"New portfolio value (after close fee): {after:.2f}",
+            f"Trade PnL (net of fees): {trade_pnl:.2f}",
+        ]
+        output_lines.extend(block)
+        output_lines.append("")
+
+    # Final portfolio value and summary
+    trade_count = len(after_fee)
     output_lines.append(f"Final Portfolio Value: {final_value:.2f}")
     output_lines.append(f"Number of Trades: {trade_count}")
 
@@ -250,10 +322,10 @@ def compute_portfolio_value(trades_path, output_path):
     output_lines.append(f"Average PnL per trade (net of fees): {avg_pnl:.2f}")
 
     # Percentage Increase from initial capital to final value
-    pct_increase = (final_value - initial_capital) / initial_capital * 100.0
+    pct_increase = (final_value - capital) / capital * 100.0
     output_lines.append(f"Percentage Increase (beginning to end): {pct_increase:.2f}%")
 
-    # 6. Write out the results
+    # Write out the results
     with open(output_path, 'w') as f_out:
         for line in output_lines:
             f_out.write(line + "\n")
@@ -261,18 +333,54 @@ def compute_portfolio_value(trades_path, output_path):
     # Return metrics for console print
     return final_value, trade_count, total_pnl, avg_pnl, pct_increase
 
+def parse_values(text):
+    """[floats] of a comma separated list."""
+    return [float(value) for value in text.split(",")]
+
+def main():
+    config = compute_asset.load_config()
+    margin, fee = portfolio_params(config)
+
+    parser = argparse.ArgumentParser(description="Backtest trades.txt for every (margin, fee, capital) scenario.")
+    parser.add_argument("--margin", type=parse_values, default=[margin],
+                        help=f"Comma separated margins (default: the config's, {margin:g}).")
+    parser.add_argument("--fee", type=parse_values, default=[fee],
+                        help=f"Comma separated fee rates per side, 0.001 = 0.1%% (default: the config's, {fee:g}).")
+    parser.add_argument("--capital", type=parse_values, default=[initial_capital],
+                        help=f"Comma separated starting capitals (default {initial_capital:g}).")
+    parser.add_argument("--report", action="store_true",
+                        help=f"Also write the per-trade report of the first scenario to {output_file}.")
+    args = parser.parse_args()
+
+    # Every distinct combination of the given values; margin 1 always pays margin_fee_1x
+    scenarios = dict.fromkeys(
+        (margin, margin_fee_1x if margin == 1 else fee, capital)
+        for margin in args.margin for fee in args.fee for capital in args.capital)
+    margins, fees, capitals = (np.array(values) for values in zip(*scenarios))
+    result = backtest(read_trades(input_file), margins, fees, capitals)
+
+    print(f"{'margin':>8} {'fee':>8} {'capital':>10} {'final value':>14} {'return %':>10}")
+    for s in range(len(margins)):
+        pct_increase = (result["final_value"][s] - capitals[s]) / capitals[s] * 100.0
+        print(f"{margins[s]:>8g} {fees[s]:>8g} {capitals[s]:>10.2f} {result['final_value'][s]:>14.2f} {pct_increase:>10.2f}")
+    print(f"Number of Trades: {len(result['trade'])}")
+
+    if args.report:
+        (
+            final_val,
+            trade_count,
+            total_pnl,
+            avg_pnl,
+            pct_increase
+        ) = write_report(result, 0, output_file)
+
+        # Print the summary to the terminal
+        print(f"Final Portfolio Value: {final_val:.2f}")
+        print(f"Number of Trades: {trade_count}")
+        print(f"Total PnL (net of fees): {total_pnl:.2f}")
+        print(f"Average PnL per trade (net of fees): {avg_pnl:.2f}")
+        print(f"Percentage Increase (beginning to end): {pct_increase:.2f}%")
+        print(f"Report written to {output_file}")
+
 if __name__ == "__main__":
-    (
-        final_val, 
-        trade_count, 
-        total_pnl, 
-        avg_pnl, 
-        pct_increase
-    ) = compute_portfolio_value(input_file, output_file)
-    
-    # Print the summary to the terminal
-    print(f"Final Portfolio Value: {final_val:.2f}")
-    print(f"Number of Trades: {trade_count}")
-    print(f"Total PnL (net of fees): {total_pnl:.2f}")
-    print(f"Average PnL per trade (net of fees): {avg_pnl:.2f}")
-    print(f"Percentage Increase (beginning to end): {pct_increase:.2f}%")
+    main()
@@ -8,6 +8,8 @@ import json5
 import json
 from pathlib import Path
 
+from binance_urls import rest_base_url
+
 # ------------------------------------------------------------------------------
 # 1. LOAD API KEYS AND PAIR FROM JSON5
 # ------------------------------------------------------------------------------
@@ -26,7 +28,7 @@ outfile = f"{home_dir}/pablitos-money-printer/src/view/output/equity.txt"
 # We'll parse that down to "HBAR" as the base token.
 full_pair = config.get("pair", "HBARUSDC")
 
-BASE_URL = 'https://api.binance.com'
+BASE_URL = rest_base_url(config)  # live Binance unless "rest_base_url" is set
 
 # ------------------------------------------------------------------------------
 # 2. PARSE THE BASE TOKEN FROM THE PAIR
@@ -2,6 +2,7 @@ import os                # Module for interacting with the operating system (e.g
 import json5             # Module for parsing JSON5 files which allow for more relaxed JSON syntax
 import json              # Standard JSON module to ensure keys are written with double quotes
 import time              # Module to get the current timestamp when executing trades
+import latency_trace     # Hops of the latency trace (see latency_trace.py)
 
 # Define the file that contains the API key and other configuration details
 API_KEY_FILE = "apikey-crypto.json"
@@ -14,6 +15,7 @@ realtrades_file = "../view/output/realtrades.txt"
 with open(API_KEY_FILE, 'r') as file:
     config = json5.load(file)
     exchange = config.get("exchange").lower()
+    latency_trace.enable(config)
 
 # --------------------------------------------------- #
 #   Function to Read the Last Executed Timestamp      #
@@ -149,6 +151,7 @@ def execute_trade(trade):
         return
 
     print(f"Executing trade: {strategy} at timestamp {timestamp}, price {price}")
+    latency_trace.record(latency_trace.current(), "dispatch")
     os.system(f"sudo python3 {script_path}")
 
     # Log the trade if it's opening a long or short position
@@ -185,6 +188,7 @@ if __name__ == "__main__":
 
     last_timestamp = read_last_timestamp(last_timestamp_file)
     trades = read_trades(trades_file)
+    latency_trace.record(latency_trace.current(), "pickup")
 
     # ------------------------ #
     #   Compare Trade Counts   #
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from kline_store import KlineStore, COLUMNS, STORE_SUFFIX
+from kline_pyramid import KlinePyramid
+
+# ----------------------------------------------------------------------------
+# Import cryptoarchive.com.au bar files (.gz, '|' separated, same column order
+# as the realtime CSV) straight into a kline store, without gunzip:
+#
+#   python3 import_cryptoarchive.py SUIUSDT ../assets/SUIUSDT*.gz
+#
+# The files are stream-decompressed and parsed in vectorized chunks, and
+# stores are merged chunk by chunk (KlineStore.merge_store), so memory stays
+# bounded by about CHUNK_ROWS rows of each side whatever the size of the
+# archive or of the destination.
+# ----------------------------------------------------------------------------
+
+# Rows parsed per chunk (~80 MB of columns)
+CHUNK_ROWS = 1_000_000
+
+parser = argparse.ArgumentParser(description="Import cryptoarchive .gz bar files into a kline store.")
+parser.add_argument("pair", help="Trading pair, e.g. SUIUSDT")
+parser.add_argument("files", nargs="+", help=".gz bar files (globs are expanded)")
+parser.add_argument("--store", default=None,
+                    help="Destination kline store (default ../assets/<pair>.klines)")
+parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                    help=f"Rows parsed per chunk (default {CHUNK_ROWS})")
+
+
+def read_chunks(path, chunk_rows):
+    """
+    Yield DataFrames of at most chunk_rows klines from a gzip'ed bar file,
+    sorted and unique on Timestamp (seconds).
+    """
+    reader = pd.read_csv(
+        path, sep="|", header=None, names=COLUMNS, usecols=range(len(COLUMNS)),
+        compression="gzip", chunksize=chunk_rows, engine="c",
+    )
+    for chunk in reader:
+        chunk = chunk.dropna(subset=["Timestamp"])
+        timestamps = chunk["Timestamp"].astype(np.int64)
+        # Some archives use milliseconds; the store keeps seconds
+        if len(timestamps) and timestamps.iloc[0] > 10**11:
+            timestamps = timestamps // 1000
+        chunk = chunk.assign(Timestamp=timestamps)
+        chunk["NumberOfTrades"] = chunk["NumberOfTrades"].fillna(0)
+        yield chunk.sort_values("Timestamp").drop_duplicates(subset="Timestamp")
+
+
+def import_files(files, store_path, chunk_rows=CHUNK_ROWS):
+    """
+    Import the given files into the store at store_path. The chunks are
+    appended to scratch stores in chronological order, a new one starting
+    whenever a chunk overlaps or precedes the current one (overlapping or
+    out-of-order files). The scratch stores are merged into the first (later
+    files win), which is then moved into place, or merged into the
+    destination if it already holds data. The 5m/15m/1h/1d levels are
+    rebuilt or refreshed to match. Returns the number of rows the
+    destination grew by.
+    """
+    runs = []
+    for path in tqdm(files, desc="Importing files", unit="file"):
+        for chunk in read_chunks(path, chunk_rows):
+            if len(chunk) == 0:
+                continue
+            last_ts = runs[-1].last_timestamp() if runs else None
+            if last_ts is None or chunk["Timestamp"].iloc[0] <= last_ts:
+                run_path = f"{store_path}.import{len(runs)}"
+                shutil.rmtree(run_path, ignore_errors=True)
+                runs.append(KlineStore(run_path))
+            runs[-1].append(chunk)
+    if not runs:
+        return 0
+
+    scratch = runs[0]
+    for run in runs[1:]:
+        scratch.merge_store(run, chunk_rows)
+        shutil.rmtree(run.path)
+
+    destination = KlineStore(store_path)
+    if len(destination) == 0:
+        shutil.rmtree(store_path)
+        os.replace(scratch.path, store_path)
+        KlinePyramid(store_path).sync()
+        return len(KlineStore(store_path))
+
+    # Rows already present in the destination (e.g. streamed by keep-fetching) win
+    first_ts, last_ts = scratch.first_timestamp(), scratch.last_timestamp()
+    added = destination.merge_store(scratch, chunk_rows, keep_stored=True)
+    KlinePyramid(store_path).refresh(first_ts, last_ts)
+    shutil.rmtree(scratch.path)
+    return added
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    files = sorted({match for pattern in args.files for match in glob.glob(pattern)})
+    if not files:
+        raise FileNotFoundError(f"No files match {args.files}")
+    store_path = args.store or f"../assets/{args.pair.lower()}{STORE_SUFFIX}"
+
+    start_time = time.time()
+    added = import_files(files, store_path, args.chunk_rows)
+    store = KlineStore(store_path)
+
+    print(f"Imported {added} klines from {len(files)} file(s) into {store_path} "
+          f"({len(store)} rows, {store.first_timestamp()} to {store.last_timestamp()}) "
+          f"in {time.time() - start_time:.2f} seconds")
+    gaps = store.find_gaps()
+    if gaps:
+        print(f"{len(gaps)} gap(s) in the minute grid; keep-fetching.py --repair can fill them.")
@@ -0,0 +1,98 @@
+import numpy as np
+
+# numba is optional: without it JIT is False and the callers keep their
+# plain Python / numpy code paths
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# ----------------------------------------------------------------------------
+# Compiled kernels for the sequential loops
+#
+# Each kernel is written as a plain Python loop over numpy arrays and
+# compiled with numba's njit when numba is installed. The kernels do the
+# same floating point operations in the same order as the Python reference
+# they replace (no fastmath), so their results are bit for bit identical.
+#
+# Interpreted, the kernels would be slower than the references (indexing
+# numpy arrays from Python is slow), so callers only use them when JIT is
+# set:
+#
+#   if kernels.JIT:
+#       out = kernels.super_smoother_kernel(values, c1, c2, c3)
+#
+# Compiled kernels are cached in __pycache__; the first call after a change
+# compiles them (about a second each).
+# ----------------------------------------------------------------------------
+
+JIT = njit is not None
+
+
+def jit(function):
+    """'function' compiled with njit when numba is available, else unchanged."""
+    if njit is None:
+        return function
+    return njit(cache=True, nogil=True)(function)
+
+
+@jit
+def super_smoother_kernel(values, c1, c2, c3):
+    """
+    Two-pole super smoother recursion (see super_smoother.py): the first two
+    values are copied, then out[i] = c1 * values[i] + c2 * out[i-1] + c3 * out[i-2].
+    """
+    out = np.empty_like(values)
+    for i in range(min(len(values), 2)):
+        out[i] = values[i]
+    for i in range(2, len(values)):
+        out[i] = c1 * values[i] + c2 * out[i - 1] + c3 * out[i - 2]
+    return out
+
+
+@jit
+def backtest_kernel(sides, opens, pnl_percent, margins, rates, capitals, count):
+    """
+    Position state machine of compute_portfolio.simulate_portfolio_loop over
+    the position events of compute_portfolio.position_events, once per
+    (margin, rate, capital) scenario. Returns (final_value, before_open, before_fee, after_fee):
+    one value per scenario, then (scenarios x count) arrays over the
+    'count' closes.
+    """
+    scenarios = len(margins)
+    final_value = np.empty(scenarios)
+    before_open = np.empty((scenarios, count))
+    before_fee = np.empty((scenarios, count))
+    after_fee = np.empty((scenarios, count))
+    notional = np.zeros(2)
+    open_before = np.zeros(2)
+
+    for s in range(scenarios):
+        portfolio = capitals[s]
+        margin = margins[s]
+        rate = rates[s]
+        row = 0
+        for e in range(len(sides)):
+            side = sides[e]
+            if opens[e]:
+                open_before[side] = portfolio
+                if margin == 1:
+                    portfolio -= portfolio * rate
+                    notional[side] = portfolio
+                else:
+                    notional[side] = portfolio * margin
+                    portfolio -= notional[side] * rate
+            else:
+                if margin == 1:
+                    value = portfolio * (1.0 + pnl_percent[e])
+                    portfolio = value - value * rate
+                else:
+                    value = portfolio + notional[side] * pnl_percent[e]
+                    portfolio = value - notional[side] * rate
+                before_open[s, row] = open_before[side]
+                before_fee[s, row] = value
+                after_fee[s, row] = portfolio
+                row += 1
+        final_value[s] = portfolio
+
+    return final_value, before_open, before_fee, after_fee
@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+
+from kline_store import KlineStore, COLUMNS, DTYPES, is_store
+
+# ----------------------------------------------------------------------------
+# Multi-timeframe bar pyramid
+#
+# Next to a 1m kline store (../assets/btcusdt.klines) every coarser level is
+# kept as a kline store of its own (../assets/btcusdt-5m.klines, -15m, -1h,
+# -1d). A bar has the Timestamp of its bucket start (UTC, epoch aligned),
+# the first Open, highest High, lowest Low, last Close and summed volumes.
+#
+# The newest bar of a level is normally still filling up: sync() recomputes
+# it from the 1m rows and overwrites it in place while appending new bars, so
+# keeping the pyramid current costs at most a day of 1m rows per closed kline.
+# ----------------------------------------------------------------------------
+
+# Seconds per bar of every level; "1m" is the base store itself
+TIMEFRAMES = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600, "1d": 86400}
+
+# Columns combined by sum when rolling bars up
+SUM_COLUMNS = ["Volume", "QuoteAssetVolume", "TakerBuyBaseVolume", "TakerBuyQuoteVolume", "NumberOfTrades"]
+
+
+def timeframe_path(path, timeframe):
+    """'../assets/btcusdt.klines', '1h' -> '../assets/btcusdt-1h.klines'."""
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Unknown timeframe '{timeframe}', expected one of {', '.join(TIMEFRAMES)}")
+    if timeframe == "1m":
+        return path
+    root, ext = os.path.splitext(path.rstrip("/"))
+    return f"{root}-{timeframe}{ext}"
+
+
+def aggregate(data, step):
+    """
+    Roll rows (dict of arrays sorted by Timestamp) up into bars of 'step'
+    seconds. Returns a dict of arrays in COLUMNS order, one row per bucket.
+    """
+    timestamps = np.asarray(data["Timestamp"], dtype=DTYPES["Timestamp"])
+    if len(timestamps) == 0:
+        return {name: np.empty(0, dtype=DTYPES[name]) for name in COLUMNS}
+
+    buckets = timestamps - timestamps % step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    bars = {"Timestamp": buckets[starts]}
+    bars["Open"] = np.asarray(data["Open"], dtype=DTYPES["Open"])[starts]
+    bars["High"] = np.maximum.reduceat(np.asarray(data["High"], dtype=DTYPES["High"]), starts)
+    bars["Low"] = np.minimum.reduceat(np.asarray(data["Low"], dtype=DTYPES["Low"]), starts)
+    bars["Close"] = np.asarray(data["Close"], dtype=DTYPES["Close"])[ends]
+    for name in SUM_COLUMNS:
+        bars[name] = np.add.reduceat(np.asarray(data[name], dtype=DTYPES[name]), starts)
+    return {name: bars[name] for name in COLUMNS}
+
+
+class KlinePyramid:
+    """
+    The 1m store at 'path' plus its coarser levels.
+
+        pyramid = KlinePyramid("../assets/btcusdt.klines")
+        pyramid.sync()                            # after appending 1m rows
+        pyramid.refresh(first_ts, last_ts)        # after merging older rows
+        cols = pyramid.read_range("1h", start_ts, end_ts)
+    """
+
+    def __init__(self, path, timeframes=("5m", "15m", "1h", "1d")):
+        self.path = path
+        self.base = KlineStore(path)
+        self.levels = {tf: KlineStore(timeframe_path(path, tf)) for tf in timeframes}
+
+    def _bars_from(self, start_ts, end_ts, step):
+        """Bars of 'step' seconds covering the 1m rows in [start_ts, end_ts]."""
+        first = start_ts - start_ts % step
+        last = None if end_ts is None else end_ts - end_ts % step + step - 1
+        return aggregate(self.base.read_range(first, last), step)
+
+    def sync(self):
+        """
+        Bring every level up to the end of the 1m store: the last stored bar
+        (possibly partial) is recomputed in place and newer bars are appended.
+        A missing level is built from the whole 1m history.
+        """
+        if len(self.base) == 0:
+            return
+        for timeframe, level in self.levels.items():
+            last_bar = level.last_timestamp()
+            start_ts = self.base.first_timestamp() if last_bar is None else last_bar
+            level.upsert(self._bars_from(start_ts, None, TIMEFRAMES[timeframe]))
+
+    def refresh(self, start_ts, end_ts):
+        """
+        Recompute the bars touching [start_ts, end_ts] of every level, e.g.
+        after gaps were filled or an archive was merged into the 1m store.
+        Bars that already exist are overwritten in place; a level is only
+        rewritten when the range adds bars in the middle of it.
+        """
+        self.sync()
+        for timeframe, level in self.levels.items():
+            level.upsert(self._bars_from(start_ts, end_ts, TIMEFRAMES[timeframe]))
+
+    def read_range(self, timeframe, start_ts=None, end_ts=None, columns=None):
+        """{column: numpy view} of the bars of 'timeframe' in [start_ts, end_ts]."""
+        store = self.base if timeframe == "1m" else self.levels[timeframe]
+        return store.read_range(start_ts, end_ts, columns)
+
+
+def read_timeframe(path, timeframe, start_ts=None, end_ts=None, columns=None):
+    """
+    Bars of 'timeframe' from the kline store at 'path'. Uses the
+    pre-aggregated level when it exists, otherwise rolls the 1m rows up on
+    the fly (same result, more I/O).
+    """
+    level_path = timeframe_path(path, timeframe)
+    if is_store(level_path):
+        return KlineStore(level_path).read_range(start_ts, end_ts, columns)
+    step = TIMEFRAMES[timeframe]
+    first = None if start_ts is None else start_ts - start_ts % step
+    last = None if end_ts is None else end_ts - end_ts % step + step - 1
+    bars = aggregate(KlineStore(path).read_range(first, last), step)
+    lo = 0 if start_ts is None else int(np.searchsorted(bars["Timestamp"], start_ts, side="left"))
+    return {name: bars[name][lo:] for name in (columns or COLUMNS)}
@@ -0,0 +1,258 @@
+import os
+import shutil
+
+import numpy as np
+
+# ----------------------------------------------------------------------------
+# Columnar kline store
+#
+# A store is a directory (e.g. ../assets/btcusdt.klines) holding one raw,
+# fixed-dtype little-endian file per column. Files are memory-mapped on read,
+# so opening years of minute data costs a few system calls and no parsing.
+# Rows are appended column by column with the Timestamp file written last:
+# the number of rows is the length of Timestamp, so a reader never sees a
+# partially appended row.
+# ----------------------------------------------------------------------------
+
+COLUMNS = [
+    "Timestamp", "Open", "High", "Low", "Close", "Volume",
+    "QuoteAssetVolume", "TakerBuyBaseVolume", "TakerBuyQuoteVolume",
+    "NumberOfTrades"
+]
+
+DTYPES = {
+    "Timestamp": np.dtype("<i8"),       # seconds since epoch (kline open time)
+    "Open": np.dtype("<f8"),
+    "High": np.dtype("<f8"),
+    "Low": np.dtype("<f8"),
+    "Close": np.dtype("<f8"),
+    "Volume": np.dtype("<f8"),
+    "QuoteAssetVolume": np.dtype("<f8"),
+    "TakerBuyBaseVolume": np.dtype("<f8"),
+    "TakerBuyQuoteVolume": np.dtype("<f8"),
+    "NumberOfTrades": np.dtype("<i8"),
+}
+
+STORE_SUFFIX = ".klines"
+
+
+def is_store(path):
+    """True if 'path' is a kline store directory."""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "Timestamp.bin"))
+
+
+class KlineStore:
+    """
+    Appendable, memory-mapped column store for klines.
+
+        store = KlineStore("../assets/btcusdt.klines")
+        store.append(df)                          # DataFrame or dict of arrays
+        cols = store.read_range(start_ts, end_ts) # dict of numpy views
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def __len__(self):
+        ts_file = self._file("Timestamp")
+        if not os.path.exists(ts_file):
+            return 0
+        return os.path.getsize(ts_file) // DTYPES["Timestamp"].itemsize
+
+    def column(self, name):
+        """Read-only memory-mapped view of a whole column."""
+        rows = len(self)
+        if rows == 0:
+            return np.empty(0, dtype=DTYPES[name])
+        return np.memmap(self._file(name), dtype=DTYPES[name], mode="r", shape=(rows,))
+
+    def first_timestamp(self):
+        """Oldest stored Timestamp, or None if the store is empty."""
+        return int(self.column("Timestamp")[0]) if len(self) else None
+
+    def last_timestamp(self):
+        """Newest stored Timestamp, or None if the store is empty."""
+        return int(self.column("Timestamp")[-1]) if len(self) else None
+
+    def index_range(self, start_ts=None, end_ts=None):
+        """Row slice [lo, hi) with start_ts <= Timestamp <= end_ts (binary search)."""
+        timestamps = self.column("Timestamp")
+        lo = 0 if start_ts is None else int(np.searchsorted(timestamps, start_ts, side="left"))
+        hi = len(timestamps) if end_ts is None else int(np.searchsorted(timestamps, end_ts, side="right"))
+        return lo, max(lo, hi)
+
+    def find_gaps(self, step=60):
+        """
+        Missing rows in a store that should hold one row every 'step' seconds.
+        Returns a list of (first_missing_ts, last_missing_ts), oldest first.
+        """
+        timestamps = self.column("Timestamp")
+        if len(timestamps) < 2:
+            return []
+        jumps = np.nonzero(np.diff(timestamps) > step)[0]
+        return [(int(timestamps[i]) + step, int(timestamps[i + 1]) - step) for i in jumps]
+
+    def read_range(self, start_ts=None, end_ts=None, columns=None):
+        """
+        Return {column: numpy view} for the rows with start_ts <= Timestamp <= end_ts.
+        The views point into the memory map; nothing is copied or parsed.
+        """
+        lo, hi = self.index_range(start_ts, end_ts)
+        return {name: self.column(name)[lo:hi] for name in (columns or COLUMNS)}
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def _truncate_to(self, rows):
+        """Cut columns left longer than Timestamp by an interrupted append."""
+        for name in COLUMNS:
+            path = self._file(name)
+            size = rows * DTYPES[name].itemsize
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+    def append(self, data):
+        """
+        Append rows (a DataFrame or a dict of equal-length arrays, sorted by
+        Timestamp). Rows not newer than the last stored Timestamp are skipped.
+        Returns the number of appended rows.
+        """
+        timestamps = np.asarray(data["Timestamp"], dtype=DTYPES["Timestamp"])
+        last_ts = self.last_timestamp()
+        start = 0 if last_ts is None else int(np.searchsorted(timestamps, last_ts, side="right"))
+        if start >= len(timestamps):
+            return 0
+
+        self._truncate_to(len(self))
+        for name in COLUMNS[1:] + ["Timestamp"]:
+            values = np.asarray(data[name], dtype=DTYPES[name])[start:]
+            with open(self._file(name), "ab") as f:
+                f.write(values.tobytes())
+        return len(timestamps) - start
+
+    def upsert(self, data):
+        """
+        Like merge(), but rows whose Timestamps match a contiguous run of
+        stored rows are overwritten in place instead of rewriting the store
+        (bars that are still filling up, see kline_pyramid.py); newer rows are
+        appended. Returns the number of rows the store grew by.
+        """
+        timestamps = np.asarray(data["Timestamp"], dtype=DTYPES["Timestamp"])
+        last_ts = self.last_timestamp()
+        if len(timestamps) == 0 or last_ts is None or timestamps[0] > last_ts:
+            return self.append(data)
+
+        stored = self.column("Timestamp")
+        lo = int(np.searchsorted(stored, timestamps[0], side="left"))
+        count = int(np.searchsorted(timestamps, last_ts, side="right"))
+        if not np.array_equal(stored[lo:lo + count], timestamps[:count]):
+            return self.merge(data)
+
+        # Timestamps are unchanged, so the row count stays valid meanwhile
+        for name in COLUMNS[1:]:
+            values = np.asarray(data[name], dtype=DTYPES[name])[:count]
+            with open(self._file(name), "r+b") as f:
+                f.seek(lo * DTYPES[name].itemsize)
+                f.write(values.tobytes())
+        return self.append(data)
+
+    def append_row(self, row):
+        """Append a single kline given as a sequence in COLUMNS order."""
+        return self.append({name: [value] for name, value in zip(COLUMNS, row)})
+
+    def rewrite(self, data):
+        """
+        Replace the whole store with 'data' (sorted, unique Timestamps). The new
+        columns are written to a sibling directory which is then swapped in.
+        """
+        tmp_path = f"{self.path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in COLUMNS[1:] + ["Timestamp"]:
+            np.asarray(data[name], dtype=DTYPES[name]).tofile(os.path.join(tmp_path, f"{name}.bin"))
+        self._swap_in(tmp_path)
+
+    def _swap_in(self, tmp_path):
+        """Replace the store's directory with the store at tmp_path."""
+        old_path = f"{self.path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(self.path, old_path)
+        os.replace(tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def merge(self, data):
+        """
+        Insert rows anywhere in the store. Rows newer than the last Timestamp
+        are simply appended; otherwise the stored and new rows are combined,
+        deduplicated on Timestamp (new rows win) and the store is rewritten.
+        Returns the number of rows the store grew by.
+        """
+        timestamps = np.asarray(data["Timestamp"], dtype=DTYPES["Timestamp"])
+        if len(timestamps) == 0:
+            return 0
+        last_ts = self.last_timestamp()
+        if last_ts is None or timestamps.min() > last_ts:
+            order = np.argsort(timestamps, kind="stable")
+            return self.append({name: np.asarray(data[name])[order] for name in COLUMNS})
+
+        before = len(self)
+        stored = self.read_range()
+        combined_ts = np.concatenate([timestamps, stored["Timestamp"]])
+        # np.unique keeps the first occurrence, i.e. the new row on a tie
+        _, first = np.unique(combined_ts, return_index=True)
+        merged = {
+            name: np.concatenate([np.asarray(data[name], dtype=DTYPES[name]), stored[name]])[first]
+            for name in COLUMNS
+        }
+        self.rewrite(merged)
+        return len(self) - before
+
+    def merge_store(self, other, chunk_rows=1_000_000, keep_stored=False):
+        """
+        Merge every row of the store 'other' in, deduplicated on Timestamp
+        (its rows win unless keep_stored). Unlike merge(), nothing is loaded
+        whole: 'other' is walked chunk_rows rows at a time together with the
+        stored rows of the same time span, and the merged rows are appended to
+        a sibling store which is then swapped in. Rows newer than the last
+        Timestamp are simply appended. Returns the number of rows the store
+        grew by.
+        """
+        other_ts = other.column("Timestamp")
+        if len(other_ts) == 0:
+            return 0
+        before = len(self)
+        last_ts = self.last_timestamp()
+        if last_ts is None or other_ts[0] > last_ts:
+            for lo in range(0, len(other_ts), chunk_rows):
+                self.append({name: other.column(name)[lo:lo + chunk_rows] for name in COLUMNS})
+            return len(self) - before
+
+        tmp_path = f"{self.path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        merged = KlineStore(tmp_path)
+        stored_ts = self.column("Timestamp")
+        stored_lo = 0
+        for lo in range(0, len(other_ts), chunk_rows):
+            hi = min(lo + chunk_rows, len(other_ts))
+            # The stored rows up to this chunk's last Timestamp (all the rest after the last chunk)
+            stored_hi = len(stored_ts) if hi == len(other_ts) else int(
+                np.searchsorted(stored_ts, other_ts[hi - 1], side="right"))
+            parts = [(other, lo, hi), (self, stored_lo, stored_hi)]
+            if keep_stored:
+                parts.reverse()
+            # np.unique keeps the first occurrence, i.e. the winning row on a tie
+            _, first = np.unique(np.concatenate([store.column("Timestamp")[a:b] for store, a, b in parts]),
+                                 return_index=True)
+            merged.append({name: np.concatenate([store.column(name)[a:b] for store, a, b in parts])[first]
+                           for name in COLUMNS})
+            stored_lo = stored_hi
+        self._swap_in(tmp_path)
+        return len(self) - before
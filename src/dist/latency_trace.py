@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from kline_store import KlineStore, is_store
+
+# ----------------------------------------------------------------------------
+# Latency tracing from kline close to order fill
+#
+# Every closed kline of the traded pair gets a trace ID, "<PAIR>-<open time>",
+# and each process on its way to an order appends one line per hop it
+# passes to TRACE_FILE:
+#
+#   <trace id> <hop> <unix time, seconds>
+#
+# Hops, in path order:
+#   close      kline close time (exchange clock)      keep-fetching.py
+#   event      WebSocket event time (exchange clock)  keep-fetching.py
+#   receive    on_message called                      keep-fetching.py
+#   append     kline in the store and the CSV         keep-fetching.py
+#   signal     streaming engine decided (--stream)    keep-fetching.py
+#   recompute  scheduler started on the new bar       scheduler.py
+#   stage:*    a stage finished                       scheduler.py
+#   trades     trades.txt written                     scheduler.py
+#   pickup     trades.txt read                        execute_orders
+#   dispatch   order script started                   execute_orders / stream_engine.py
+#   submit     order request sent                     buy20_beta2.py / sell20_beta2.py
+#   fill       order filled (exchange transactTime)   buy20_beta2.py / sell20_beta2.py
+#
+# The recompute stages and the order scripts don't see the kline: the
+# scheduler names its run after the newest bar of the input_file and hands
+# the ID on in TRACE_ID_FILE, which execute_orders and the order scripts
+# read. Exchange times are only comparable to local ones on a synced clock
+# (see docs/chrony.md); the order scripts correct the fill time by the
+# offset they measure.
+#
+# Tracing is on with "trace_latency": true in the config. The report takes
+# the first time each hop was passed per trace and prints the time since
+# the hop before it (p50 / p95 / p99):
+#
+#   python3 latency_trace.py --hours 24
+# ----------------------------------------------------------------------------
+
+DIST = os.path.dirname(os.path.abspath(__file__))
+TRACE_FILE = os.path.join(DIST, "../view/output/latency_trace.log")
+TRACE_ID_FILE = os.path.join(DIST, "../view/output/trace_id.txt")
+REPORT_FILE = os.path.join(DIST, "../view/output/latency_report.txt")
+
+HOPS = ["close", "event", "receive", "append", "signal", "recompute", "stage:*",
+        "trades", "pickup", "dispatch", "submit", "fill"]
+
+enabled = False
+
+
+def enable(config):
+    """Turn tracing on in this process if the config asks for it."""
+    global enabled
+    enabled = bool(config.get("trace_latency", False))
+    return enabled
+
+
+def trace_id(pair, timestamp):
+    return f"{pair.upper()}-{int(timestamp)}"
+
+
+def record(trace, hop, at=None):
+    """Append one hop of 'trace' ('at' defaults to now); a no-op while tracing is off."""
+    if not enabled or trace is None:
+        return
+    # One short write in append mode: lines of concurrent processes don't interleave
+    with open(TRACE_FILE, "a") as f:
+        f.write(f"{trace} {hop} {time.time() if at is None else at:.6f}\n")
+
+
+def record_fill(trace, order, time_offset_ms=0):
+    """The "fill" hop of an order response: its transactTime on the local clock."""
+    transact_time = order.get("transactTime") if order else None
+    record(trace, "fill", None if transact_time is None else (transact_time - time_offset_ms) / 1000)
+
+
+def set_current(trace):
+    """Hand 'trace' on to the processes started after this one."""
+    if not enabled or trace is None:
+        return
+    tmp_path = TRACE_ID_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(trace + "\n")
+    os.replace(tmp_path, TRACE_ID_FILE)
+
+
+def current():
+    """The trace ID of the latest signal, or None."""
+    if not enabled or not os.path.exists(TRACE_ID_FILE):
+        return None
+    with open(TRACE_ID_FILE, "r") as f:
+        return f.read().strip() or None
+
+
+def newest_bar(input_file):
+    """Open time of the last kline of a kline store or '|' separated CSV, or None."""
+    if is_store(input_file):
+        return KlineStore(input_file).last_timestamp()
+    if not os.path.exists(input_file) or os.path.getsize(input_file) == 0:
+        return None
+    with open(input_file, "rb") as f:
+        f.seek(max(0, os.path.getsize(input_file) - 4096))
+        lines = f.read().splitlines()
+    try:
+        return int(lines[-1].split(b"|")[0])
+    except (ValueError, IndexError):
+        return None
+
+
+# ----------------------------------------------------------------------------
+# Report
+# ----------------------------------------------------------------------------
+def read_traces(path=TRACE_FILE, since=None):
+    """{trace: {hop: first time}} of the lines at or after 'since'."""
+    traces = {}
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 3:
+                continue
+            trace, hop, at = parts[0], parts[1], float(parts[2])
+            if since is not None and at < since:
+                continue
+            hops = traces.setdefault(trace, {})
+            if hop not in hops or at < hops[hop]:
+                hops[hop] = at
+    return traces
+
+
+def hop_rank(hop):
+    """Position of 'hop' on the path; unknown hops go last."""
+    hop = "stage:*" if hop.startswith("stage:") else hop
+    return HOPS.index(hop) if hop in HOPS else len(HOPS)
+
+
+def hop_latencies(traces):
+    """
+    {hop: [seconds since the previous hop of the same trace]} plus "total",
+    close (or the first hop) to the last one.
+    """
+    latencies = {}
+    for hops in traces.values():
+        # Path order; the stages in the order they finished
+        path = sorted(hops.items(), key=lambda item: (hop_rank(item[0]), item[1]))
+        for (_, before), (hop, at) in zip(path, path[1:]):
+            latencies.setdefault(hop, []).append(at - before)
+        if len(path) > 1:
+            latencies.setdefault("total", []).append(path[-1][1] - path[0][1])
+    return latencies
+
+
+def format_report(latencies):
+    # Stages in the order they first finished
+    names = sorted((hop for hop in latencies if hop != "total"), key=hop_rank)
+    lines = [f"{'hop':<32} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}"]
+    for hop in names + (["total"] if "total" in latencies else []):
+        ms = np.array(latencies[hop]) * 1000.0
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        lines.append(f"{hop:<32} {len(ms):>6} {p50:>10.1f} {p95:>10.1f} {p99:>10.1f} {ms.max():>10.1f}")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-hop latency report of the trace log.")
+    parser.add_argument("--hours", type=float, default=None, help="Only the traces of the last N hours (default: all).")
+    args = parser.parse_args()
+
+    if not os.path.exists(TRACE_FILE):
+        print(f"No trace log at {TRACE_FILE}; set \"trace_latency\": true in the config.")
+        return
+    since = time.time() - args.hours * 3600 if args.hours is not None else None
+    traces = read_traces(since=since)
+    report = format_report(hop_latencies(traces))
+    with open(REPORT_FILE, "w") as f:
+        f.write(report)
+    print(report, end="")
+    print(f"{len(traces)} traces, report written to {REPORT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
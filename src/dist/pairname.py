@@ -5,11 +5,8 @@ import json5
 json_file = "apikey-crypto.json"
 ASSET_FILE = "../view/output/pairname.txt"
 
-try:
-    # Load the JSON file
-    with open(json_file, 'r') as file:
-        config = json5.load(file)
 
+def write_pairname(config, path=ASSET_FILE):
     # Get the 'pair' from the JSON configuration
     pair = config.get("pair")
     exchange = config.get("exchange")
@@ -17,17 +14,30 @@ try:
         raise ValueError("Key 'pair' not found in the JSON file.")
 
     # Ensure the output directory exists
-    os.makedirs(os.path.dirname(ASSET_FILE), exist_ok=True)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
 
     # Write the pair to the file
-    with open(ASSET_FILE, 'w') as file:
+    with open(path, 'w') as file:
         file.write(pair+' '+exchange)
 
-    #print(f"Pair '{pair}' has been successfully written to {ASSET_FILE}")
 
-except FileNotFoundError:
-    print(f"Error: The file '{json_file}' does not exist.")
-except ValueError as e:
-    print(f"Error: {e}")
-except Exception as e:
-    print(f"An unexpected error occurred: {e}")
+def main():
+    try:
+        # Load the JSON file
+        with open(json_file, 'r') as file:
+            config = json5.load(file)
+
+        write_pairname(config)
+
+        #print(f"Pair '{pair}' has been successfully written to {ASSET_FILE}")
+
+    except FileNotFoundError:
+        print(f"Error: The file '{json_file}' does not exist.")
+    except ValueError as e:
+        print(f"Error: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+
+if __name__ == "__main__":
+    main()
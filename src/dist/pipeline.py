@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+import pandas as pd
+
+import compute_asset
+import compute_instaspeed
+import compute_instaspeed_abs
+import compute_linreg
+import compute_poly_reg
+import compute_polyupdown
+import compute_trades_complex
+import pairname
+
+# ----------------------------------------------------------------------------
+# Single-process pipeline
+#
+# Runs the compute stages (compute_asset -> compute_poly_reg ->
+# compute_instaspeed -> compute_polyupdown -> compute_instaspeed_abs ->
+# compute_linreg -> compute_trades_complex) as functions on numpy arrays,
+# reading the config once and nothing back from disk. The text files in
+# ../view/output are only written at the end, as exports for the viewer and
+# execute_orders.py, and are the same files the scripts write.
+#
+# STAGES declares every stage: the function computing it, the arrays it
+# reads ("inputs") and produces ("outputs") in the shared data dict, the
+# config keys and source files it depends on and the function writing its
+# text files ("exports"). run_pipeline() runs them in order; scheduler.py
+# runs the same stages as a cached dependency graph, which is what
+# recompute.py starts.
+#
+#   python3 pipeline.py
+# ----------------------------------------------------------------------------
+
+
+def out(name):
+    return f"../view/output/{name}"
+
+
+# ----------------------------------------------------------------------------
+# Stages: function(config, data) -> {output: value}
+# ----------------------------------------------------------------------------
+def asset_stage(config, data):
+    """The rows of asset.txt, then sorted by time for the indicators."""
+    columns = compute_asset.read_asset(config)
+    raw_ts = np.asarray(columns["Timestamp"], dtype=np.int64)
+    raw_price = np.asarray(columns[compute_asset.PRICE_COLUMN], dtype=float)
+    order = np.argsort(raw_ts, kind="stable")
+    return {"raw_ts": raw_ts, "raw_price": raw_price, "timestamps": raw_ts[order], "prices": raw_price[order]}
+
+
+def poly_reg_stage(config, data):
+    """Super smoother + rolling polynomial regression."""
+    _, lsma = compute_poly_reg.compute_lsma(data["prices"], compute_poly_reg.polyreg_params(config))
+    return {"lsma": lsma}
+
+
+def instaspeed_stage(config, data):
+    """Acceleration of the LSMA."""
+    acc_ts, acc = compute_instaspeed.compute_acceleration(data["timestamps"], data["lsma"])
+    return {"acc_ts": acc_ts, "acc": acc}
+
+
+def polyupdown_stage(config, data):
+    """Up / down split of the polyreg rows and its segment table."""
+    is_up, is_down = compute_polyupdown.split_updown(data["timestamps"], data["acc_ts"], data["acc"])
+    return {"is_up": is_up, "is_down": is_down, "segments": compute_polyupdown.segment_table(is_up, is_down)}
+
+
+def instaspeed_abs_stage(config, data):
+    """At most 3 strongly accelerating bars per up / down segment."""
+    timestamps = data["timestamps"]
+    df_polyreg = compute_instaspeed_abs.polyreg_acceleration(pd.DataFrame({"Timestamp": timestamps, "LSMA": data["lsma"]}))
+    abs_up = compute_instaspeed_abs.filter_updown_by_acceleration(
+        timestamps, data["is_up"], df_polyreg, compute_instaspeed_abs.THRESHOLD, mode="up")
+    abs_down = compute_instaspeed_abs.filter_updown_by_acceleration(
+        timestamps, data["is_down"], df_polyreg, compute_instaspeed_abs.THRESHOLD, mode="down")
+    return {"abs_up": abs_up, "abs_down": abs_down}
+
+
+def linreg_stage(config, data):
+    """Linear regression per segment."""
+    up_bounds, down_bounds = compute_polyupdown.table_bounds(data["timestamps"], data["segments"])
+    return {"linreg": compute_linreg.compute_linreg(data["timestamps"], data["prices"], up_bounds, down_bounds)}
+
+
+def trades_stage(config, data):
+    fit, timestamps = data["linreg"], data["timestamps"]
+    return {"trades": compute_trades_complex.compute_trades(
+        timestamps, data["prices"], fit["start_ts"], fit["slope"], data["acc_ts"], data["acc"], timestamps,
+        data["segments"])}
+
+
+# ----------------------------------------------------------------------------
+# Exports: function(config, data) writing a stage's text files
+# ----------------------------------------------------------------------------
+def export_pairname(config, data):
+    # Reported like pairname.py does: a config without pair / exchange doesn't stop the exports
+    try:
+        pairname.write_pairname(config)
+    except ValueError as e:
+        print(f"Error: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+
+def export_asset(config, data):
+    compute_asset.write_asset({"Timestamp": data["raw_ts"], compute_asset.PRICE_COLUMN: data["raw_price"]})
+    compute_asset.write_coarser_levels(config)
+
+
+def export_poly_reg(config, data):
+    compute_poly_reg.write_polyreg(data["timestamps"], data["lsma"])
+    # polyreg.txt no longer matches compute_poly_reg.py's incremental checkpoint
+    compute_poly_reg.drop_state()
+
+
+def export_instaspeed(config, data):
+    compute_instaspeed.write_acceleration(data["acc_ts"], data["acc"])
+
+
+def export_polyupdown(config, data):
+    timestamps, lsma = data["timestamps"], data["lsma"]
+    compute_polyupdown.write_updown(compute_polyupdown.POLYUP_FILE, timestamps, lsma, data["is_up"])
+    compute_polyupdown.write_updown(compute_polyupdown.POLYDOWN_FILE, timestamps, lsma, data["is_down"])
+    compute_polyupdown.write_segment_table(data["segments"])
+
+
+def export_instaspeed_abs(config, data):
+    timestamps, lsma = data["timestamps"], data["lsma"]
+    compute_instaspeed_abs.write_filtered_updown(
+        compute_instaspeed_abs.POLYACC_FILE_UP, timestamps, lsma, data["is_up"], data["abs_up"])
+    compute_instaspeed_abs.write_filtered_updown(
+        compute_instaspeed_abs.POLYACC_FILE_DOWN, timestamps, lsma, data["is_down"], data["abs_down"])
+
+
+def export_linreg(config, data):
+    compute_linreg.write_linreg(data["timestamps"], data["linreg"])
+
+
+def export_trades(config, data):
+    compute_trades_complex.write_trades(data["trades"], compute_trades_complex.trades_file)
+
+
+# In dependency order. "code" lists the source files besides the stage's
+# own module whose change invalidates it (see scheduler.py).
+STAGES = [
+    {"name": "pairname", "run": None, "export": export_pairname,
+     "code": ["pairname.py"], "config": ["pair", "exchange"],
+     "inputs": [], "outputs": [], "exports": [out("pairname.txt")]},
+    {"name": "compute_asset", "run": asset_stage, "export": export_asset,
+     "code": ["compute_asset.py", "kline_store.py", "kline_pyramid.py"],
+     "config": ["input_file", "start_date", "end_date", "timeframe"], "input_file": True,
+     "inputs": [], "outputs": ["raw_ts", "raw_price", "timestamps", "prices"], "exports": [out("asset.txt")]},
+    {"name": "compute_poly_reg", "run": poly_reg_stage, "export": export_poly_reg,
+     "code": ["compute_poly_reg.py", "super_smoother.py", "polyreg_engine.py"],
+     "config": ["use_filt", "filt_per", "per", "order", "calc_offs", "ndev", "equ_from"],
+     "inputs": ["prices", "timestamps"], "outputs": ["lsma"], "exports": [out("polyreg.txt")]},
+    {"name": "compute_instaspeed", "run": instaspeed_stage, "export": export_instaspeed,
+     "code": ["compute_instaspeed.py"], "config": [],
+     "inputs": ["timestamps", "lsma"], "outputs": ["acc_ts", "acc"], "exports": [out("polyacc.txt")]},
+    {"name": "compute_polyupdown", "run": polyupdown_stage, "export": export_polyupdown,
+     "code": ["compute_polyupdown.py"], "config": [],
+     "inputs": ["timestamps", "lsma", "acc_ts", "acc"], "outputs": ["is_up", "is_down", "segments"],
+     "exports": [out("polyup.txt"), out("polydown.txt"), out("polysegments.txt")]},
+    {"name": "compute_instaspeed_abs", "run": instaspeed_abs_stage, "export": export_instaspeed_abs,
+     "code": ["compute_instaspeed_abs.py"], "config": [],
+     "inputs": ["timestamps", "lsma", "is_up", "is_down"], "outputs": ["abs_up", "abs_down"],
+     "exports": [out("polyacc_abs_up.txt"), out("polyacc_abs_down.txt")]},
+    {"name": "compute_linreg", "run": linreg_stage, "export": export_linreg,
+     "code": ["compute_linreg.py", "compute_polyupdown.py"], "config": [],
+     "inputs": ["timestamps", "prices", "segments"], "outputs": ["linreg"],
+     "exports": [out("linreg.txt"), out("linreg_slopes.txt")]},
+    {"name": "compute_trades_complex", "run": trades_stage, "export": export_trades, "hop": "trades",
+     "code": ["compute_trades_complex.py"], "config": [],
+     "inputs": ["timestamps", "prices", "linreg", "acc_ts", "acc", "segments"], "outputs": ["trades"],
+     "exports": [out("trades.txt")]},
+]
+
+
+def run_pipeline(config, timings=None):
+    """
+    Every stage in memory. Returns a dict of the intermediate arrays;
+    'timings' (a dict) receives the seconds spent per stage.
+    """
+    timings = {} if timings is None else timings
+    data = {}
+    for stage in STAGES:
+        if stage["run"] is None:
+            continue
+        started = time.perf_counter()
+        data.update(stage["run"](config, data))
+        timings[stage["name"]] = time.perf_counter() - started
+    return data
+
+
+def export(config, result, timings=None):
+    """Write the text files of ../view/output from a run_pipeline result."""
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    for stage in STAGES:
+        stage["export"](config, result)
+    timings["export"] = time.perf_counter() - started
+
+
+def main():
+    config = compute_asset.load_config()
+    timings = {}
+    result = run_pipeline(config, timings)
+    export(config, result, timings)
+
+    print(" ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()))
+    print(f"Pipeline: {len(result['timestamps'])} bars, {len(result['trades'])} trades "
+          f"in {sum(timings.values()):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# ----------------------------------------------------------------------------
+# Rolling polynomial regression (LSMA)
+#
+# For bar i the window is prices[i-equ_from-per+1 : i-equ_from+1], fitted
+# with a polynomial of degree 'order' on x = 1..per and evaluated at
+# x = per - (calc_offs - equ_from). The fit is least squares, so the value
+# at that x is a fixed linear combination of the window:
+#
+#   lsma[i] = w . window,   w = X (X'X)^-1 e,   e = (1, x, x^2, ...)
+#
+# The weights are computed once and applied to every window in one pass.
+# ----------------------------------------------------------------------------
+
+
+def lsma_weights(per, order, calc_offs=0, equ_from=0):
+    """Weights of the 'per' window values (oldest first) in the fitted value."""
+    x = np.arange(1, per+1, dtype=float)
+    powers = np.arange(order + 1)
+    X = x[:, None] ** powers                        # per x (order+1)
+    final_x = float(per) - (calc_offs - equ_from)
+    e = final_x ** powers
+    # X'X is symmetric, so e (X'X)^-1 X' = X (X'X)^-1 e
+    return X @ np.linalg.solve(X.T @ X, e)
+
+
+def rolling_poly_reg(prices, per, order, calc_offs=0, equ_from=0):
+    """
+    LSMA of 'prices' (Series or array). Bars without a full window are NaN.
+    Returns a numpy array of the same length.
+    """
+    src = np.asarray(prices, dtype=float)
+    N = len(src)
+    out = np.full(N, np.nan)
+    if per < 1 or N < per:
+        return out
+
+    fitted = sliding_window_view(src, per) @ lsma_weights(per, order, calc_offs, equ_from)
+
+    # fitted[s] belongs to the window starting at s, i.e. bar s + per - 1 + equ_from
+    first = per - 1 + equ_from
+    lo = max(0, -first)
+    hi = min(len(fitted), N - first)
+    if lo < hi:
+        out[first + lo:first + hi] = fitted[lo:hi]
+    return out
+
+
+# ----------------------------------------------------------------------------
+# Reference implementation: fit every window separately via LU decomposition
+# of the normal equations (the original per-bar loop of compute_poly_reg.py).
+# ----------------------------------------------------------------------------
+
+def get_val(mat, r, c, rowlen):
+    return mat[r * rowlen + c]
+
+def set_val(mat, r, c, rowlen, val):
+    mat[r * rowlen + c] = val
+
+def lu_decompose(A, B_size):
+    L = [np.nan]*(B_size**2)
+    U = [np.nan]*(B_size**2)
+
+    # First row of U, first column of L
+    for c in range(B_size):
+        set_val(U, 0, c, B_size, get_val(A, 0, c, B_size))
+    set_val(L, 0, 0, B_size, 1.0)
+    denom0 = get_val(U, 0, 0, B_size)
+    for r in range(1, B_size):
+        val_r0 = get_val(A, r, 0, B_size) / denom0
+        set_val(L, r, 0, B_size, val_r0)
+
+    for r in range(B_size):
+        for c in range(B_size):
+            if r == c:
+                set_val(L, r, c, B_size, 1.0)
+            if r < c:
+                set_val(L, r, c, B_size, 0.0)
+            if r > c:
+                set_val(U, r, c, B_size, 0.0)
+
+    for r in range(B_size):
+        for c in range(B_size):
+            if np.isnan(get_val(L, r, c, B_size)) and r > c:
+                temp = get_val(A, r, c, B_size)
+                for k in range(c):
+                    temp -= get_val(U, k, c, B_size)*get_val(L, r, k, B_size)
+                val_rc = temp / get_val(U, c, c, B_size)
+                set_val(L, r, c, B_size, val_rc)
+
+            if np.isnan(get_val(U, r, c, B_size)) and r <= c:
+                temp = get_val(A, r, c, B_size)
+                for k in range(r):
+                    temp -= get_val(U, k, c, B_size)*get_val(L, r, k, B_size)
+                set_val(U, r, c, B_size, temp)
+
+    return (L, U)
+
+def forward_substitution(L, B):
+    B_size = len(B)
+    Y = [0.0]*B_size
+    Y[0] = B[0] / get_val(L, 0, 0, B_size)
+    for r in range(1, B_size):
+        temp = B[r]
+        for k in range(r):
+            temp -= get_val(L, r, k, B_size)*Y[k]
+        denom = get_val(L, r, r, B_size)
+        Y[r] = temp / denom
+    return Y
+
+def backward_substitution(U, Y):
+    B_size = len(Y)
+    X = [0.0]*B_size
+    X[B_size-1] = Y[B_size-1] / get_val(U, B_size-1, B_size-1, B_size)
+    for r in range(B_size-2, -1, -1):
+        temp = Y[r]
+        for k in range(r+1, B_size):
+            temp -= get_val(U, r, k, B_size) * X[k]
+        denom = get_val(U, r, r, B_size)
+        X[r] = temp / denom
+    return X
+
+def solve_poly_reg(x_array, y_array, poly_order):
+    x_powsums = [np.sum(x_array**k) for k in range(2*poly_order + 1)]
+    xy_powsums = [np.sum((x_array**k)*y_array) for k in range(poly_order + 1)]
+
+    size_mat = (poly_order+1)**2
+    xp_matrix = [0.0]*size_mat
+
+    for r in range(poly_order+1):
+        for c in range(poly_order+1):
+            val = x_powsums[r + c]
+            set_val(xp_matrix, r, c, (poly_order+1), val)
+
+    L, U = lu_decompose(xp_matrix, poly_order+1)
+    Y_sol = forward_substitution(L, xy_powsums)
+    coefs = backward_substitution(U, Y_sol)
+    return coefs
+
+def evaluate_polynomial(coefs, x):
+    val = 0.0
+    for i, c in enumerate(coefs):
+        val += c * (x**i)
+    return val
+
+def rolling_poly_reg_loop(prices, per, order, calc_offs=0, equ_from=0):
+    """Same result as rolling_poly_reg(), one LU solve per bar."""
+    prices_np = np.asarray(prices, dtype=float)
+    N = len(prices_np)
+    out = np.full(N, np.nan)
+    x_array = np.arange(1, per+1, dtype=float)
+    # Evaluate at x = per - (calc_offs - equ_from).
+    final_x = float(per) - (calc_offs - equ_from)
+
+    for i in range(N):
+        if i - per + 1 - equ_from < 0:
+            continue
+        fit_end = i - equ_from
+        fit_start = fit_end - (per - 1)
+        window_prices = prices_np[fit_start : fit_end+1]
+        if len(window_prices) < per:
+            continue
+        coefs = solve_poly_reg(x_array, window_prices, order)
+        out[i] = evaluate_polynomial(coefs, final_x)
+    return out
@@ -14,19 +14,12 @@ command = ["sudo", "cp", "-r", "../view/*", "/usr/share/caddy"]
 # dont do this because you need the last_timestamp.txt
 
 # Execute the commands
-os.system("sudo python3 ./equity.py")
-os.system("sudo python3 ./pairname.py")
-os.system("sudo python3 ./compute_asset.py")
-os.system("sudo python3 ./compute_poly_reg.py")
-os.system("sudo python3 ./compute_instaspeed.py")
-os.system("sudo python3 ./compute_instaspeed_abs.py")
-os.system("sudo python3 ./compute_polyupdown.py")
-os.system("sudo python3 ./compute_linreg.py")
+# equity.py next to the cached in-memory stages of pipeline.py (see scheduler.py)
+os.system("sudo python3 ./scheduler.py")
 #os.system("python3 ./compute_ema.py")
 #os.system("python3 ./compute_sma.py")
 #os.system("python3 ./slopedirection.py")
 #os.system("python3 ./compute_ema_micro.py")
-os.system("sudo python3 ./compute_trades_complex.py")
 # os.system("python3 ./compute_trades_ema_algo_minloss.py")
 # os.system("python3 ./compute_margin_requirement.py")
 #os.system("python3 ./tradedirectionfilter.py") #filters non-steep
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import pickle
+import runpy
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import redirect_stdout
+
+import json5
+
+import latency_trace
+import pipeline
+
+# ----------------------------------------------------------------------------
+# Dependency-graph scheduler for the recompute stages
+#
+# The graph's nodes are the stages of pipeline.py: functions passing numpy
+# arrays to each other in memory, a stage depending on the stages producing
+# the arrays it reads. They run in this process in dependency order; the
+# only separate process is equity.py, which talks to Binance and runs on
+# the pool next to them. Each stage's text files are written by its export
+# on the same pool as soon as the stage is computed, so the exports (most
+# of a run) overlap each other and the stages after them. With a single
+# worker the exports run in this process, between the stages: shipping the
+# arrays to a worker only pays off when it has a CPU of its own.
+#
+# A stage is skipped, compute and export, when the hash of its inputs (the
+# digests of the arrays of the stages it reads, its config values, the
+# input_file and the source of its modules) matches the one recorded after
+# its last successful run and its exports still exist. Its arrays are then
+# loaded from the pickle left in CACHE_DIR, only if a stage after it runs.
+# A stage rerun with the same result (a new bar outside every window, say)
+# keeps its digest and the stages after it cached.
+#
+# Each run appends one line per stage to TIMINGS_FILE and, with
+# "trace_latency" set, the stages it ran to the latency trace of the newest
+# bar (see latency_trace.py; a stage's "hop" names it there).
+#
+#   python3 scheduler.py            # what recompute.py runs
+#   python3 scheduler.py --force    # ignore the cache
+# ----------------------------------------------------------------------------
+
+CONFIG_FILE = "apikey-crypto.json"
+OUTPUT_DIR = "../view/output"
+CACHE_FILE = f"{OUTPUT_DIR}/stage_cache.json"
+CACHE_DIR = f"{OUTPUT_DIR}/stage_cache"
+TIMINGS_FILE = f"{OUTPUT_DIR}/stage_timings.csv"
+
+# Stages run as scripts in a process of the pool
+SCRIPTS = [
+    # Talks to Binance: nothing to hash, always runs
+    {"name": "equity", "script": "equity.py"},
+]
+
+
+def dependencies(stages):
+    """{stage name: set of stage names producing one of its inputs}."""
+    producers = {key: stage["name"] for stage in stages for key in stage["outputs"]}
+    return {stage["name"]: {producers[key] for key in stage["inputs"] if key in producers}
+            for stage in stages}
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def input_file_signature(path):
+    """
+    Size and modification time of the input_file (or of every column file of a
+    kline store): the realtime CSV and the stores only grow, and hashing gigabytes
+    every cycle would cost more than the stages it saves.
+    """
+    if os.path.isdir(path):
+        return sorted((name, st.st_size, st.st_mtime_ns)
+                      for name in os.listdir(path) for st in [os.stat(os.path.join(path, name))])
+    if os.path.exists(path):
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    return None
+
+
+def stage_key(stage, config, upstream):
+    """Hash of everything the stage's arrays and exports depend on; 'upstream' holds the digests of its inputs."""
+    h = hashlib.sha256(stage["name"].encode())
+    for path in ["pipeline.py"] + stage["code"]:
+        h.update(file_digest(path).encode())
+    h.update(json.dumps({key: config.get(key) for key in stage["config"]}, sort_keys=True).encode())
+    if stage.get("input_file"):
+        h.update(json.dumps(input_file_signature(config.get("input_file", ""))).encode())
+    for digest in upstream:
+        h.update(digest.encode())
+    return h.hexdigest()
+
+
+def cache_path(name):
+    return f"{CACHE_DIR}/{name}.pkl"
+
+
+def save_outputs(name, outputs):
+    """Pickle a stage's arrays to CACHE_DIR and return their digest."""
+    blob = pickle.dumps(outputs, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path = cache_path(name) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(blob)
+    os.replace(tmp_path, cache_path(name))
+    return hashlib.sha256(blob).hexdigest()
+
+
+def load_outputs(name):
+    with open(cache_path(name), "rb") as f:
+        return pickle.load(f)
+
+
+def captured(call, *args):
+    """Run call(*args) and return (ok, seconds, output)."""
+    started = time.perf_counter()
+    buffer = io.StringIO()
+    ok = True
+    try:
+        with redirect_stdout(buffer):
+            call(*args)
+    except SystemExit as e:
+        ok = e.code in (None, 0)
+    except Exception as e:
+        buffer.write(f"{type(e).__name__}: {e}\n")
+        ok = False
+    return ok, time.perf_counter() - started, buffer.getvalue()
+
+
+def run_script(script):
+    """Worker: run a script of this folder as __main__."""
+    return captured(runpy.run_path, script, None, "__main__")
+
+
+def run_export(name, config, data):
+    """Worker: write the text files of the pipeline stage 'name' from its arrays."""
+    stage = next(stage for stage in pipeline.STAGES if stage["name"] == name)
+    return captured(stage["export"], config, data)
+
+
+def load_json(path, default):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def save_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def run_graph(stages=pipeline.STAGES, scripts=SCRIPTS, force=False, workers=None):
+    """
+    Run the scripts and the stages in dependency order. Returns {name: (status, seconds)}
+    with status "ran", "cached", "failed" or "skipped" (an upstream stage failed).
+    """
+    with open(CONFIG_FILE, "r") as f:
+        config = json5.load(f)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    trace = None
+    if latency_trace.enable(config):
+        newest = latency_trace.newest_bar(config.get("input_file", ""))
+        trace = None if newest is None else latency_trace.trace_id(config.get("pair", ""), newest)
+        latency_trace.record(trace, "recompute")
+
+    deps = dependencies(stages)
+    cache = {} if force else load_json(CACHE_FILE, {})
+    results = {}
+    digests = {}
+    data = {}
+    unloaded = set()
+    running = {}
+
+    def finish(future):
+        name, entry, compute_s = running.pop(future)
+        ok, seconds, output = future.result()
+        if output:
+            print(output, end="")
+        results[name] = ("ran" if ok else "failed", compute_s + seconds)
+        if not ok:
+            cache.pop(name, None)
+            return
+        stage = next((stage for stage in stages if stage["name"] == name), {})
+        hop = stage.get("hop", f"stage:{name}")
+        latency_trace.record(trace, hop)
+        if hop == "trades":
+            # execute_orders and the order scripts act on this run's trades.txt
+            latency_trace.set_current(trace)
+        if entry is not None:
+            cache[name] = entry
+
+    workers = workers or min(len(stages) + len(scripts), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for script in scripts:
+            running[pool.submit(run_script, script["script"])] = (script["name"], None, 0.0)
+
+        # The list is in dependency order
+        for stage in stages:
+            name = stage["name"]
+            if any(dep not in digests for dep in deps[name]):
+                results[name] = ("skipped", 0.0)
+                continue
+            started = time.perf_counter()
+            key = stage_key(stage, config, [digests[dep] for dep in sorted(deps[name])])
+            entry = cache.get(name)
+            if (isinstance(entry, dict) and entry.get("key") == key
+                    and all(os.path.exists(path) for path in stage["exports"])
+                    and (not stage["outputs"] or os.path.exists(cache_path(name)))):
+                digests[name] = entry["digest"]
+                unloaded.add(name)
+                results[name] = ("cached", time.perf_counter() - started)
+                continue
+
+            try:
+                for dep in deps[name] & unloaded:
+                    data.update(load_outputs(dep))
+                    unloaded.discard(dep)
+                outputs = stage["run"](config, data) if stage["run"] else {}
+                digest = save_outputs(name, outputs) if outputs else ""
+            except Exception as e:
+                print(f"{name}: {type(e).__name__}: {e}")
+                cache.pop(name, None)
+                results[name] = ("failed", time.perf_counter() - started)
+                continue
+            data.update(outputs)
+            digests[name] = digest
+            arrays = {key: data[key] for key in stage["inputs"] + stage["outputs"]}
+            if workers > 1:
+                future = pool.submit(run_export, name, config, arrays)
+            else:
+                future = Future()
+                future.set_result(run_export(name, config, arrays))
+            running[future] = (name, {"key": key, "digest": digest}, time.perf_counter() - started)
+            if future.done():
+                finish(future)
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                finish(future)
+
+    # A stage whose export failed has no valid files: the ones after it still wrote theirs
+    save_json(CACHE_FILE, cache)
+    order = [script["name"] for script in scripts] + [stage["name"] for stage in stages]
+    results = {name: results[name] for name in order}
+    record_timings(results)
+    return results
+
+
+def record_timings(results):
+    """Append one 'run_time,stage,status,seconds' line per stage."""
+    run_time = int(time.time())
+    new_file = not os.path.exists(TIMINGS_FILE)
+    with open(TIMINGS_FILE, "a") as f:
+        if new_file:
+            f.write("run_time,stage,status,seconds\n")
+        for name, (status, seconds) in results.items():
+            f.write(f"{run_time},{name},{status},{seconds:.4f}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the recompute stages as a dependency graph.")
+    parser.add_argument("--force", action="store_true", help="Rerun every stage, ignoring the cache.")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: one per stage, at most the CPU count).")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = run_graph(force=args.force, workers=args.workers)
+    for name, (status, seconds) in results.items():
+        print(f"{name:<24} {status:<8} {seconds * 1000:8.0f} ms")
+    print(f"Stages finished in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+import compute_asset
+
+# ----------------------------------------------------------------------------
+# Stop-loss and trailing-stop simulation
+#
+# A layer over a trade list (see compute_trades_complex.py): every position,
+# opened by an upstart / downstart and closed by the next upend / downend of
+# its direction (paired as compute_portfolio.simulate_portfolio pairs
+# them), is checked against the High / Low of the bars after its entry bar
+# up to its exit bar. A position whose stop is touched closes on that bar
+# instead, at the stop price, or at the bar's Open when the bar opened
+# beyond the stop. Positions still open are checked up to the last bar.
+#
+# Stop levels of a long (a short mirrors them):
+#   stop loss       entry * (1 - stop_loss)
+#   trailing stop   peak * (1 - trailing), the peak being the highest of
+#                   the entry price and the Highs of the bars before
+# The order of High and Low inside a bar is unknown, so a bar's own High
+# doesn't raise the trailing stop it is checked against.
+#
+# The search is vectorized: the positions are grouped by length into power
+# of two buckets, each bucket's bars gathered into a (positions x bars)
+# block, the trailing peak taken as a cumulative max along the rows and the
+# first touch as an argmax. Nothing loops over bars.
+#
+#   python3 stops.py     # trades.txt with the config's stops -> trades_stops.txt
+# ----------------------------------------------------------------------------
+
+TRADES_FILE = "../view/output/trades.txt"
+STOPPED_TRADES_FILE = "../view/output/trades_stops.txt"
+
+BAR_COLUMNS = ["Timestamp", "Open", "High", "Low"]
+
+
+def stop_params(config):
+    """(stop_loss, trailing) fractions from sl_percentage and trail_percentage; 0 is off."""
+    return float(config.get("sl_percentage") or 0) / 100.0, float(config.get("trail_percentage") or 0) / 100.0
+
+
+def read_bars(config):
+    """Timestamp, Open, High and Low of the config's asset bars, sorted by time."""
+    columns = compute_asset.read_asset(config, columns=BAR_COLUMNS)
+    order = np.argsort(np.asarray(columns["Timestamp"]), kind="stable")
+    return {name: np.asarray(columns[name], dtype=np.int64 if name == "Timestamp" else float)[order]
+            for name in BAR_COLUMNS}
+
+
+def pair_positions(trades):
+    """
+    (open, close, is_long) arrays over the positions of 'trades': the index
+    of the opening and of the closing trade (-1 while still open).
+    """
+    opens, closes, longs = [], [], []
+    positions = {}
+    for i, (_, _, _, label) in enumerate(trades):
+        if label in ("upstart", "downstart"):
+            direction = label[:-5]
+            if direction not in positions:
+                positions[direction] = len(opens)
+                opens.append(i)
+                closes.append(-1)
+                longs.append(direction == "up")
+        elif label in ("upend", "downend") and label[:-3] in positions:
+            closes[positions.pop(label[:-3])] = i
+    return np.array(opens, dtype=np.int64), np.array(closes, dtype=np.int64), np.array(longs, dtype=bool)
+
+
+def first_touch(bars, entry_bar, exit_bar, entry_price, is_long, stop_loss=0.0, trailing=0.0):
+    """
+    The first bar in entry_bar+1 .. exit_bar where each position's stop is
+    touched: (hit, bar, fill price) arrays, bar and price set where hit.
+    """
+    count = len(entry_bar)
+    hit = np.zeros(count, dtype=bool)
+    bar = np.zeros(count, dtype=np.int64)
+    fill = np.zeros(count)
+    if not count or (not stop_loss and not trailing):
+        return hit, bar, fill
+
+    # A short is searched as a long on negated prices, its Low being the favourable side
+    sign = np.where(is_long, 1.0, -1.0)
+    entry = sign * entry_price
+    loss_level = entry * np.where(is_long, 1.0 - stop_loss, 1.0 + stop_loss) if stop_loss else np.full(count, -np.inf)
+    trail_factor = np.where(is_long, 1.0 - trailing, 1.0 + trailing)
+
+    # Bucket e holds the lengths 2^(e-1)+1 .. 2^e: at most half of a block is padding
+    length = np.maximum(exit_bar - entry_bar, 0)
+    bucket = np.frexp(np.maximum(length - 1, 0))[1]
+    for b in np.unique(bucket[length > 0]):
+        rows = np.flatnonzero((bucket == b) & (length > 0))
+        steps = np.arange(1, length[rows].max() + 1)
+        valid = steps <= length[rows, None]
+        idx = np.minimum(entry_bar[rows, None] + steps, exit_bar[rows, None])
+        s = sign[rows, None]
+        long_side = s > 0
+        favourable = np.where(long_side, bars["High"][idx], -bars["Low"][idx])
+        adverse = np.where(long_side, bars["Low"][idx], -bars["High"][idx])
+
+        level = np.broadcast_to(loss_level[rows, None], idx.shape)
+        if trailing:
+            peak = np.maximum.accumulate(np.where(valid, favourable, -np.inf), axis=1)
+            # Peak before each bar: the entry price, then the Highs of the bars before it
+            before = np.empty_like(peak)
+            before[:, 0] = entry[rows]
+            before[:, 1:] = np.maximum(peak[:, :-1], entry[rows, None])
+            level = np.maximum(level, before * trail_factor[rows, None])
+
+        touched = valid & (adverse <= level)
+        first = np.argmax(touched, axis=1)
+        r = np.arange(len(rows))
+        hit[rows] = touched[r, first]
+        bar[rows] = idx[r, first]
+        # At the stop, or at the Open if the bar opened beyond it
+        fill[rows] = np.minimum(level[r, first], s[:, 0] * bars["Open"][idx[r, first]]) * sign[rows]
+    return hit, bar, fill
+
+
+def apply_stops(trades, bars, stop_loss=0.0, trailing=0.0):
+    """
+    'trades' (sorted by timestamp) with every stopped position closed at its
+    stop: its closing trade moves to the stop bar and fill price, or one is
+    added for a position still open. Returns a new list sorted by timestamp.
+    """
+    if not trades or (not stop_loss and not trailing):
+        return trades
+    opens, closes, is_long = pair_positions(trades)
+    if not len(opens):
+        return trades
+
+    timestamps = bars["Timestamp"]
+    trade_ts = np.array([trade[0] for trade in trades], dtype=np.int64)
+    entry_price = np.array([trades[i][2] for i in opens.tolist()], dtype=float)
+    entry_bar = np.searchsorted(timestamps, trade_ts[opens])
+    exit_bar = np.where(closes >= 0, np.searchsorted(timestamps, trade_ts[closes]), len(timestamps) - 1)
+    hit, bar, fill = first_touch(bars, entry_bar, exit_bar, entry_price, is_long, stop_loss, trailing)
+
+    stopped = list(trades)
+    for k in np.flatnonzero(hit).tolist():
+        stop = (int(timestamps[bar[k]]), "sell", float(fill[k]), "upend" if is_long[k] else "downend")
+        if closes[k] >= 0:
+            stopped[closes[k]] = stop
+        else:
+            stopped.append(stop)
+    stopped.sort(key=lambda trade: trade[0])
+    return stopped
+
+
+def main():
+    import compute_portfolio
+    import compute_trades_complex
+
+    config = compute_asset.load_config()
+    stop_loss, trailing = stop_params(config)
+    trades = compute_portfolio.read_trades(TRADES_FILE)
+    stopped = apply_stops(trades, read_bars(config), stop_loss, trailing)
+    compute_trades_complex.write_trades(stopped, STOPPED_TRADES_FILE)
+
+    moved = sum(a != b for a, b in zip(trades, stopped)) + len(stopped) - len(trades)
+    print(f"Stops (loss {stop_loss * 100:g}%, trailing {trailing * 100:g}%): "
+          f"{moved} of {len(trades)} trades changed, written to {STOPPED_TRADES_FILE}")
+
+
+if __name__ == "__main__":
+    main()
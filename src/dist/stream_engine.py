@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+
+import json5
+import numpy as np
+
+import compute_asset
+import compute_instaspeed
+import compute_linreg
+import compute_poly_reg
+import compute_polyupdown
+import compute_trades_complex
+import latency_trace
+from kline_store import COLUMNS
+from polyreg_engine import lsma_weights
+from super_smoother import super_smoother_coefficients
+
+# ----------------------------------------------------------------------------
+# Streaming signal engine
+#
+# Takes the closed klines one at a time and keeps every stage of the batch
+# pipeline (see pipeline.py) up to date incrementally: the last two super
+# smoother outputs, the LSMA window, the previous LSMA for the
+# acceleration, the up / down segments and the trades of the segments that
+# can still change. After each bar it makes the decision execute_orders
+# makes on trades.txt (the last trade, skipping a trailing "tempend", if
+# it is new; close everything if trades disappeared) and returns it as an
+# order intent, without writing or re-reading any file.
+#
+# Every value goes through the same floating point operations as in the
+# batch stages, in the same order, so replayed over the same bars the
+# engine produces the trades run_pipeline() produces on the bars up to each
+# one. The smoother continues with the Python recursion, which is bit for
+# bit the batch smoother when numba is installed (see kernels.py); on the
+# scipy lfilter path the two differ in the last bits.
+#
+# keep-fetching.py --stream runs the engine in its WebSocket callback and
+# launches the order scripts from there (see dispatch()). Check it against
+# the batch pipeline on the config's asset with:
+#
+#   python3 stream_engine.py --replay 500
+# ----------------------------------------------------------------------------
+
+DIST = os.path.dirname(os.path.abspath(__file__))
+NOTES_FILE = "../view/output/notes.json"
+REALTRADES_FILE = "../view/output/realtrades.txt"
+
+# Kline row field the pipeline trades on (see compute_asset.py)
+PRICE_FIELD = COLUMNS.index(compute_asset.PRICE_COLUMN)
+
+
+def indicators(timestamps, prices, params):
+    """(filtered, lsma, acc_ts, acc, table) of the batch stages on sorted arrays."""
+    filtered, lsma = compute_poly_reg.compute_lsma(prices, params)
+    acc_ts, acc = compute_instaspeed.compute_acceleration(timestamps, lsma)
+    is_up, is_down = compute_polyupdown.split_updown(timestamps, acc_ts, acc)
+    return filtered, lsma, acc_ts, acc, compute_polyupdown.segment_table(is_up, is_down)
+
+
+def batch_trades(timestamps, prices, params, min_steepness=compute_trades_complex.MIN_STEEPNESS):
+    """The trades run_pipeline() computes on these sorted bars."""
+    _, _, acc_ts, acc, table = indicators(timestamps, prices, params)
+    fit = compute_linreg.compute_linreg(
+        timestamps, prices, *compute_polyupdown.table_bounds(timestamps, table))
+    return compute_trades_complex.compute_trades(
+        timestamps, prices, fit["start_ts"], fit["slope"], acc_ts, acc, timestamps, table,
+        min_steepness=min_steepness)
+
+
+def decide(last_trades, count, previous_count, last_order_time):
+    """
+    execute_orders' decision on a trade list of 'count' trades ending with
+    'last_trades' (the last two or fewer). Returns an intent dict, or None:
+    close_all is set when there are fewer trades than before, trade is the
+    last trade (the one before a trailing "tempend") unless its timestamp
+    is last_order_time.
+    """
+    trade = None
+    if last_trades:
+        if last_trades[-1][3] != "tempend":
+            trade = last_trades[-1]
+        elif len(last_trades) > 1:
+            trade = last_trades[-2]
+    if trade is not None and trade[0] == last_order_time:
+        trade = None
+    close_all = count < previous_count
+    if trade is None and not close_all:
+        return None
+    return {"close_all": close_all, "trade": trade}
+
+
+class StreamEngine:
+    """
+    Incremental pipeline over one asset.
+
+        engine = StreamEngine.from_config(config)   # warmed up on the config's asset
+        intent = engine.on_bar(timestamp, price)    # for every closed kline
+    """
+
+    def __init__(self, params, min_steepness=compute_trades_complex.MIN_STEEPNESS,
+                 min_acceleration=compute_trades_complex.MIN_ACCELERATION, last_order_time=None):
+        if params["equ_from"] < 0:
+            raise ValueError("A negative equ_from fits the last bars on bars that haven't closed yet.")
+        self.params = params
+        self.min_steepness = min_steepness
+        self.min_acceleration = min_acceleration
+        self.coefficients = super_smoother_coefficients(params["filt_per"])
+        self.weights = lsma_weights(params["per"], params["order"], params["calc_offs"],
+                                    params["equ_from"]).tolist() if params["per"] >= 1 else []
+
+        # Bars, plus the prefix sums of the linreg fit (see compute_linreg.fit_segments)
+        self.ts = []
+        self.prices = []
+        self.x = []
+        self.cum_x = [0.0]
+        self.cum_y = [0.0]
+
+        # Smoother outputs (out[-2], out[-1]), the LSMA window and the last LSMA
+        self.smoothed = []
+        self.window = deque(maxlen=max(params["per"], 0) + params["equ_from"])
+        self.last_lsma = None
+
+        # Segments in start order: start / end rows, is_up and the acceleration of the first row.
+        # Segments before 'settled' can't change anymore; their trades are in settled_trades
+        self.segments = []
+        self.settled = 0
+        self.settled_trades = []
+        self.live_trades = []
+
+        self.trade_count = 0
+        self.last_order_time = last_order_time
+
+    # ------------------------------------------------------------------
+    # Warm-up
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_history(cls, timestamps, prices, params, **kwargs):
+        """An engine that has seen the sorted bars 'timestamps' / 'prices', seeded by the batch stages."""
+        engine = cls(params, **kwargs)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        prices = np.asarray(prices, dtype=float)
+        if not len(timestamps):
+            return engine
+
+        filtered, lsma, acc_ts, acc, table = indicators(timestamps, prices, params)
+        x = (timestamps - timestamps[0]).astype(float)
+        engine.ts = timestamps.tolist()
+        engine.prices = prices.tolist()
+        engine.x = x.tolist()
+        engine.cum_x = [0.0] + np.cumsum(x).tolist()
+        engine.cum_y = [0.0] + np.cumsum(prices).tolist()
+        engine.smoothed = filtered[-2:].tolist()
+        engine.window.extend(filtered[-engine.window.maxlen:].tolist() if engine.window.maxlen else [])
+        fitted = lsma[~np.isnan(lsma)]
+        engine.last_lsma = float(fitted[-1]) if len(fitted) else None
+
+        first_acc = acc[np.searchsorted(acc_ts, timestamps[table["start"]])]
+        engine.segments = [{"start": start, "end": end, "is_up": is_up, "acc": a} for start, end, is_up, a in zip(
+            table["start"].tolist(), table["end"].tolist(), table["is_up"].tolist(), first_acc.tolist())]
+        engine.update_trades()
+        engine.trade_count = len(engine.trades())
+        return engine
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """
+        An engine warmed up on the config's asset (as compute_asset.py reads
+        it), with last_order_time from notes.json. The klines it is fed must
+        have the config's bar size.
+        """
+        _, _, end_ts, timeframe = compute_asset.date_range(config)
+        if timeframe != "1m":
+            raise ValueError(f"The stream carries 1m klines, the config trades {timeframe} bars.")
+        engine = cls.from_history(*read_history(config), compute_poly_reg.polyreg_params(config),
+                                  last_order_time=read_last_order_time(), **kwargs)
+        engine.config = config
+        engine.end_ts = end_ts
+        return engine
+
+    def catch_up(self):
+        """
+        Feed the bars of the config's asset newer than the last one seen (e.g.
+        after a gap repair). Only the state after the last one is decided on,
+        as by a batch run after the gap.
+        """
+        timestamps, prices = read_history(self.config, self.ts[-1] + 1 if self.ts else None)
+        if not len(timestamps):
+            return None
+        for timestamp, price in zip(timestamps.tolist(), prices.tolist()):
+            self.add_bar(timestamp, price)
+        self.update_trades()
+        return self.decision()
+
+    # ------------------------------------------------------------------
+    # One closed bar
+    # ------------------------------------------------------------------
+    def on_kline(self, row):
+        """
+        on_bar() for a kline row (see kline_store.COLUMNS) of an engine made by
+        from_config(); a gap since the last bar is filled from the asset first.
+        """
+        timestamp = int(row[0])
+        if timestamp > self.end_ts:
+            return None  # After the config's end_date, like compute_asset.py
+        if self.ts and timestamp - self.ts[-1] > 60:
+            intent = self.catch_up()
+            if self.ts[-1] >= timestamp:
+                return intent
+        return self.on_bar(timestamp, float(row[PRICE_FIELD]))
+
+    def on_bar(self, timestamp, price):
+        """Add one closed bar; returns the order intent (see decide()) or None."""
+        if self.ts and timestamp <= self.ts[-1]:
+            return None  # Already seen
+        self.add_bar(timestamp, price)
+        self.update_trades()
+        return self.decision()
+
+    def add_bar(self, timestamp, price):
+        """Smoother, LSMA, acceleration and segments of a bar newer than the last one."""
+        row = len(self.ts)
+        self.ts.append(timestamp)
+        self.prices.append(price)
+        x = float(timestamp - self.ts[0])
+        self.x.append(x)
+        self.cum_x.append(self.cum_x[-1] + x)
+        self.cum_y.append(self.cum_y[-1] + price)
+
+        # Super smoother: the first two values are copied
+        if not self.params["use_filt"] or len(self.smoothed) < 2:
+            value = price
+        else:
+            c1, c2, c3 = self.coefficients
+            value = c1 * price + c2 * self.smoothed[-1] + c3 * self.smoothed[-2]
+        self.smoothed = [self.smoothed[-1], value] if self.smoothed else [value]
+        self.window.append(value)
+
+        # LSMA of the window's first 'per' values, summed in order like the batch product
+        if self.weights and len(self.window) == self.window.maxlen:
+            lsma = 0.0
+            for value, weight in zip(self.window, self.weights):
+                lsma += value * weight
+            self.extend_segments(row, lsma)
+
+    def extend_segments(self, row, lsma):
+        """Acceleration of a new LSMA row and the segment it continues or starts."""
+        if lsma != lsma:
+            return  # A NaN LSMA row is dropped from the acceleration
+        previous, self.last_lsma = self.last_lsma, lsma
+        if previous is None:
+            return
+        acc = (lsma - previous) / lsma * 1000
+        if acc != acc:
+            return  # No acceleration: a placeholder row, in neither direction
+        is_up = acc > 0
+        last = self.segments[-1] if self.segments else None
+        if last is not None and last["is_up"] == is_up and last["end"] == row - 1:
+            last["end"] = row
+        else:
+            self.segments.append({"start": row, "end": row, "is_up": is_up, "acc": acc})
+
+    # ------------------------------------------------------------------
+    # Trades (see compute_trades_complex.compute_trades)
+    # ------------------------------------------------------------------
+    def slope(self, lo, hi):
+        """Linreg slope of the bars lo:hi, as compute_linreg.fit_segments computes it."""
+        count = hi - lo
+        mean_x = (self.cum_x[hi] - self.cum_x[lo]) / count
+        mean_y = (self.cum_y[hi] - self.cum_y[lo]) / count
+        sxx = sxy = 0.0
+        for i in range(lo, hi):
+            dx = self.x[i] - mean_x
+            sxx += dx * dx
+            sxy += dx * (self.prices[i] - mean_y)
+        return sxy / sxx
+
+    def segment_trades(self, segment):
+        start, end, is_up = segment["start"], segment["end"], segment["is_up"]
+        if end == start:
+            return []  # No slope on a single bar
+        slope = self.slope(start, end + 1)
+        if not (slope > self.min_steepness if is_up else slope < -self.min_steepness):
+            return []
+        if not abs(segment["acc"]) > self.min_acceleration:
+            return []
+        # An up segment doesn't open on a local maximum, a down segment not on a local minimum
+        if 0 < start < len(self.prices) - 1:
+            price, before, after = self.prices[start], self.prices[start - 1], self.prices[start + 1]
+            if (price > before and price > after) if is_up else (price < before and price < after):
+                return []
+
+        first_ts, last_ts = self.ts[start], self.ts[end]
+        recent = self.ts[-1] - first_ts < compute_trades_complex.MIN_OFFICIAL_TRADE_AGE * 60
+        if is_up:
+            buy_reason = "utempstart" if recent else "upstart"
+        else:
+            buy_reason = "dtempstart" if recent else "downstart"
+        if end == len(self.ts) - 1:
+            sell_reason = "tempend"
+        else:
+            sell_reason = "upend" if is_up else "downend"
+        return [(first_ts, "buy", self.prices[start], buy_reason),
+                (last_ts, "sell", self.prices[end], sell_reason)]
+
+    def update_trades(self):
+        """Settle the segments that can't change anymore and recompute the others' trades."""
+        last_row = len(self.ts) - 1
+        min_age = compute_trades_complex.MIN_OFFICIAL_TRADE_AGE * 60
+        while self.settled < len(self.segments):
+            segment = self.segments[self.settled]
+            # Closed, and too old for a "tempstart"
+            if segment["end"] == last_row or self.ts[-1] - self.ts[segment["start"]] < min_age:
+                break
+            self.settled_trades.extend(self.segment_trades(segment))
+            self.settled += 1
+        self.live_trades = [trade for segment in self.segments[self.settled:]
+                            for trade in self.segment_trades(segment)]
+
+    def trades(self):
+        """Every trade, as compute_trades returns them for the bars seen so far."""
+        return self.settled_trades + self.live_trades
+
+    def decision(self):
+        count = len(self.settled_trades) + len(self.live_trades)
+        last_trades = (self.settled_trades[-2:] + self.live_trades)[-2:]
+        intent = decide(last_trades, count, self.trade_count, self.last_order_time)
+        self.trade_count = count
+        if intent is not None and intent["trade"] is not None:
+            self.last_order_time = intent["trade"][0]
+        return intent
+
+
+# ----------------------------------------------------------------------------
+# Input and execution
+# ----------------------------------------------------------------------------
+def read_history(config, start_ts=None):
+    """Sorted (timestamps, prices) of the config's asset, from start_ts on if given."""
+    input_file = config.get("input_file")
+    if input_file and not os.path.isabs(input_file):
+        # Relative to src/dist, wherever the engine runs from
+        config = dict(config, input_file=os.path.join(DIST, input_file))
+    if start_ts is not None:
+        _, config_start, _, _ = compute_asset.date_range(config)
+        if start_ts > config_start:
+            config = dict(config, start_date=time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start_ts)))
+    columns = compute_asset.read_asset(config)
+    timestamps = np.asarray(columns["Timestamp"], dtype=np.int64)
+    prices = np.asarray(columns[compute_asset.PRICE_COLUMN], dtype=float)
+    order = np.argsort(timestamps, kind="stable")
+    return timestamps[order], prices[order]
+
+
+def read_notes(path=NOTES_FILE):
+    path = os.path.join(DIST, path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as file:
+        return json5.load(file)
+
+
+def read_last_order_time(path=NOTES_FILE):
+    notes = read_notes(path)
+    return int(notes["last_order_time"]) if "last_order_time" in notes else None
+
+
+def write_notes(updates, path=NOTES_FILE):
+    notes = read_notes(path)
+    notes.update(updates)
+    with open(os.path.join(DIST, path), "w") as file:
+        json.dump(notes, file, indent=4)
+
+
+def order_scripts(exchange):
+    """Order script per trade reason, as execute_orders runs them."""
+    scripts = {
+        "upstart": f"../python/{exchange}/long_order.py",
+        "downstart": f"../python/{exchange}/short_order.py",
+        "close": f"../python/{exchange}/close_positions.py",
+    }
+    scripts["upend"] = scripts["downend"] = scripts["close"]
+    return scripts
+
+
+def dispatch(intent, exchange, trade_count, trace=None):
+    """
+    Run the order scripts of an intent on a background thread and record it
+    in notes.json and realtrades.txt like execute_orders does. The scripts
+    run one after the other, as execute_orders runs them: the close finishes
+    before a new position is opened, so it can't flatten it. Returns the
+    thread. 'trace' is the latency trace of the bar (see latency_trace.py),
+    handed on to the order scripts.
+    """
+    scripts = order_scripts(exchange)
+    latency_trace.set_current(trace)
+    latency_trace.record(trace, "dispatch")
+    commands = []
+    if intent["close_all"]:
+        print("Number of trades has reduced. Executing close orders program.")
+        commands.append(["sudo", "python3", scripts["close"]])
+    notes = {"number_of_trades": trade_count}
+
+    trade = intent["trade"]
+    if trade is not None:
+        timestamp, action, price, strategy = trade
+        if strategy in scripts:
+            print(f"Executing trade: {strategy} at timestamp {timestamp}, price {price}")
+            commands.append(["sudo", "python3", scripts[strategy]])
+        else:
+            print(f"Unknown strategy: {strategy}. No action taken.")
+        if strategy in ("upstart", "downstart"):
+            direction = "reallong" if strategy == "upstart" else "realshort"
+            with open(os.path.join(DIST, REALTRADES_FILE), "a") as f:
+                f.write(f"{int(time.time())},real,{price},{direction}\n")
+        notes["last_order_time"] = float(timestamp)
+
+    def run_in_order():
+        for command in commands:
+            subprocess.run(command, cwd=DIST)
+
+    runner = threading.Thread(target=run_in_order)
+    runner.start()
+    write_notes(notes)
+    return runner
+
+
+# ----------------------------------------------------------------------------
+# Replay against the batch pipeline
+# ----------------------------------------------------------------------------
+def replay(config, check):
+    """
+    Warm an engine up on all but the last 'check' bars of the config's
+    asset, feed it the rest bar by bar and compare its trades and decisions
+    after every bar with the batch stages run on the same bars. A second
+    engine is fed every bar from the first one. Returns (mismatches,
+    per-bar seconds).
+    """
+    params = compute_poly_reg.polyreg_params(config)
+    timestamps, prices = read_history(config)
+    split = max(len(timestamps) - check, 0)
+
+    engine = StreamEngine.from_history(timestamps[:split], prices[:split], params)
+    batch_count = len(batch_trades(timestamps[:split], prices[:split], params))
+    batch_order_time = None
+    mismatches = 0
+    seconds = []
+    for i in range(split, len(timestamps)):
+        started = time.perf_counter()
+        intent = engine.on_bar(int(timestamps[i]), float(prices[i]))
+        seconds.append(time.perf_counter() - started)
+
+        trades = batch_trades(timestamps[:i + 1], prices[:i + 1], params)
+        expected = decide(trades[-2:], len(trades), batch_count, batch_order_time)
+        batch_count = len(trades)
+        if expected is not None and expected["trade"] is not None:
+            batch_order_time = expected["trade"][0]
+        if engine.trades() != trades or intent != expected:
+            mismatches += 1
+            print(f"Mismatch at {timestamps[i]}: engine {intent}, batch {expected}")
+
+    cold = StreamEngine(params)
+    for timestamp, price in zip(timestamps.tolist(), prices.tolist()):
+        cold.on_bar(timestamp, price)
+    if cold.trades() != batch_trades(timestamps, prices, params):
+        mismatches += 1
+        print("Mismatch: the engine fed every bar ends with other trades than the batch stages")
+    return mismatches, np.array(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming signal engine.")
+    parser.add_argument("--replay", type=int, default=500, metavar="BARS",
+                        help="Compare the engine with the batch stages on the last BARS bars of the config's asset.")
+    args = parser.parse_args()
+
+    config = compute_asset.load_config()
+    mismatches, seconds = replay(config, args.replay)
+    if len(seconds):
+        p50, p99 = np.percentile(seconds * 1e6, [50, 99])
+        print(f"Replayed {len(seconds)} bars: {p50:.0f}us p50, {p99:.0f}us p99, max {seconds.max() * 1e6:.0f}us per bar")
+    print("Engine matches the batch pipeline." if not mismatches else f"{mismatches} mismatches.")
+
+
+if __name__ == "__main__":
+    main()
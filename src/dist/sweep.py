@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+
+import argparse
+import itertools
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import closing
+from functools import lru_cache
+from multiprocessing import shared_memory
+
+import json5
+import numpy as np
+
+import compute_asset
+import compute_instaspeed
+import compute_linreg
+import compute_poly_reg
+import compute_polyupdown
+import compute_portfolio
+import compute_trades_complex
+import stops
+from polyreg_engine import rolling_poly_reg
+from super_smoother import two_pole_super_smoother
+
+# ----------------------------------------------------------------------------
+# Parameter sweep
+#
+# Evaluates every point of a parameter grid on the asset of the config:
+# LSMA -> acceleration -> up/down segments -> linreg -> trades -> stops ->
+# portfolio, the same stages as pipeline.py plus the stops of stops.py, on a
+# process pool. The sorted bars (prices, Open, High, Low) are put in shared
+# memory once and mapped by every worker.
+#
+# Grid points sharing the LSMA parameters are evaluated together, so the
+# indicators are computed once per LSMA setting, the trades once per
+# min_steepness and the stops once per sl_percentage / trail_percentage;
+# the margin / fee_rate values of each set of trades are one batched
+# backtest (see compute_portfolio.backtest). Workers also
+# keep the last smoother outputs, reused across per / order values.
+#
+# Results are appended to the 'runs' table of RESULTS_DB (sqlite), one row
+# per grid point, and the best ones printed ranked by final portfolio value,
+# then by drawdown.
+#
+#   python3 sweep.py filt_per=100,200,300 per=10,20 min_steepness=0.03,0.05 margin=1,5,20
+#   sqlite3 ../view/output/sweep.sqlite "SELECT * FROM runs ORDER BY final_value DESC LIMIT 20"
+#
+# Parameters left out of the grid keep their value from the config (margin
+# and fee_rate from its "margin" and "trade_fee_percentage"), or the module
+# default for min_steepness; stops are off unless the config sets them.
+# ----------------------------------------------------------------------------
+
+RESULTS_DB = "../view/output/sweep.sqlite"
+
+# LSMA parameters (see compute_poly_reg.py); a change recomputes every indicator
+UPSTREAM_KEYS = ["use_filt", "filt_per", "per", "order", "calc_offs", "equ_from"]
+# compute_trades_complex.py, stops.py (in percent, 0 is off), then compute_portfolio.py
+DOWNSTREAM_KEYS = ["min_steepness", "sl_percentage", "trail_percentage", "margin", "fee_rate"]
+METRIC_KEYS = ["final_value", "return_pct", "max_drawdown_pct", "trades", "win_rate"]
+
+
+def base_params(config):
+    params = {key: value for key, value in compute_poly_reg.polyreg_params(config).items() if key in UPSTREAM_KEYS}
+    params["min_steepness"] = compute_trades_complex.MIN_STEEPNESS
+    params["sl_percentage"] = float(config.get("sl_percentage") or 0)
+    params["trail_percentage"] = float(config.get("trail_percentage") or 0)
+    params["margin"], params["fee_rate"] = compute_portfolio.portfolio_params(config)
+    return params
+
+
+def parse_grid(specs):
+    """{key: [values]} from 'key=v1,v2,...' arguments (values parsed as JSON5)."""
+    grid = {}
+    for spec in specs:
+        key, sep, values = spec.partition("=")
+        if not sep or key not in UPSTREAM_KEYS + DOWNSTREAM_KEYS:
+            raise ValueError(f"Bad grid entry '{spec}': expected key=v1,v2,... with key one of "
+                             + ", ".join(UPSTREAM_KEYS + DOWNSTREAM_KEYS))
+        grid[key] = [json5.loads(value) for value in values.split(",")]
+    return grid
+
+
+def grid_points(base, grid):
+    """
+    Every distinct combination of the grid values, as full parameter dicts.
+    A margin of 1 pays compute_portfolio.margin_fee_1x whatever the fee_rate,
+    so its points carry that fee_rate and the fee_rate values collapse.
+    """
+    keys = list(grid)
+    seen = set()
+    for values in itertools.product(*(grid[key] for key in keys)):
+        point = {**base, **dict(zip(keys, values))}
+        if point["margin"] == 1:
+            point["fee_rate"] = compute_portfolio.margin_fee_1x
+        key = tuple(point[key] for key in UPSTREAM_KEYS + DOWNSTREAM_KEYS)
+        if key not in seen:
+            seen.add(key)
+            yield point
+
+
+def group_points(points):
+    """[(upstream params, [points])] grouping the points by their LSMA parameters."""
+    groups = {}
+    for point in points:
+        groups.setdefault(tuple(point[key] for key in UPSTREAM_KEYS), []).append(point)
+    return [(dict(zip(UPSTREAM_KEYS, key)), group) for key, group in groups.items()]
+
+
+# ----------------------------------------------------------------------------
+# Shared bar arrays
+# ----------------------------------------------------------------------------
+def share_array(array):
+    """Copy 'array' into a new shared memory block: (block, (name, dtype, length))."""
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    return block, (block.name, array.dtype.str, len(array))
+
+
+_blocks = []
+_series = None
+_timestamps = None
+_prices = None
+
+
+def attach(specs):
+    """Pool initializer: map the shared bar arrays (read-only), {column: spec}."""
+    global _series, _timestamps, _prices
+    _series = {}
+    for column, (name, dtype, length) in specs.items():
+        block = shared_memory.SharedMemory(name=name)
+        _blocks.append(block)  # The views below live as long as the block
+        array = np.ndarray((length,), dtype=dtype, buffer=block.buf)
+        array.flags.writeable = False
+        _series[column] = array
+    _timestamps, _prices = _series["Timestamp"], _series[compute_asset.PRICE_COLUMN]
+
+
+# ----------------------------------------------------------------------------
+# Evaluation (in the workers)
+# ----------------------------------------------------------------------------
+@lru_cache(maxsize=4)
+def smoothed(use_filt, filt_per):
+    if use_filt:
+        return two_pole_super_smoother(_prices, filt_per)
+    return np.asarray(_prices, dtype=float)
+
+
+def max_drawdown(capital, closed):
+    """Largest drop from a peak of the portfolio after each close, in percent."""
+    equity = np.array([capital] + [trade["after_fee"] for trade in closed])
+    peaks = np.maximum.accumulate(equity)
+    return float(np.max((peaks - equity) / peaks)) * 100.0
+
+
+def trade_key(point):
+    """The parameters a point's trades depend on, past the LSMA ones."""
+    return point["min_steepness"], point["sl_percentage"], point["trail_percentage"]
+
+
+def group_trades(upstream, points):
+    """
+    {trade_key: trades} over the whole shared series for the points of one
+    LSMA setting, stops applied; the indicators are computed once for all of
+    them and the trades once per min_steepness.
+    """
+    filtered = smoothed(upstream["use_filt"], upstream["filt_per"])
+    lsma = rolling_poly_reg(filtered, upstream["per"], upstream["order"],
+                            upstream["calc_offs"], upstream["equ_from"])
+
+    acc_ts, acc = compute_instaspeed.compute_acceleration(_timestamps, lsma)
+    is_up, is_down = compute_polyupdown.split_updown(_timestamps, acc_ts, acc)
+    table = compute_polyupdown.segment_table(is_up, is_down)
+    fit = compute_linreg.compute_linreg(_timestamps, _prices, *compute_polyupdown.table_bounds(_timestamps, table))
+
+    trades_by_steepness = {}
+    for steepness in dict.fromkeys(point["min_steepness"] for point in points):
+        trades_by_steepness[steepness] = compute_trades_complex.compute_trades(
+            _timestamps, _prices, fit["start_ts"], fit["slope"], acc_ts, acc, _timestamps, table,
+            min_steepness=steepness)
+
+    trades_by_key = {}
+    for key in dict.fromkeys(trade_key(point) for point in points):
+        steepness, sl_percentage, trail_percentage = key
+        trades_by_key[key] = stops.apply_stops(trades_by_steepness[steepness], _series,
+                                               sl_percentage / 100.0, trail_percentage / 100.0)
+    return trades_by_key
+
+
+def backtest_points(trades, points, capital=None):
+    """compute_portfolio.backtest of 'trades' with the margin and fee_rate of every point."""
+    capital = compute_portfolio.initial_capital if capital is None else capital
+    return compute_portfolio.backtest(trades, margin=[point["margin"] for point in points],
+                                      fee=[point["fee_rate"] for point in points], capital=capital)
+
+
+def backtest_metrics(result):
+    """Metrics of every scenario of a compute_portfolio.backtest result."""
+    capital, final_value, after_fee = result["capital"], result["final_value"], result["after_fee"]
+    count = after_fee.shape[1]
+    equity = np.column_stack([capital, after_fee])
+    peaks = np.maximum.accumulate(equity, axis=1)
+    drawdown = np.max((peaks - equity) / peaks, axis=1) * 100.0
+    return_pct = (final_value - capital) / capital * 100.0
+    wins = np.count_nonzero(after_fee > result["before_open"], axis=1)
+    return [{
+        "final_value": value,
+        "return_pct": pct,
+        "max_drawdown_pct": dd,
+        "trades": count,
+        "win_rate": won / count if count else 0.0,
+    } for value, pct, dd, won in zip(final_value.tolist(), return_pct.tolist(), drawdown.tolist(), wins.tolist())]
+
+
+def evaluate_group(upstream, points):
+    """Metrics of every point of one LSMA setting: [(point, metrics)]."""
+    started = time.perf_counter()
+    trades_by_key = group_trades(upstream, points)
+    results = []
+    for key, trades in trades_by_key.items():
+        members = [point for point in points if trade_key(point) == key]
+        results.extend(zip(members, backtest_metrics(backtest_points(trades, members))))
+    seconds = (time.perf_counter() - started) / len(points)
+    return [(point, dict(metrics, seconds=seconds)) for point, metrics in results]
+
+
+# ----------------------------------------------------------------------------
+# Results table
+# ----------------------------------------------------------------------------
+def open_results(path=RESULTS_DB):
+    db = sqlite3.connect(path)
+    columns = ", ".join(["run_time INTEGER", "bars INTEGER"]
+                        + [f'"{key}" REAL' for key in UPSTREAM_KEYS + DOWNSTREAM_KEYS + METRIC_KEYS]
+                        + ["seconds REAL"])
+    db.execute(f"CREATE TABLE IF NOT EXISTS runs ({columns})")
+    # Tables of older sweeps lack the parameters added since
+    existing = {row[1] for row in db.execute("PRAGMA table_info(runs)")}
+    for key in UPSTREAM_KEYS + DOWNSTREAM_KEYS + METRIC_KEYS:
+        if key not in existing:
+            db.execute(f'ALTER TABLE runs ADD COLUMN "{key}" REAL')
+    return db
+
+
+def store_results(db, run_time, bars, results):
+    keys = UPSTREAM_KEYS + DOWNSTREAM_KEYS + METRIC_KEYS + ["seconds"]
+    rows = [[run_time, bars] + [float({**point, **metrics}[key]) for key in keys] for point, metrics in results]
+    placeholders = ", ".join("?" * (len(keys) + 2))
+    quoted = ", ".join(f'"{key}"' for key in keys)  # 'order' is an SQL keyword
+    db.executemany(f"INSERT INTO runs (run_time, bars, {quoted}) VALUES ({placeholders})", rows)
+    db.commit()
+
+
+def ranked(db, run_time, limit):
+    """The best rows of one sweep: highest final value first, then smallest drawdown."""
+    cursor = db.execute(
+        "SELECT * FROM runs WHERE run_time = ? ORDER BY final_value DESC, max_drawdown_pct ASC LIMIT ?",
+        (run_time, limit))
+    return [description[0] for description in cursor.description], cursor.fetchall()
+
+
+def load_series(config):
+    """
+    {column: array} of the config's asset bars sorted by time: Timestamp,
+    the price column and the Open, High and Low the stops are checked on.
+    """
+    names = list(dict.fromkeys(["Timestamp", compute_asset.PRICE_COLUMN] + stops.BAR_COLUMNS))
+    columns = compute_asset.read_asset(config, columns=names)
+    timestamps = np.asarray(columns["Timestamp"], dtype=np.int64)
+    order = np.argsort(timestamps, kind="stable")
+    return {name: timestamps[order] if name == "Timestamp" else np.asarray(columns[name], dtype=float)[order]
+            for name in names}
+
+
+def map_groups(function, groups, series, *args, workers=None):
+    """
+    function(upstream, points, *args) for every group on a process pool whose
+    workers map the arrays of 'series' (see load_series) from shared memory.
+    Returns the results in completion order.
+    """
+    blocks, specs = [], {}
+    results = []
+    try:
+        for name, array in series.items():
+            block, specs[name] = share_array(array)
+            blocks.append(block)
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach, initargs=(specs,)) as pool:
+            futures = [pool.submit(function, upstream, points, *args) for upstream, points in groups]
+            for future in as_completed(futures):
+                results.append(future.result())
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return results
+
+
+def run_sweep(config, grid, workers=None):
+    """Evaluate the grid on the config's asset; returns (bars, [(point, metrics)])."""
+    series = load_series(config)
+    groups = group_points(grid_points(base_params(config), grid))
+    results = map_groups(evaluate_group, groups, series, workers=workers)
+    return len(series["Timestamp"]), [row for group in results for row in group]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a grid of strategy parameters.")
+    parser.add_argument("grid", nargs="*", help="key=v1,v2,... for any of: " + ", ".join(UPSTREAM_KEYS + DOWNSTREAM_KEYS))
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count).")
+    parser.add_argument("--top", type=int, default=10, help="Ranked rows to print (default 10).")
+    args = parser.parse_args()
+
+    config = compute_asset.load_config()
+    grid = parse_grid(args.grid)
+
+    started = time.perf_counter()
+    run_time = int(time.time())
+    bars, results = run_sweep(config, grid, workers=args.workers)
+    os.makedirs(os.path.dirname(RESULTS_DB), exist_ok=True)
+    with closing(open_results()) as db:
+        store_results(db, run_time, bars, results)
+        names, rows = ranked(db, run_time, args.top)
+
+    shown = [i for i, name in enumerate(names) if name not in ("run_time", "bars", "seconds")]
+    print(" ".join(f"{names[i]:>12}" for i in shown))
+    for row in rows:
+        print(" ".join(f"{row[i]:>12.4g}" for i in shown))
+    print(f"Sweep: {len(results)} points on {bars} bars in {time.perf_counter() - started:.2f}s, "
+          f"results in {RESULTS_DB} (run_time {run_time})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+import compute_asset
+import compute_portfolio
+import stops
+import sweep
+
+# ----------------------------------------------------------------------------
+# Walk-forward evaluation
+#
+# Rolls a train window and the test window right after it over the config's
+# start_date .. end_date range. On each train window the sweep grid (see
+# sweep.py) is ranked by final portfolio value, then drawdown; the best
+# point then trades the test window. The test windows' results are chained
+# into one out-of-sample equity curve.
+#
+# The indicators (polyreg, polyacc, linreg) and trades of each grid point
+# are computed once over the whole series and every window only takes the
+# positions opened inside it: a window costs a portfolio run over its
+# trades instead of a pass over its bars. A position still open at the end
+# of its window is closed at the window's last bar, so every window books
+# the fees and the result of all the positions it opened and nothing else.
+#
+# The LSMA and acceleration are causal, warmed up on the bars before each
+# window as they would be live. The linreg slope is not: compute_linreg fits
+# each up/down segment as a whole, so a segment running past a window's end
+# is judged on bars after it, as in the batch pipeline run on the full
+# history (live, the slope only sees the bars up to now).
+#
+#   python3 walkforward.py --train-days 90 --test-days 7 filt_per=100,200 per=10,20 min_steepness=0.03,0.05
+#
+# One line per test window goes to WALKFORWARD_FILE.
+# ----------------------------------------------------------------------------
+
+WALKFORWARD_FILE = "../view/output/walkforward.txt"
+DAY = 86400
+
+
+def make_windows(first_ts, last_ts, train, test, step):
+    """[(train_start, test_start, test_end)] timestamps, 'step' seconds apart."""
+    windows = []
+    start = first_ts
+    while start + train + test <= last_ts + 1:
+        windows.append((start, start + train, start + train + test))
+        start += step
+    return windows
+
+
+def window_trades(trades, positions, start, end):
+    """
+    The trades of the positions ('positions' from stops.pair_positions)
+    opened in [start, end), in time order. A position not closed before
+    'end' is closed at the price of the last bar before it.
+    """
+    opens, closes, is_long = positions
+    open_ts = np.array([trades[i][0] for i in opens.tolist()], dtype=np.int64)
+    lo, hi = np.searchsorted(open_ts, [start, end])
+    last_bar = int(np.searchsorted(sweep._timestamps, end)) - 1
+    # (timestamp, order on ties, trade): the forced closes go after the trades of their bar
+    entries = []
+    for k in range(lo, hi):
+        entries.append((trades[opens[k]][0], int(opens[k]), trades[opens[k]]))
+        if closes[k] >= 0 and trades[closes[k]][0] < end:
+            entries.append((trades[closes[k]][0], int(closes[k]), trades[closes[k]]))
+        else:
+            close = (int(sweep._timestamps[last_bar]), "sell", float(sweep._prices[last_bar]),
+                     "upend" if is_long[k] else "downend")
+            entries.append((close[0], len(trades) + k, close))
+    entries.sort(key=lambda entry: entry[:2])
+    return [trade for _, _, trade in entries]
+
+
+def evaluate_windows(upstream, points, windows):
+    """
+    Worker: for every point of one LSMA setting, the train and test metrics
+    of every window, plus the test window's equity after each closed trade
+    (relative to its starting capital): [(point, [(train, test, curve)])].
+    """
+    trades_by_key = sweep.group_trades(upstream, points)
+    capital = compute_portfolio.initial_capital
+    per_window = {id(point): [] for point in points}
+    for key, trades in trades_by_key.items():
+        members = [point for point in points if sweep.trade_key(point) == key]
+        positions = stops.pair_positions(trades)
+        # Every window is one batched backtest over the points sharing these trades
+        for train_start, test_start, test_end in windows:
+            train_trades = window_trades(trades, positions, train_start, test_start)
+            test_trades = window_trades(trades, positions, test_start, test_end)
+            train = sweep.backtest_metrics(sweep.backtest_points(train_trades, members, capital))
+            result = sweep.backtest_points(test_trades, members, capital)
+            test = sweep.backtest_metrics(result)
+            curves = (result["after_fee"] / capital).tolist()
+            for point, row in zip(members, zip(train, test, curves)):
+                per_window[id(point)].append(row)
+    return [(point, per_window[id(point)]) for point in points]
+
+
+def best_point(candidates):
+    """The (point, train, test, curve) with the highest train value, then the smallest drawdown."""
+    return max(candidates, key=lambda c: (c[1]["final_value"], -c[1]["max_drawdown_pct"]))
+
+
+def walk_forward(config, grid, train_days, test_days, step_days=None, workers=None):
+    """
+    (windows, rows, curve): one row per test window with the chosen point,
+    its train and test metrics and the stitched equity after the window,
+    and the stitched equity after every closed out-of-sample trade.
+    """
+    if step_days is not None and step_days < test_days:
+        raise ValueError("--step-days shorter than --test-days would chain overlapping test windows.")
+    series = sweep.load_series(config)
+    timestamps = series["Timestamp"]
+    if not len(timestamps):
+        raise ValueError("No bars in the configured date range.")
+    windows = make_windows(int(timestamps[0]), int(timestamps[-1]), int(train_days * DAY),
+                           int(test_days * DAY), int((step_days or test_days) * DAY))
+    if not windows:
+        raise ValueError("The date range is shorter than one train + test window.")
+
+    groups = sweep.group_points(sweep.grid_points(sweep.base_params(config), grid))
+    results = [row for group in sweep.map_groups(evaluate_windows, groups, series, windows, workers=workers)
+               for row in group]
+
+    equity = compute_portfolio.initial_capital
+    curve = [equity]
+    rows = []
+    for index, window in enumerate(windows):
+        point, train, test, test_curve = best_point(
+            [(point, *per_window[index]) for point, per_window in results])
+        curve.extend(equity * ratio for ratio in test_curve)
+        equity *= test["final_value"] / compute_portfolio.initial_capital
+        rows.append((window, point, train, test, equity))
+    return windows, rows, curve
+
+
+def write_walkforward(rows, path=WALKFORWARD_FILE):
+    keys = sweep.UPSTREAM_KEYS + sweep.DOWNSTREAM_KEYS
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(",".join(["train_start", "test_start", "test_end"] + keys
+                         + ["train_return_pct", "test_return_pct", "test_max_drawdown_pct", "test_trades", "equity"]) + "\n")
+        for window, point, train, test, equity in rows:
+            values = list(window) + [point[key] for key in keys] + [
+                f"{train['return_pct']:.4f}", f"{test['return_pct']:.4f}",
+                f"{test['max_drawdown_pct']:.4f}", test["trades"], f"{equity:.2f}"]
+            f.write(",".join(str(value) for value in values) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward evaluation of a parameter grid.")
+    parser.add_argument("grid", nargs="*", help="key=v1,v2,... as for sweep.py")
+    parser.add_argument("--train-days", type=float, required=True, help="Length of the train window in days.")
+    parser.add_argument("--test-days", type=float, required=True, help="Length of the test window in days.")
+    parser.add_argument("--step-days", type=float, default=None, help="Roll forward by this many days (default: --test-days).")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count).")
+    args = parser.parse_args()
+
+    config = compute_asset.load_config()
+    grid = sweep.parse_grid(args.grid)
+
+    started = time.perf_counter()
+    windows, rows, curve = walk_forward(config, grid, args.train_days, args.test_days, args.step_days, args.workers)
+    write_walkforward(rows)
+
+    capital = compute_portfolio.initial_capital
+    drawdown = sweep.max_drawdown(capital, [{"after_fee": value} for value in curve[1:]])
+    print(f"Walk-forward: {len(windows)} windows, {sum(row[3]['trades'] for row in rows)} out-of-sample trades")
+    print(f"Out-of-sample equity: {capital:.2f} -> {rows[-1][4]:.2f} "
+          f"({(rows[-1][4] - capital) / capital * 100.0:.2f}%), max drawdown {drawdown:.2f}%")
+    print(f"Windows written to {WALKFORWARD_FILE} in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ pip install websockets --break-system-packages
 pip install python-binance --break-system-packages
 pip install binance --break-system-packages
 pip install pandas tqdm  --break-system-packages
+pip install scipy --break-system-packages
+pip install numba --break-system-packages
 pip install bybit --break-system-packages
 pip install json5 --break-system-packages
 pip install brotli --break-system-packages
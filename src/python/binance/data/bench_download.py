@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from kline_download import download_klines, make_session, WeightThrottle
+
+# The Binance stand-in lives in src/python/binance_mock
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "binance_mock"))
+from binance_mock import spawn_server
+
+# ----------------------------------------------------------------------------
+# Benchmark of the historical kline downloader against the local Binance
+# stand-in (binance_mock.py). Nothing here talks to Binance.
+#
+#   python3 bench_download.py --latency 0.05 --workers 8
+# ----------------------------------------------------------------------------
+
+MINUTE_MS = 60_000
+MONTHS = [1, 6, 24]
+
+parser = argparse.ArgumentParser(description="Benchmark sequential vs. concurrent kline downloads against a local HTTP stand-in.")
+parser.add_argument("--latency", type=float, default=0.05, help="Simulated round trip per request in seconds (default 0.05).")
+parser.add_argument("--workers", type=int, default=8, help="Concurrent requests for the pooled downloader (default 8).")
+parser.add_argument("--months", type=int, nargs="+", default=MONTHS, help="History lengths to benchmark (default 1 6 24).")
+args = parser.parse_args()
+
+# ----------------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------------
+
+def run(base_url, start_ms, end_ms, workers):
+    # Fresh throttle per run: the budget is per minute and the runs are back to back
+    started = time.perf_counter()
+    klines = download_klines("BTCUSDT", start_ms, end_ms, base_url=base_url, workers=workers,
+                             session=make_session(workers), throttle=WeightThrottle(), progress=False)
+    elapsed = time.perf_counter() - started
+
+    open_times = [k[0] for k in klines]
+    assert open_times == sorted(set(open_times)), "klines are not stitched in order"
+    assert len(klines) == (end_ms - start_ms) // MINUTE_MS + 1, "klines are missing"
+    return elapsed, len(klines)
+
+if __name__ == "__main__":
+    server, base_url = spawn_server("--latency", str(args.latency))
+
+    end_ms = (int(time.time() * 1000) // MINUTE_MS) * MINUTE_MS
+    print(f"Stand-in latency: {args.latency * 1000:.0f} ms per request")
+    print(f"{'months':>6} {'klines':>9} {'sequential':>12} {f'{args.workers} workers':>12} {'speedup':>8}")
+    for months in args.months:
+        start_ms = end_ms - months * 30 * 24 * 60 * MINUTE_MS
+        seq_time, count = run(base_url, start_ms, end_ms, 1)
+        par_time, _ = run(base_url, start_ms, end_ms, args.workers)
+        print(f"{months:>6} {count:>9} {seq_time:>11.2f}s {par_time:>11.2f}s {seq_time / par_time:>7.1f}x")
+
+    server.terminate()
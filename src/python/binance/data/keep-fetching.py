@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 
 import argparse
-import math
+import itertools
+import json
+import os
+import shutil
+import sys
 import time
 from pathlib import Path
 from datetime import date
@@ -9,7 +13,16 @@ import json5
 import requests
 import pandas as pd
 import websocket
-from tqdm import tqdm  # for progress bar
+
+from kline_download import download_klines, download_ranges
+
+# The kline store lives next to the compute scripts in src/dist
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "dist"))
+from kline_store import KlineStore, STORE_SUFFIX
+from kline_pyramid import KlinePyramid
+from binance_urls import rest_base_url, ws_base_url
+from stream_engine import StreamEngine, dispatch
+import latency_trace
 
 # ----------------------------------------------------------------------------
 # Configuration
@@ -19,8 +32,10 @@ from tqdm import tqdm  # for progress bar
 INTERVAL = "1m"
 # Number of days of historical data to fetch (default 18)
 DAYS_OF_DATA = 18
-# Limit per Binance klines API call
-LIMIT_PER_CALL = 1000
+# Days of data kept in the realtime CSV while streaming (trimmed by compact_csv)
+RETENTION_DAYS = DAYS_OF_DATA
+# Number of appended klines between two compaction passes (60 => once an hour)
+COMPACT_EVERY = 60
 
 # ----------------------------------------------------------------------------
 # Define CSV columns
@@ -37,98 +52,119 @@ COLUMNS = [
 # ----------------------------------------------------------------------------
 
 parser = argparse.ArgumentParser(
-    description="Fetch historical Binance klines for a given trading pair, then optionally open a WebSocket to continuously append real-time data."
+    description="Fetch historical Binance klines for one or more trading pairs, then optionally open a WebSocket to continuously append real-time data."
 )
+parser.add_argument("--pairs", type=str, default=None,
+                    help="Comma separated pairs (e.g. BTCUSDT,ETHUSDT). Defaults to 'pairs' or 'pair' in apikey-crypto.json.")
 parser.add_argument("--once", action="store_true",
                     help="If specified, only fetch historical data (Nov 29, 2024 to today) and exit. No WebSocket streaming.")
+parser.add_argument("--full", action="store_true",
+                    help="Re-download the whole history instead of resuming from the last timestamp stored in the CSV.")
+parser.add_argument("--repair", action="store_true",
+                    help="Only fill the missing minutes of the stored history through the REST API, then exit.")
+parser.add_argument("--stream", action="store_true",
+                    help="Run the streaming signal engine (src/dist/stream_engine.py) on 'pair' and start its orders as each kline closes.")
 args = parser.parse_args()
 
 # ----------------------------------------------------------------------------
-# Load the trading pair from apikey-crypto.json
+# Load the trading pairs from the command line or apikey-crypto.json
 # ----------------------------------------------------------------------------
 
 home_dir = Path.home()
 with open(f"{home_dir}/pablitos-money-printer/src/dist/apikey-crypto.json", "r") as file:
     config = json5.load(file)
-    if "pair" not in config:
-        raise ValueError("The 'pair' key is missing in apikey-crypto.json")
-    symbol = config["pair"].lower()  # Convert to lowercase for Binance's WebSocket API
+latency_trace.enable(config)
+
+if args.pairs:
+    pairs = args.pairs.split(",")
+elif "pairs" in config:
+    pairs = config["pairs"]
+elif "pair" in config:
+    pairs = [config["pair"]]
+else:
+    raise ValueError("The 'pair' key is missing in apikey-crypto.json")
+
+# Lowercase for Binance's WebSocket API; keep the order, drop duplicates
+symbols = list(dict.fromkeys(p.strip().lower() for p in pairs if p.strip()))
 
 # ----------------------------------------------------------------------------
 # Paths and URLs
 # ----------------------------------------------------------------------------
 
-WS_URL = f"wss://stream.binance.com:9443/ws/{symbol}@kline_{INTERVAL}"
-CSV_FILENAME = f"../../../assets/{symbol}-realtime.csv"
+# Live Binance unless "rest_base_url" / "ws_base_url" point elsewhere (see binance_urls.py)
+REST_URL = rest_base_url(config)
+# Combined stream: one connection for every pair, messages come wrapped as
+# {"stream": "<symbol>@kline_1m", "data": {...}}
+WS_URL = ws_base_url(config) + "/stream?streams=" + "/".join(
+    f"{symbol}@kline_{INTERVAL}" for symbol in symbols
+)
+
+def make_sink(symbol):
+    """
+    Per-symbol destination of the klines: the realtime CSV (trimmed to
+    RETENTION_DAYS), the memory-mapped kline store (full history) and its
+    5m/15m/1h/1d levels (see kline_pyramid.py).
+    """
+    store_path = f"../../../assets/{symbol}{STORE_SUFFIX}"
+    return {
+        "symbol": symbol,
+        "csv": f"../../../assets/{symbol}-realtime.csv",
+        "store": KlineStore(store_path),
+        "pyramid": KlinePyramid(store_path),
+        # Closed klines appended since the last compaction pass
+        "appended_since_compact": 0,
+        # Gaps the REST API had no klines for (exchange downtime); not retried
+        "unfillable": set(),
+    }
+
+# Keyed by the uppercase symbol, as found in the "s" field of kline events
+sinks = {symbol.upper(): make_sink(symbol) for symbol in symbols}
 
 # ----------------------------------------------------------------------------
-# Historical Data Fetch Function
+# Historical Data Fetch Functions
 # ----------------------------------------------------------------------------
 
-def fetch_historical_data(num_days):
+def read_csv_bounds(path):
     """
-    Fetch num_days of 1m historical data from Binance.
-    Downloads data in 1,000-point chunks until we reach the required total.
-    Clears the CSV file before writing newly fetched data.
+    Return (first_timestamp, last_timestamp) of the realtime CSV, in seconds.
+    Only the first line and the last few bytes are read, so this is O(1)
+    regardless of how much history the file holds. Returns (None, None) if the
+    file is missing, empty or unreadable.
     """
-    # Clear the file contents before writing
-    open(CSV_FILENAME, 'w').close()
-
-    base_url = "https://api.binance.com/api/v3/klines"
-
-    # Calculate total points needed for the specified num_days
-    total_points = num_days * 24 * 60  # minutes in a day
-
-    # Figure out how many calls we need (each call can return up to LIMIT_PER_CALL klines)
-    calls = math.ceil(total_points / LIMIT_PER_CALL)
-
-    # Set the initial end time to 'now' in milliseconds
-    end_time = int(time.time() * 1000)
-
-    all_data = []
-
-    progress_bar_format = "\x1b[92m{l_bar}{bar}\x1b[0m"
-    print(f"Downloading ~{total_points} klines ({num_days} days).")
-
-    for _ in tqdm(range(calls), desc="Downloading klines", bar_format=progress_bar_format):
-        params = {
-            "symbol": symbol.upper(),
-            "interval": INTERVAL,
-            "endTime": end_time,
-            "limit": LIMIT_PER_CALL
-        }
-        response = requests.get(base_url, params=params)
-        data = response.json()
-
-        # Check for API errors
-        if not isinstance(data, list):
-            print(f"Error fetching historical data: {data}")
-            return
-
-        # Append this batch of data
-        all_data.extend(data)
-
-        # Update end_time for the next iteration to the oldest openTime in this batch - 1 ms
-        oldest_open_time = data[0][0]
-        end_time = oldest_open_time - 1
-
-    # Convert the fetched data into a DataFrame
-    df = pd.DataFrame(all_data, columns=[
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None, None
+
+    with open(path, "rb") as f:
+        first_line = f.readline()
+        # Read the tail of the file and take the last complete line
+        f.seek(max(0, os.path.getsize(path) - 4096))
+        tail_lines = f.read().splitlines()
+
+    try:
+        first_ts = int(first_line.split(b"|")[0])
+        last_ts = int(tail_lines[-1].split(b"|")[0])
+    except (ValueError, IndexError):
+        return None, None
+    return first_ts, last_ts
+
+def klines_to_dataframe(klines, now_ms):
+    """
+    Convert raw klines from the REST API into a DataFrame with the CSV COLUMNS.
+    The kline that is still open at now_ms is dropped: the WebSocket appends it
+    once it closes, so keeping it here would store the same minute twice.
+    """
+    df = pd.DataFrame(klines, columns=[
         "Timestamp", "Open", "High", "Low", "Close", "Volume", "CloseTime",
         "QuoteAssetVolume", "NumberOfTrades", "TakerBuyBaseVolume",
         "TakerBuyQuoteVolume", "Ignore"
     ])
+    df = df[df["CloseTime"] < now_ms]
 
     # Keep only relevant columns
-    df = df[[
-        "Timestamp", "Open", "High", "Low", "Close", "Volume",
-        "QuoteAssetVolume", "TakerBuyBaseVolume", "TakerBuyQuoteVolume",
-        "NumberOfTrades"
-    ]]
+    df = df[COLUMNS].copy()
 
     # Convert Timestamp from milliseconds to seconds
-    df["Timestamp"] = df["Timestamp"] // 1000
-    df["Timestamp"] = df["Timestamp"].astype(int)
+    df["Timestamp"] = (df["Timestamp"] // 1000).astype(int)
 
     # Convert numeric columns
     float_cols = [
@@ -139,27 +175,252 @@ def fetch_historical_data(num_days):
         df[col] = df[col].astype(float)
     df["NumberOfTrades"] = df["NumberOfTrades"].astype(int)
 
-    # Sort the DataFrame by Timestamp ascending
-    df = df.sort_values("Timestamp").reset_index(drop=True)
+    # Sort ascending and remove duplicates if any overlap
+    df = df.sort_values("Timestamp").drop_duplicates(subset="Timestamp")
+    return df.reset_index(drop=True)
 
-    # Remove duplicates if any overlap
-    df = df.drop_duplicates(subset="Timestamp")
+def fetch_klines(symbol, start_ms, end_ms, now_ms):
+    """
+    Download every 1m kline of 'symbol' with an open time in [start_ms, end_ms] using the
+    concurrent, rate-limit aware downloader. Returns a DataFrame (see
+    klines_to_dataframe) or None if the API returned an error.
+    """
+    try:
+        klines = download_klines(symbol, start_ms, end_ms, interval=INTERVAL, base_url=REST_URL)
+    except requests.RequestException as e:
+        print(f"Error fetching historical data: {e}")
+        return None
+    return klines_to_dataframe(klines, now_ms)
+
+def merge_into_store(sink, df):
+    """
+    Merge downloaded rows into the sink's kline store and recompute the
+    coarser bars they touch. Returns the number of rows the store grew by.
+    """
+    if len(df) == 0:
+        return 0
+    added = sink["store"].merge(df)
+    sink["pyramid"].refresh(int(df["Timestamp"].min()), int(df["Timestamp"].max()))
+    return added
+
+def fetch_historical_data(sink, num_days, resume=True):
+    """
+    Make the sink's CSV hold the last num_days of 1m klines.
 
-    # If there's more than total_points rows, truncate to the last total_points
-    if len(df) > total_points:
-        df = df.iloc[-total_points:]
+    With resume=True the CSV is reused: only the minutes missing after the last
+    stored timestamp are downloaded. If the file does not reach back num_days
+    (compact_csv keeps the streaming CSV at RETENTION_DAYS), the head is read
+    from the kline store and only the minutes the store lacks are downloaded.
+    A tail-only update is appended to the file; a head backfill is merged with
+    the existing rows, deduplicated on Timestamp and rewritten. Rows older than
+    num_days are trimmed by compact_csv.
 
-    # Save to CSV with '|' as the separator and no header
-    df.to_csv(CSV_FILENAME, sep='|', index=False, header=False)
-    print(f"Saved {len(df)} historical data points ({num_days} days) to {CSV_FILENAME} "
-          f"with '|' as the separator, no header.")
+    With resume=False (or an empty/unusable CSV) all num_days are downloaded and
+    the CSV is rewritten from scratch.
+
+    Every downloaded row is also merged into the kline store, which keeps the
+    whole history instead of only the last num_days.
+    """
+    symbol, csv_filename, store = sink["symbol"], sink["csv"], sink["store"]
+    now_ms = int(time.time() * 1000)
+    window_start = (now_ms // 60000) * 60 - num_days * 24 * 60 * 60  # seconds
+
+    first_ts, last_ts = read_csv_bounds(csv_filename) if resume else (None, None)
+    if last_ts is not None and last_ts < window_start:
+        # Stored data is older than the whole window: nothing worth keeping
+        first_ts, last_ts = None, None
+
+    if last_ts is None:
+        print(f"Downloading ~{num_days * 24 * 60} klines ({num_days} days).")
+        df = fetch_klines(symbol, window_start * 1000, now_ms, now_ms)
+        if df is None:
+            return
+        df = df[df["Timestamp"] > window_start]
+
+        # Save to CSV with '|' as the separator and no header
+        df.to_csv(csv_filename, sep='|', index=False, header=False)
+        merge_into_store(sink, df)
+        print(f"Saved {len(df)} historical data points ({num_days} days) to {csv_filename} "
+              f"with '|' as the separator, no header.")
+        return
+
+    # First run with a kline store: seed it from the existing CSV once
+    if len(store) == 0:
+        merge_into_store(sink, pd.read_csv(csv_filename, sep='|', header=None, names=COLUMNS))
+
+    # Resume: download only the missing tail (and head, if the window grew)
+    print(f"Resuming {csv_filename}: stored data ends at {last_ts}.")
+    tail = fetch_klines(symbol, (last_ts + 60) * 1000, now_ms, now_ms)
+    if tail is None:
+        return
+
+    if first_ts > window_start + 60:
+        head_start, head_end = window_start + 60, first_ts - 60
+        missing = missing_ranges(store, head_start, head_end, skip=sink["unfillable"])
+        print(f"Backfilling {(head_end - head_start) // 60 + 1} minutes before {first_ts} from the kline store, "
+              f"{sum((end - start) // 60 + 1 for start, end in missing)} of them from the API.")
+        if missing:
+            try:
+                klines = download_ranges(symbol, [(start * 1000, end * 1000) for start, end in missing],
+                                         interval=INTERVAL, base_url=REST_URL)
+            except requests.RequestException as e:
+                print(f"Error fetching historical data: {e}")
+                return
+            merge_into_store(sink, klines_to_dataframe(klines, now_ms))
+        head = pd.DataFrame(store.read_range(head_start, head_end, columns=COLUMNS))
+        existing = pd.read_csv(csv_filename, sep='|', header=None, names=COLUMNS)
+        df = pd.concat([head, existing, tail], ignore_index=True)
+        df = df.drop_duplicates(subset="Timestamp", keep="last").sort_values("Timestamp")
+        tmp_path = f"{csv_filename}.tmp"
+        df.to_csv(tmp_path, sep='|', index=False, header=False)
+        os.replace(tmp_path, csv_filename)
+        added = len(df) - len(existing)
+    else:
+        tail = tail[tail["Timestamp"] > last_ts]
+        tail.to_csv(csv_filename, sep='|', index=False, header=False, mode='a')
+        added = len(tail)
+
+    merge_into_store(sink, tail)
+
+    dropped = compact_csv(csv_filename, num_days)
+    print(f"Added {added} new data points to {csv_filename} (dropped {dropped} rows older than {num_days} days).")
+
+def missing_ranges(store, start_ts, end_ts, skip=()):
+    """
+    The (first_ts, last_ts) minute ranges inside [start_ts, end_ts] the kline
+    store holds no row for, oldest first. Gaps listed in 'skip' (known to have
+    no trades on the exchange, see repair_gaps) are left out.
+    """
+    first, last = store.first_timestamp(), store.last_timestamp()
+    if first is None:
+        return [(start_ts, end_ts)]
+    gaps = [gap for gap in store.find_gaps() if gap not in skip]
+    ranges = [(start_ts, first - 60)] if start_ts < first else []
+    ranges += gaps + ([(last + 60, end_ts)] if end_ts > last else [])
+    clipped = [(max(lo, start_ts), min(hi, end_ts)) for lo, hi in ranges]
+    return [(lo, hi) for lo, hi in clipped if lo <= hi]
+
+# ----------------------------------------------------------------------------
+# Append-only CSV writer and retention compaction
+# ----------------------------------------------------------------------------
+
+def append_kline(path, row):
+    """
+    Append a single kline row to the realtime CSV ('|' separated, no header).
+    One small write in append mode: the cost does not depend on the file size,
+    and readers such as compute_asset.py never see a half-rewritten file.
+    """
+    line = "|".join(str(value) for value in row) + "\n"
+    with open(path, "a") as f:
+        f.write(line)
+
+def compact_csv(path, retention_days):
+    """
+    Drop every row older than retention_days (relative to the newest row) in one pass.
+    Only the Timestamp column is parsed; the kept lines are copied byte for byte
+    into a temporary file which then atomically replaces the original.
+    Returns the number of dropped rows.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0
+
+    timestamps = pd.read_csv(path, sep='|', header=None, usecols=[0])[0]
+    cutoff = timestamps.iloc[-1] - retention_days * 24 * 60 * 60
+    drop_count = int((timestamps <= cutoff).sum())
+    if drop_count == 0:
+        return 0
+
+    tmp_path = f"{path}.tmp"
+    with open(path, "r") as src, open(tmp_path, "w") as dst:
+        # Skip the expired lines, then copy the rest unchanged
+        for _ in itertools.islice(src, drop_count):
+            pass
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, path)
+    return drop_count
+
+# ----------------------------------------------------------------------------
+# Gap detection and repair
+# ----------------------------------------------------------------------------
+
+def merge_csv(path, df):
+    """
+    Insert rows into the realtime CSV, keeping it sorted and unique on Timestamp.
+    Rows newer than the last line are appended; rows inside the stored span
+    trigger one atomic rewrite. Rows older than the first line are outside the
+    retention window and ignored.
+    """
+    first_ts, last_ts = read_csv_bounds(path)
+    if last_ts is None:
+        df.to_csv(path, sep='|', index=False, header=False)
+        return
+
+    inside = df[(df["Timestamp"] > first_ts) & (df["Timestamp"] < last_ts)]
+    if len(inside):
+        existing = pd.read_csv(path, sep='|', header=None, names=COLUMNS)
+        merged = pd.concat([existing, inside], ignore_index=True)
+        merged = merged.drop_duplicates(subset="Timestamp").sort_values("Timestamp")
+        tmp_path = f"{path}.tmp"
+        merged.to_csv(tmp_path, sep='|', index=False, header=False)
+        os.replace(tmp_path, path)
+
+    newer = df[df["Timestamp"] > last_ts]
+    newer.to_csv(path, sep='|', index=False, header=False, mode='a')
+
+def repair_gaps(sink):
+    """
+    Make the sink's history dense again: find every missing minute between the
+    stored rows of the kline store, plus the minutes since its last row (e.g.
+    a WebSocket outage), and download only those ranges from the REST API.
+    Returns the number of rows that were added to the store.
+    """
+    symbol, store = sink["symbol"], sink["store"]
+    last_ts = store.last_timestamp()
+    if last_ts is None:
+        return 0  # nothing stored yet: that is the backfill's job
+
+    now_ms = int(time.time() * 1000)
+    gaps = [gap for gap in store.find_gaps() if gap not in sink["unfillable"]]
+    ranges = [(start * 1000, end * 1000) for start, end in gaps]
+    if now_ms - (last_ts + 60) * 1000 >= 60000:
+        # At least one closed minute is missing at the end
+        ranges.append(((last_ts + 60) * 1000, now_ms))
+    if not ranges:
+        return 0
+
+    print(f"Repairing {symbol.upper()}: {len(gaps)} gap(s) inside the history, "
+          f"{len(ranges) - len(gaps)} at the end.")
+    try:
+        klines = download_ranges(symbol, ranges, interval=INTERVAL, base_url=REST_URL)
+    except requests.RequestException as e:
+        print(f"Error repairing gaps: {e}")
+        return 0
+
+    df = klines_to_dataframe(klines, now_ms)
+    added = merge_into_store(sink, df)
+    merge_csv(sink["csv"], df)
+
+    # Whatever is still missing was not traded on the exchange: do not ask again
+    sink["unfillable"].update(set(gaps) & set(store.find_gaps()))
+    print(f"Repaired {symbol.upper()}: added {added} klines.")
+    return added
 
 # ----------------------------------------------------------------------------
 # WebSocket Callbacks
 # ----------------------------------------------------------------------------
 
 def on_message(ws, message):
-    data = json5.loads(message)
+    # Most kline events are updates of the still-open candle: skip them before
+    # paying for a JSON parse, so the cost per message stays flat with many pairs
+    if '"x":true' not in message:
+        return
+    received = time.time()
+
+    data = json.loads(message)["data"]
+    sink = sinks.get(data["s"])
+    if sink is None:
+        return
+
     kline = data['k']
     is_kline_closed = kline['x']
     if is_kline_closed:
@@ -173,35 +434,62 @@ def on_message(ws, message):
         taker_buy_base_volume = float(kline['V'])
         taker_buy_quote_volume = float(kline['Q'])
         number_of_trades = int(kline['n'])
+        trace = latency_trace.trace_id(data["s"], timestamp)
 
-        # Read the existing data from the CSV (with column names for convenience)
-        df = pd.read_csv(CSV_FILENAME, sep='|', header=None, names=COLUMNS, engine='python')
-
-        # If you want to maintain a rolling window, remove the first row:
-        if len(df) > 0:
-            df = df.iloc[1:]
-
-        # Create a new DataFrame row for the new data
-        new_data = pd.DataFrame([[
+        # Append one line; the file is never re-read or rewritten here
+        row = [
             timestamp, open_price, high_price, low_price, close_price, volume,
             quote_asset_volume, taker_buy_base_volume, taker_buy_quote_volume,
             number_of_trades
-        ]], columns=COLUMNS)
-
-        # Append the new data
-        df = pd.concat([df, new_data], ignore_index=True)
-
-        # Save back to the CSV file
-        df.to_csv(CSV_FILENAME, sep='|', index=False, header=False)
-
-        print(f"Appended data - Timestamp: {timestamp}, "
+        ]
+        # The store skips rows it already holds (e.g. fetched by repair_gaps)
+        if sink["store"].append_row(row) == 0:
+            return
+        # Roll the new minute into the 5m/15m/1h/1d bars (newest bar updated in place)
+        sink["pyramid"].sync()
+        append_kline(sink["csv"], row)
+        if latency_trace.enabled:
+            latency_trace.record(trace, "close", (kline["T"] + 1) / 1000)
+            latency_trace.record(trace, "event", data["E"] / 1000)
+            latency_trace.record(trace, "receive", received)
+            latency_trace.record(trace, "append")
+
+        # Signal path: the decision on the new bar goes straight to the order scripts
+        if "engine" in sink:
+            intent = sink["engine"].on_kline(row)
+            latency_trace.record(trace, "signal")
+            act_on(sink["engine"], intent, trace)
+
+        # Trim the rows that fell out of the retention window, in bulk
+        sink["appended_since_compact"] += 1
+        if sink["appended_since_compact"] >= COMPACT_EVERY:
+            sink["appended_since_compact"] = 0
+            dropped = compact_csv(sink["csv"], RETENTION_DAYS)
+            if dropped:
+                print(f"Compacted {sink['csv']}: dropped {dropped} rows older than {RETENTION_DAYS} days")
+
+        print(f"Appended {data['s']} - Timestamp: {timestamp}, "
               f"O: {open_price}, H: {high_price}, L: {low_price}, C: {close_price}, "
               f"V: {volume}, QAV: {quote_asset_volume}, "
               f"TBBAV: {taker_buy_base_volume}, TBQAV: {taker_buy_quote_volume}, "
               f"NoT: {number_of_trades}")
 
 def on_open(ws):
-    print("WebSocket connection opened. Listening for new klines...")
+    # Minutes closed while we were disconnected never arrive on the socket:
+    # fetch them before the first message of this connection is handled
+    for sink in sinks.values():
+        repair_gaps(sink)
+        if "engine" in sink:
+            engine = sink["engine"]
+            intent = engine.catch_up()
+            if intent is not None:
+                act_on(engine, intent, latency_trace.trace_id(sink["symbol"], engine.ts[-1]))
+    print(f"WebSocket connection opened. Listening for new klines of {', '.join(sinks)}...")
+
+def act_on(engine, intent, trace=None):
+    """Hand a streaming engine's order intent (if any) to the order scripts."""
+    if intent is not None:
+        dispatch(intent, config["exchange"].lower(), engine.trade_count, trace)
 
 def on_close(ws, close_status_code, close_msg):
     print("WebSocket connection closed")
@@ -226,15 +514,31 @@ if __name__ == "__main__":
         days_to_fetch = diff_days
         print(f"Running with --once. Fetching ~{days_to_fetch} days of data from Nov 29, 2024 to today.")
 
-    # Fetch historical data
-    fetch_historical_data(days_to_fetch)
+    # With --repair, only fill the holes of the stored history
+    if args.repair:
+        for sink in sinks.values():
+            repair_gaps(sink)
+        exit(0)
+
+    # Fetch historical data (only the missing minutes unless --full is given)
+    for sink in sinks.values():
+        print(f"--- {sink['symbol'].upper()} ---")
+        fetch_historical_data(sink, days_to_fetch, resume=not args.full)
 
     # If --once is specified, then exit after fetching data
     if args.once:
         print("Finished fetching historical data. Exiting (because --once is set).")
         exit(0)
 
-    # Otherwise, start the WebSocket to keep appending new 1m klines
+    # The engine warms up on the stored history of the traded pair, then follows the socket
+    if args.stream:
+        traded = config.get("pair", "").upper()
+        if traded not in sinks:
+            raise ValueError(f"--stream trades 'pair' ({traded or 'missing'}), which is not among the fetched pairs.")
+        sinks[traded]["engine"] = StreamEngine.from_config(config)
+        print(f"Streaming signals of {traded} from {len(sinks[traded]['engine'].ts)} stored bars.")
+
+    # Otherwise, start the WebSocket to keep appending new 1m klines of every pair
     while True:
         ws = websocket.WebSocketApp(
             WS_URL,
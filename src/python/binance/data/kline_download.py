@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm  # for progress bar
+
+# ----------------------------------------------------------------------------
+# Configuration
+# ----------------------------------------------------------------------------
+
+BASE_URL = "https://api.binance.com"
+KLINES_PATH = "/api/v3/klines"
+
+# Binance returns at most 1000 klines per call
+LIMIT_PER_CALL = 1000
+# Parallel requests (and pooled connections) used by download_klines
+MAX_WORKERS = 8
+# Request weight budget per minute (Binance allows 6000 per IP)
+WEIGHT_LIMIT_1M = 6000
+# Only use this share of the budget, so other scripts on the box keep working
+WEIGHT_SAFETY = 0.8
+# Weight of one /api/v3/klines call
+KLINES_WEIGHT = 2
+# Retries for a single window on connection errors / 5xx / 429
+MAX_RETRIES = 5
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "1d": 86_400_000,
+}
+
+# ----------------------------------------------------------------------------
+# Rate limit tracking
+# ----------------------------------------------------------------------------
+
+class WeightThrottle:
+    """
+    Keeps the request weight used in the current minute below a budget.
+    Every request reserves KLINES_WEIGHT before it is sent; the X-MBX-USED-WEIGHT-1M
+    header of each response then corrects the local estimate (it also counts
+    requests made by other processes with the same IP). A 429/418 response
+    blocks everybody until its Retry-After has passed.
+    """
+
+    def __init__(self, weight_limit=WEIGHT_LIMIT_1M, safety=WEIGHT_SAFETY, request_weight=KLINES_WEIGHT):
+        self.max_weight = int(weight_limit * safety)
+        self.request_weight = request_weight
+        self.lock = threading.Lock()
+        self.minute = int(time.time() // 60)
+        self.used = 0
+        self.blocked_until = 0.0
+
+    def _roll_minute(self, now):
+        minute = int(now // 60)
+        if minute != self.minute:
+            self.minute = minute
+            self.used = 0
+
+    def acquire(self):
+        """Block until one more request fits in the budget, then reserve it."""
+        while True:
+            with self.lock:
+                now = time.time()
+                self._roll_minute(now)
+                if now >= self.blocked_until and self.used + self.request_weight <= self.max_weight:
+                    self.used += self.request_weight
+                    return
+                wait = max(self.blocked_until - now, (self.minute + 1) * 60 - now)
+            time.sleep(min(max(wait, 0.01), 1.0))
+
+    def update(self, headers):
+        """Take the server-side weight counter into account."""
+        value = headers.get("X-MBX-USED-WEIGHT-1M") or headers.get("X-MBX-USED-WEIGHT")
+        if value is None:
+            return
+        with self.lock:
+            self._roll_minute(time.time())
+            self.used = max(self.used, int(value))
+
+    def block(self, seconds):
+        """Stop sending requests for the given number of seconds."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.time() + seconds)
+
+# ----------------------------------------------------------------------------
+# Session and window helpers
+# ----------------------------------------------------------------------------
+
+def make_session(pool_size=MAX_WORKERS):
+    """Return a requests.Session that keeps up to pool_size connections alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def split_windows(start_ms, end_ms, interval_ms, limit=LIMIT_PER_CALL):
+    """
+    Split [start_ms, end_ms] into consecutive windows that each hold at most
+    'limit' klines. Returns a list of (window_start_ms, window_end_ms).
+    """
+    # Align the first window on an open time, like Binance does
+    start_ms = ((start_ms + interval_ms - 1) // interval_ms) * interval_ms
+    span = interval_ms * limit
+    windows = []
+    while start_ms <= end_ms:
+        windows.append((start_ms, min(start_ms + span - 1, end_ms)))
+        start_ms += span
+    return windows
+
+def fetch_window(session, throttle, base_url, symbol, interval, window, limit=LIMIT_PER_CALL):
+    """
+    Download one window of klines, retrying on connection errors, timeouts,
+    5xx and rate limit responses. Raises requests.HTTPError on any other API error.
+    """
+    params = {
+        "symbol": symbol.upper(),
+        "interval": interval,
+        "startTime": window[0],
+        "endTime": window[1],
+        "limit": limit
+    }
+    for attempt in range(1, MAX_RETRIES + 1):
+        throttle.acquire()
+        try:
+            response = session.get(f"{base_url}{KLINES_PATH}", params=params, timeout=30)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(attempt)
+            continue
+
+        throttle.update(response.headers)
+
+        if response.status_code in (418, 429):
+            # Rate limited: everybody waits as long as the server asks
+            throttle.block(float(response.headers.get("Retry-After", 60)))
+            continue
+        if response.status_code >= 500 and attempt < MAX_RETRIES:
+            time.sleep(attempt)
+            continue
+
+        response.raise_for_status()
+        return response.json()
+
+    raise requests.HTTPError(f"Giving up on klines window {window} after {MAX_RETRIES} attempts")
+
+# ----------------------------------------------------------------------------
+# Public entry point
+# ----------------------------------------------------------------------------
+
+def download_ranges(symbol, ranges, interval="1m", base_url=BASE_URL,
+                    workers=MAX_WORKERS, session=None, throttle=None, progress=True):
+    """
+    Download every kline with an open time inside any of the given
+    [start_ms, end_ms] ranges (sorted, non-overlapping).
+
+    Each range is split into fixed windows of LIMIT_PER_CALL klines and all
+    windows are fetched concurrently over one pooled session, throttled by the
+    Binance request weight headers. The windows are stitched back in
+    chronological order, so the result is the same list of raw klines a
+    sequential walk would return.
+    """
+    windows = []
+    for start_ms, end_ms in ranges:
+        windows.extend(split_windows(start_ms, end_ms, INTERVAL_MS[interval]))
+    if not windows:
+        return []
+
+    session = session or make_session(workers)
+    throttle = throttle or WeightThrottle()
+    chunks = [None] * len(windows)
+
+    progress_bar_format = "\x1b[92m{l_bar}{bar}\x1b[0m"
+    with ThreadPoolExecutor(max_workers=workers) as pool, \
+         tqdm(total=len(windows), desc="Downloading klines", bar_format=progress_bar_format,
+              disable=not progress) as bar:
+        futures = {
+            pool.submit(fetch_window, session, throttle, base_url, symbol, interval, window): i
+            for i, window in enumerate(windows)
+        }
+        try:
+            for future in as_completed(futures):
+                chunks[futures[future]] = future.result()
+                bar.update(1)
+        except Exception:
+            # Do not keep downloading the other windows after a fatal error
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    klines = []
+    for chunk in chunks:
+        klines.extend(chunk)
+    return klines
+
+def download_klines(symbol, start_ms, end_ms, **kwargs):
+    """Download every kline with an open time in [start_ms, end_ms] (see download_ranges)."""
+    return download_ranges(symbol, [(start_ms, end_ms)], **kwargs)
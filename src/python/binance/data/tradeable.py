@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 
-from binance.client import Client
 from binance.exceptions import BinanceAPIException
 import json5
+import sys
 from pathlib import Path
 
+# Shared helpers live next to the compute scripts in src/dist
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "dist"))
+from binance_urls import make_client
+
 # ----------------------------------------------------------------------------
 # Load the trading pair and API keys from apikey-crypto.json
 # ----------------------------------------------------------------------------
@@ -26,8 +30,8 @@ def is_tradeable(symbol):
     Check if a given symbol (e.g., BTCUSDT) is tradeable on Binance.
     """
     try:
-        # Initialize Binance client
-        client = Client(API_KEY, API_SECRET)
+        # Initialize Binance client (or the local stand-in, see binance_urls.py)
+        client = make_client(config, API_KEY, API_SECRET)
         
         # Fetch exchange info to find the symbol
         exchange_info = client.get_exchange_info()
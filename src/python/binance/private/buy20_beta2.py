@@ -9,10 +9,15 @@ from pathlib import Path
 import sys
 import datetime
 
-from binance.client import Client
 from binance.exceptions import BinanceAPIException, BinanceRequestException
 
-BASE_URL = 'https://api.binance.com'
+# Shared helpers live next to the compute scripts in src/dist
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "dist"))
+from binance_urls import REST_BASE_URL, rest_base_url, make_client
+import latency_trace
+
+# Replaced by "rest_base_url" from the config in main()
+BASE_URL = REST_BASE_URL
 SLIPPAGE_FILE = '/home/g1pablo_escaida1/pablitos-money-printer/src/view/output/slippage.txt'
 
 # ------------------- HELPER FUNCTIONS ------------------- #
@@ -139,6 +144,7 @@ def write_slippage_to_file(slippage_percent):
 
 # ------------------- MAIN SCRIPT ------------------- #
 def main():
+    global BASE_URL
     print("Executing Margin BUY order script...")
     home_dir = Path.home()
 
@@ -147,6 +153,9 @@ def main():
         with open(f"{home_dir}/pablitos-money-printer/src/dist/apikey-crypto.json", "r") as f:
             api_keys = json5.load(f)
 
+        BASE_URL = rest_base_url(api_keys)
+        latency_trace.enable(api_keys)
+        trace = latency_trace.current()
         api_key = api_keys.get('key')
         api_secret = api_keys.get('secret')
         trading_pair = api_keys.get('pair', "SUIUSDC")
@@ -168,7 +177,7 @@ def main():
         print(f"[INFO] Base:  {base_symbol}, Quote: {quote_symbol}")
 
         # 3) Create client & sync time
-        client = Client(api_key, api_secret)
+        client = make_client(api_keys, api_key, api_secret)
         sync_server_time(client)
 
         # 4) Fetch margin account info
@@ -261,7 +270,9 @@ def main():
 
             try:
                 print(f" - Order {i}/{num_orders} => {order_size} {quote_symbol}")
+                latency_trace.record(trace, "submit")
                 order_resp = place_order_with_retry(client, trading_pair, order_size)
+                latency_trace.record_fill(trace, order_resp, getattr(client, "time_offset", 0))
                 print(f"   [OK] orderId={order_resp.get('orderId')}")
 
                 # ------------------
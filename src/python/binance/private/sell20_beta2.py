@@ -5,9 +5,13 @@ import json
 import math
 import time
 import datetime
-from binance.client import Client
 from binance.exceptions import BinanceAPIException, BinanceRequestException
 
+# Shared helpers live next to the compute scripts in src/dist
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "dist"))
+from binance_urls import make_client
+import latency_trace
+
 # Start the timer at the very beginning of the script execution
 script_start_time = time.time()
 
@@ -70,6 +74,8 @@ try:
     # Step 1: Read API keys (and the number of simulation orders) from the JSON file
     with open(f"{home_dir}/pablitos-money-printer/src/dist/apikey-crypto.json", "r") as file:
         api_keys = json5.load(file)
+    latency_trace.enable(api_keys)
+    trace = latency_trace.current()
     
     api_key = api_keys['key']
     api_secret = api_keys['secret']
@@ -79,7 +85,7 @@ try:
     num_orders = int(api_keys.get("number_sim_orders", 20))
 
     # Step 2: Initialize the Binance client
-    client = Client(api_key, api_secret)
+    client = make_client(api_keys, api_key, api_secret)
 
     # Synchronize time with Binance server
     sync_server_time(client)
@@ -127,7 +133,9 @@ try:
             continue
 
         print(f"Placing SELL order {i}/{num_orders} for {current_order_size} {asset_to_sell}...")
+        latency_trace.record(trace, "submit")
         order = place_order_with_retry(client, trading_pair, 'SELL', current_order_size)
+        latency_trace.record_fill(trace, order, getattr(client, "time_offset", 0))
         print(f"Order {i} executed successfully. Order details:")
         print(json.dumps(order, indent=4))
         time.sleep(1)  # small pause to respect rate limits
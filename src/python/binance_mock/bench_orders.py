@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import websocket
+
+from binance_mock import spawn_server
+
+# binance_urls.py lives next to the compute scripts in src/dist
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "dist"))
+from binance_urls import make_client
+
+# ----------------------------------------------------------------------------
+# Reproducible benchmark of the order and ingestion paths against the local
+# Binance stand-in. Nothing here talks to Binance.
+#
+#   python3 bench_orders.py --latency 0.02 --orders 200
+#
+# Order paths go through python-binance exactly like the scripts do (same
+# client, signing and JSON decoding); the ingestion path reads the combined
+# kline WebSocket like keep-fetching.py, with the stand-in clock running fast.
+# ----------------------------------------------------------------------------
+
+parser = argparse.ArgumentParser(description="Benchmark order round trips and WebSocket ingestion against the Binance stand-in.")
+parser.add_argument("--latency", type=float, default=0.02, help="Simulated latency per response in seconds (default 0.02).")
+parser.add_argument("--orders", type=int, default=100, help="Orders per path (default 100).")
+parser.add_argument("--symbols", type=int, default=4, help="Pairs on the WebSocket (default 4).")
+parser.add_argument("--speed", type=float, default=60000, help="Stand-in clock speed for the ingestion test (default 60000).")
+parser.add_argument("--seconds", type=float, default=5.0, help="Duration of the ingestion test (default 5).")
+args = parser.parse_args()
+
+
+def report(name, samples):
+    """One line of mean / p50 / p95 / p99 in milliseconds."""
+    ms = sorted(s * 1000 for s in samples)
+    pct = lambda q: ms[min(len(ms) - 1, int(q * len(ms)))]
+    print(f"{name:<28} {len(ms):>6} {statistics.mean(ms):>8.2f} {pct(0.50):>8.2f} "
+          f"{pct(0.95):>8.2f} {pct(0.99):>8.2f} {len(ms) / (sum(ms) / 1000):>9.1f}")
+
+
+def timed(call, count):
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_orders(base_url):
+    config = {"rest_base_url": base_url}
+    futures = make_client(config, "key", "secret", testnet=True)
+    margin = make_client(config, "key", "secret")
+    futures.futures_change_leverage(symbol="BTCUSDT", leverage=2)
+
+    print(f"{'path':<28} {'calls':>6} {'mean ms':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'calls/s':>9}")
+    report("futures ticker", timed(lambda: futures.futures_symbol_ticker(symbol="BTCUSDT"), args.orders))
+    report("futures balance", timed(futures.futures_account_balance, args.orders))
+    sides = iter(["BUY", "SELL"] * args.orders)
+    report("futures market order", timed(lambda: futures.futures_create_order(
+        symbol="BTCUSDT", side=next(sides), type="MARKET", quantity=1, newOrderRespType="RESULT"), args.orders))
+    report("margin account", timed(margin.get_margin_account, args.orders))
+    sides = iter(["BUY", "SELL"] * args.orders)
+    report("margin market order", timed(lambda: margin.create_margin_order(
+        symbol="SUIUSDC", side=next(sides), type="MARKET", quantity=1), args.orders))
+
+
+def bench_ingestion():
+    # A separate stand-in whose clock closes 'speed' klines per real minute
+    server, base_url = spawn_server("--speed", str(args.speed), "--latency", "0")
+    try:
+        symbols = [f"SYM{i}USDT".lower() for i in range(args.symbols)]
+        ws = websocket.create_connection(base_url.replace("http", "ws", 1) + "/stream?streams=" +
+                                         "/".join(f"{symbol}@kline_1m" for symbol in symbols))
+        closed = 0
+        deadline = time.time() + args.seconds
+        while time.time() < deadline:
+            message = ws.recv()
+            if '"x":true' not in message:
+                continue
+            # Same work as keep-fetching's on_message before it writes the row
+            data = json.loads(message)["data"]
+            row = [data["k"][key] for key in ("t", "o", "h", "l", "c", "v", "q", "V", "Q", "n")]
+            closed += 1
+        ws.close()
+    finally:
+        server.terminate()
+    # The stand-in closes speed / 60 klines per second and pair
+    offered = args.speed / 60 * args.seconds * args.symbols
+    print(f"WebSocket ingestion: {closed} of {offered:.0f} closed klines for {args.symbols} pairs "
+          f"in {args.seconds:.0f}s ({closed / args.seconds:.0f} klines/s)")
+
+
+if __name__ == "__main__":
+    server, base_url = spawn_server("--latency", str(args.latency), "--balance", "USDC=100000", "--balance", "SUI=1000")
+    try:
+        print(f"Stand-in latency: {args.latency * 1000:.0f} ms per response")
+        bench_orders(base_url)
+    finally:
+        server.terminate()
+    bench_ingestion()
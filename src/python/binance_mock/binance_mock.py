@@ -0,0 +1,861 @@
+#!/usr/bin/env python3
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from urllib.request import urlopen
+
+import numpy as np
+import pandas as pd
+
+# The kline store lives next to the compute scripts in src/dist
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "dist"))
+from kline_store import KlineStore, COLUMNS, is_store
+
+# ----------------------------------------------------------------------------
+# Local stand-in for the parts of Binance the scripts use
+#
+#   python3 binance_mock.py --port 8765 --data SUIUSDC=../../assets/suiusdc.klines
+#
+# then put "rest_base_url": "http://127.0.0.1:8765" and
+# "ws_base_url": "ws://127.0.0.1:8765" in apikey-crypto.json (see
+# src/dist/binance_urls.py). One port serves:
+#
+#   /api/v3   ping, time, klines, ticker/price, exchangeInfo
+#   /sapi/v1  margin account, maxBorrowable, loan, repay, borrow-repay, order
+#   /fapi/v*  ping, time, klines, ticker/price, exchangeInfo, leverage,
+#             balance, account, positionRisk, order, userTrades
+#   /ws/<symbol>@kline_1m and /stream?streams=...   kline WebSocket feed
+#
+# Klines come from recorded data (a kline store or a '|' separated CSV, .gz
+# allowed) shifted so that the last --replay-minutes of the recording lie in
+# the future and are replayed live, or from a deterministic synthetic series.
+# The clock can run --speed times faster than real time. Orders fill at once
+# at the current price against in-memory balances; signatures are not checked.
+# ----------------------------------------------------------------------------
+
+MINUTE_MS = 60_000
+
+# Per-minute request weight, as on Binance
+WEIGHT_LIMIT_1M = 6000
+ENDPOINT_WEIGHTS = {
+    "klines": 2, "exchangeInfo": 20, "ticker/price": 2, "margin/account": 10,
+    "account": 5, "balance": 5, "positionRisk": 5, "userTrades": 5,
+}
+
+# Fees charged on fills
+MARGIN_FEE = 0.001
+FUTURES_FEE = 0.0004
+
+# Quote assets recognised when splitting a symbol into base/quote
+QUOTE_ASSETS = ["USDT", "USDC", "FDUSD", "BUSD", "TUSD", "EUR", "BTC", "ETH", "BNB"]
+
+parser = argparse.ArgumentParser(description="Local Binance stand-in for offline load and latency tests.")
+parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default 127.0.0.1)")
+parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default 8765, 0 picks a free one)")
+parser.add_argument("--data", action="append", default=[], metavar="SYMBOL=PATH",
+                    help="Recorded klines for a symbol: kline store directory or '|' separated CSV (repeatable)")
+parser.add_argument("--symbols", default="",
+                    help="Comma separated synthetic symbols listed in exchangeInfo (any symbol is served once asked for)")
+parser.add_argument("--replay-minutes", type=int, default=1440,
+                    help="Minutes at the end of each recording replayed live (default 1440)")
+parser.add_argument("--speed", type=float, default=1.0,
+                    help="Clock speed: 60 closes one kline per real second (default 1.0)")
+parser.add_argument("--open-updates", type=int, default=0,
+                    help="Unclosed (x=false) kline events sent per candle on the WebSocket (default 0)")
+parser.add_argument("--latency", type=float, default=0.0, help="Added delay per response in seconds")
+parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay of up to this many seconds")
+parser.add_argument("--weight-limit", type=int, default=WEIGHT_LIMIT_1M,
+                    help=f"Request weight per minute before answering 429 (default {WEIGHT_LIMIT_1M})")
+parser.add_argument("--error-rate", type=float, default=0.0,
+                    help="Share of REST requests answered with a 503 (default 0)")
+parser.add_argument("--balance", action="append", default=[], metavar="ASSET=AMOUNT",
+                    help="Starting margin balance (repeatable, default USDT=10000 and USDC=10000)")
+parser.add_argument("--futures-balance", type=float, default=10000.0,
+                    help="Starting USDT futures wallet balance (default 10000)")
+
+
+def split_symbol(symbol):
+    """'SUIUSDC' -> ('SUI', 'USDC')."""
+    for quote in QUOTE_ASSETS:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    return symbol[:-4], symbol[-4:]
+
+
+def fmt(value):
+    """Decimal string the way Binance sends numbers."""
+    return "%.8f" % value
+
+
+def rest_klines(open_ms, columns):
+    """
+    Raw REST klines ([open time, "open", ..., "ignore"]) from numpy columns
+    named like the kline store. Formatted column by column: this is the hot
+    path of every klines request.
+    """
+    text = {name: ["%.8f" % v for v in np.asarray(columns[name], dtype=np.float64).tolist()]
+            for name in ("Open", "High", "Low", "Close", "Volume", "QuoteAssetVolume",
+                         "TakerBuyBaseVolume", "TakerBuyQuoteVolume")}
+    open_list = np.asarray(open_ms, dtype=np.int64).tolist()
+    trades = np.asarray(columns["NumberOfTrades"], dtype=np.int64).tolist()
+    return [[t, o, h, low, c, v, t + MINUTE_MS - 1, qv, n, tb, tq, "0"]
+            for t, o, h, low, c, v, qv, n, tb, tq in zip(
+                open_list, text["Open"], text["High"], text["Low"], text["Close"], text["Volume"],
+                text["QuoteAssetVolume"], trades, text["TakerBuyBaseVolume"], text["TakerBuyQuoteVolume"])]
+
+
+class ApiError(Exception):
+    """Error answered as {"code": ..., "msg": ...}, like the real API."""
+
+    def __init__(self, code, msg, status=400, headers=None):
+        super().__init__(msg)
+        self.code = code
+        self.msg = msg
+        self.status = status
+        self.headers = headers or {}
+
+# ----------------------------------------------------------------------------
+# Clock and market data
+# ----------------------------------------------------------------------------
+
+class MockClock:
+    """Wall clock, optionally running 'speed' times faster from start-up on."""
+
+    def __init__(self, speed=1.0):
+        self.speed = speed
+        self.started_real = time.time()
+
+    def now_ms(self):
+        elapsed = time.time() - self.started_real
+        return int((self.started_real + elapsed * self.speed) * 1000)
+
+    def real_seconds(self, mock_ms):
+        """Real time it takes for mock_ms of mock time to pass."""
+        return mock_ms / 1000 / self.speed
+
+
+def load_recording(path):
+    """Recorded klines as {column: numpy array}, Timestamp in seconds."""
+    if is_store(path):
+        return {name: np.array(values) for name, values in KlineStore(path).read_range().items()}
+    df = pd.read_csv(path, sep="|", header=None, names=COLUMNS, usecols=range(len(COLUMNS)))
+    df = df.sort_values("Timestamp").drop_duplicates(subset="Timestamp")
+    return {name: df[name].to_numpy() for name in COLUMNS}
+
+
+class MarketData:
+    """
+    1m klines per symbol. Recorded symbols are shifted so the kline
+    'replay_minutes' before the end of the recording is the one open at
+    start-up; every other symbol gets a deterministic synthetic series.
+    Only klines opened at or before the mock clock are ever served.
+    """
+
+    def __init__(self, clock, recordings=None, replay_minutes=1440):
+        self.clock = clock
+        self.recorded = {}
+        current_minute = clock.now_ms() // MINUTE_MS * MINUTE_MS
+        for symbol, columns in (recordings or {}).items():
+            open_ms = columns["Timestamp"].astype(np.int64) * 1000
+            if len(open_ms) == 0:
+                continue
+            live_index = max(0, len(open_ms) - max(1, replay_minutes))
+            shifted = open_ms + (current_minute - open_ms[live_index])
+            self.recorded[symbol] = dict(columns, open_ms=shifted)
+
+    def symbols(self):
+        return list(self.recorded)
+
+    # -- synthetic series ---------------------------------------------------
+    @staticmethod
+    def _noise(symbol, minutes, salt):
+        """Deterministic uniform [0, 1) values per minute (vectorized integer hash)."""
+        seed = np.uint64(zlib.crc32(f"{symbol}{salt}".encode()))
+        with np.errstate(over="ignore"):
+            x = minutes.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15) + seed
+            x ^= x >> np.uint64(31)
+            x *= np.uint64(0xBF58476D1CE4E5B9)
+            x ^= x >> np.uint64(29)
+        return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+    def _synthetic_prices(self, symbol, minutes):
+        base = 1.0 + zlib.crc32(symbol.encode()) % 1000
+        return base * (1 + 0.04 * np.sin(minutes / 720) + 0.01 * np.sin(minutes / 53)
+                       + 0.002 * (self._noise(symbol, minutes, "p") - 0.5))
+
+    def _synthetic_klines(self, symbol, first_ms, last_ms):
+        """Raw REST klines of the synthetic series, computed a window at a time."""
+        open_ms = np.arange(first_ms, last_ms + 1, MINUTE_MS, dtype=np.int64)
+        minutes = open_ms // MINUTE_MS
+        o = self._synthetic_prices(symbol, minutes)
+        c = self._synthetic_prices(symbol, minutes + 1)
+        volume = 10 + 1000 * self._noise(symbol, minutes, "v")
+        taker = volume * (0.3 + 0.4 * self._noise(symbol, minutes, "t"))
+        return rest_klines(open_ms, {
+            "Open": o, "Close": c,
+            "High": np.maximum(o, c) * (1 + 0.001 * self._noise(symbol, minutes, "h")),
+            "Low": np.minimum(o, c) * (1 - 0.001 * self._noise(symbol, minutes, "l")),
+            "Volume": volume, "QuoteAssetVolume": volume * c,
+            "TakerBuyBaseVolume": taker, "TakerBuyQuoteVolume": taker * c,
+            "NumberOfTrades": 20 + (500 * self._noise(symbol, minutes, "n")).astype(np.int64),
+        })
+
+    # -- queries -------------------------------------------------------------
+    def klines(self, symbol, start_ms=None, end_ms=None, limit=500):
+        """Raw REST klines with start_ms <= open time <= end_ms, capped by the clock."""
+        latest = self.clock.now_ms() // MINUTE_MS * MINUTE_MS
+        end_ms = latest if end_ms is None else min(end_ms, latest)
+
+        if symbol in self.recorded:
+            rec = self.recorded[symbol]
+            hi = int(np.searchsorted(rec["open_ms"], end_ms, side="right"))
+            if start_ms is None:
+                lo = max(0, hi - limit)
+            else:
+                lo = int(np.searchsorted(rec["open_ms"], start_ms, side="left"))
+                hi = min(hi, lo + limit)
+            return rest_klines(rec["open_ms"][lo:hi], {name: rec[name][lo:hi] for name in COLUMNS[1:]})
+
+        if start_ms is None:
+            first = end_ms // MINUTE_MS * MINUTE_MS - (limit - 1) * MINUTE_MS
+        else:
+            first = (start_ms + MINUTE_MS - 1) // MINUTE_MS * MINUTE_MS
+        last = min(end_ms // MINUTE_MS * MINUTE_MS, first + (limit - 1) * MINUTE_MS)
+        return self._synthetic_klines(symbol, first, last)
+
+    def price(self, symbol):
+        """Last price: close of the newest kline the clock has reached."""
+        klines = self.klines(symbol, limit=1)
+        if not klines:
+            raise ApiError(-1121, "Invalid symbol.")
+        return float(klines[-1][4])
+
+    def replay_end_ms(self, symbol):
+        """Open time of the last recorded kline, None for synthetic symbols."""
+        rec = self.recorded.get(symbol)
+        return int(rec["open_ms"][-1]) if rec else None
+
+# ----------------------------------------------------------------------------
+# Accounts
+# ----------------------------------------------------------------------------
+
+class Accounts:
+    """Cross margin balances and a one-way USDT futures account."""
+
+    def __init__(self, market, margin_balances, futures_balance):
+        self.market = market
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.margin = {asset: {"free": amount, "borrowed": 0.0} for asset, amount in margin_balances.items()}
+        self.wallet = futures_balance
+        self.positions = {}     # symbol -> {"amt", "entry"}
+        self.leverage = {}      # symbol -> int
+        self.orders = {}        # orderId -> response
+        self.trades = []
+
+    def _id(self):
+        self.next_id += 1
+        return self.next_id
+
+    def _asset(self, asset):
+        return self.margin.setdefault(asset, {"free": 0.0, "borrowed": 0.0})
+
+    # -- margin --------------------------------------------------------------
+    def margin_account(self):
+        with self.lock:
+            user_assets = [{
+                "asset": asset, "free": fmt(a["free"]), "locked": "0", "borrowed": fmt(a["borrowed"]),
+                "interest": "0", "netAsset": fmt(a["free"] - a["borrowed"]),
+            } for asset, a in self.margin.items()]
+        return {"borrowEnabled": True, "marginLevel": "999", "tradeEnabled": True,
+                "transferEnabled": True, "userAssets": user_assets}
+
+    def max_borrowable(self, asset, max_leverage=5):
+        with self.lock:
+            a = self._asset(asset)
+            amount = max(0.0, (a["free"] - a["borrowed"]) * (max_leverage - 1) - a["borrowed"])
+        return {"amount": fmt(amount), "borrowLimit": fmt(amount)}
+
+    def borrow(self, asset, amount):
+        with self.lock:
+            a = self._asset(asset)
+            a["free"] += amount
+            a["borrowed"] += amount
+            return {"tranId": self._id()}
+
+    def repay(self, asset, amount):
+        with self.lock:
+            a = self._asset(asset)
+            amount = min(amount, a["borrowed"])
+            if amount > a["free"]:
+                raise ApiError(-3041, "Balance is not enough")
+            a["free"] -= amount
+            a["borrowed"] -= amount
+            return {"tranId": self._id()}
+
+    def margin_order(self, symbol, side, quantity=None, quote_quantity=None):
+        price = self.market.price(symbol)
+        base, quote = split_symbol(symbol)
+        qty = quantity if quantity is not None else quote_quantity / price
+        cost = qty * price
+        with self.lock:
+            paid, received = (self._asset(quote), self._asset(base)) if side == "BUY" else \
+                             (self._asset(base), self._asset(quote))
+            spend, get = (cost, qty) if side == "BUY" else (qty, cost)
+            if qty <= 0 or spend > paid["free"] + 1e-9:
+                raise ApiError(-2010, "Account has insufficient balance for requested action.")
+            commission = get * MARGIN_FEE
+            paid["free"] -= spend
+            received["free"] += get - commission
+            order_id = self._id()
+        now = self.market.clock.now_ms()
+        return {
+            "symbol": symbol, "orderId": order_id, "clientOrderId": f"mock{order_id}", "transactTime": now,
+            "price": "0", "origQty": fmt(qty), "executedQty": fmt(qty), "cummulativeQuoteQty": fmt(cost),
+            "status": "FILLED", "timeInForce": "GTC", "type": "MARKET", "side": side,
+            "fills": [{"price": fmt(price), "qty": fmt(qty), "commission": fmt(commission),
+                       "commissionAsset": base if side == "BUY" else quote}],
+            "isIsolated": False,
+        }
+
+    # -- futures -------------------------------------------------------------
+    def _unrealized(self):
+        return sum(p["amt"] * (self.market.price(s) - p["entry"]) for s, p in self.positions.items() if p["amt"])
+
+    def _initial_margin(self):
+        return sum(abs(p["amt"]) * self.market.price(s) / self.leverage.get(s, 20)
+                   for s, p in self.positions.items() if p["amt"])
+
+    def set_leverage(self, symbol, leverage):
+        with self.lock:
+            self.leverage[symbol] = leverage
+        return {"leverage": leverage, "maxNotionalValue": "1000000", "symbol": symbol}
+
+    def futures_balance(self):
+        with self.lock:
+            unrealized = self._unrealized()
+            available = self.wallet + unrealized - self._initial_margin()
+        return [{
+            "accountAlias": "mock", "asset": "USDT", "balance": fmt(self.wallet),
+            "crossWalletBalance": fmt(self.wallet), "crossUnPnl": fmt(unrealized),
+            "availableBalance": fmt(available), "maxWithdrawAmount": fmt(max(0.0, available)),
+            "marginAvailable": True, "updateTime": self.market.clock.now_ms(),
+        }]
+
+    def position_risk(self):
+        with self.lock:
+            return [{
+                "symbol": symbol, "positionAmt": fmt(p["amt"]), "entryPrice": fmt(p["entry"]),
+                "markPrice": fmt(self.market.price(symbol)),
+                "unRealizedProfit": fmt(p["amt"] * (self.market.price(symbol) - p["entry"])),
+                "leverage": str(self.leverage.get(symbol, 20)), "positionSide": "BOTH",
+                "notional": fmt(p["amt"] * self.market.price(symbol)), "isolated": False,
+                "updateTime": self.market.clock.now_ms(),
+            } for symbol, p in self.positions.items()]
+
+    def futures_account(self):
+        balance = self.futures_balance()[0]
+        positions = self.position_risk()
+        for position in positions:
+            position["unrealizedProfit"] = position.pop("unRealizedProfit")
+        unrealized = float(balance["crossUnPnl"])
+        return {
+            "totalWalletBalance": balance["balance"], "totalUnrealizedProfit": balance["crossUnPnl"],
+            "totalMarginBalance": fmt(self.wallet + unrealized), "availableBalance": balance["availableBalance"],
+            "maxWithdrawAmount": balance["maxWithdrawAmount"], "canTrade": True,
+            "assets": [{"asset": "USDT", "walletBalance": balance["balance"], "unrealizedProfit": balance["crossUnPnl"],
+                        "availableBalance": balance["availableBalance"]}],
+            "positions": positions,
+        }
+
+    def futures_order(self, symbol, side, quantity, reduce_only=False):
+        if quantity <= 0:
+            raise ApiError(-4003, "Quantity less than or equal to zero.")
+        price = self.market.price(symbol)
+        with self.lock:
+            position = self.positions.setdefault(symbol, {"amt": 0.0, "entry": 0.0})
+            signed = quantity if side == "BUY" else -quantity
+            if reduce_only:
+                if position["amt"] == 0 or (position["amt"] > 0) == (signed > 0):
+                    raise ApiError(-2022, "ReduceOnly Order is rejected.")
+                signed = math.copysign(min(abs(signed), abs(position["amt"])), signed)
+
+            realized = 0.0
+            amt, entry = position["amt"], position["entry"]
+            if amt == 0 or (amt > 0) == (signed > 0):
+                new_amt = amt + signed
+                entry = (amt * entry + signed * price) / new_amt
+            else:
+                closed = min(abs(signed), abs(amt))
+                realized = closed * (price - entry) * (1 if amt > 0 else -1)
+                new_amt = amt + signed
+                if (new_amt > 0) != (amt > 0) and new_amt != 0:
+                    entry = price     # flipped: the remainder opens at this price
+            commission = abs(signed) * price * FUTURES_FEE
+
+            if abs(new_amt) > abs(amt):
+                needed = abs(new_amt) * price / self.leverage.get(symbol, 20)
+                others = self._initial_margin() - abs(amt) * price / self.leverage.get(symbol, 20)
+                if needed + others > self.wallet + self._unrealized():
+                    raise ApiError(-2019, "Margin is insufficient.")
+
+            position["amt"] = new_amt
+            position["entry"] = entry if new_amt else 0.0
+            self.wallet += realized - commission
+
+            order_id = self._id()
+            now = self.market.clock.now_ms()
+            qty = abs(signed)
+            order = {
+                "orderId": order_id, "symbol": symbol, "status": "FILLED", "clientOrderId": f"mock{order_id}",
+                "price": "0", "avgPrice": fmt(price), "origQty": fmt(qty), "executedQty": fmt(qty),
+                "cumQty": fmt(qty), "cumQuote": fmt(qty * price), "timeInForce": "GTC", "type": "MARKET",
+                "reduceOnly": reduce_only, "closePosition": False, "side": side, "positionSide": "BOTH",
+                "stopPrice": "0", "workingType": "CONTRACT_PRICE", "priceProtect": False,
+                "origType": "MARKET", "updateTime": now,
+            }
+            self.orders[order_id] = order
+            self.trades.append({
+                "buyer": side == "BUY", "commission": fmt(commission), "commissionAsset": "USDT",
+                "id": self._id(), "maker": False, "orderId": order_id, "price": fmt(price), "qty": fmt(qty),
+                "quoteQty": fmt(qty * price), "realizedPnl": fmt(realized), "side": side,
+                "positionSide": "BOTH", "symbol": symbol, "time": now,
+            })
+            return order
+
+    def futures_get_order(self, order_id):
+        with self.lock:
+            if order_id not in self.orders:
+                raise ApiError(-2013, "Order does not exist.")
+            return self.orders[order_id]
+
+    def user_trades(self, symbol=None, start_ms=None, end_ms=None, limit=500):
+        with self.lock:
+            trades = [t for t in self.trades
+                      if (symbol is None or t["symbol"] == symbol)
+                      and (start_ms is None or t["time"] >= start_ms)
+                      and (end_ms is None or t["time"] <= end_ms)]
+        return trades[-limit:]
+
+# ----------------------------------------------------------------------------
+# Rate limit
+# ----------------------------------------------------------------------------
+
+class WeightCounter:
+    """Request weight used in the current (real) minute."""
+
+    def __init__(self, limit=WEIGHT_LIMIT_1M):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.minute = int(time.time() // 60)
+        self.used = 0
+
+    def charge(self, weight):
+        """Count a request; raises a 429 ApiError once the budget is exhausted."""
+        with self.lock:
+            now = time.time()
+            if int(now // 60) != self.minute:
+                self.minute, self.used = int(now // 60), 0
+            if self.used + weight > self.limit:
+                retry_after = max(1, int((self.minute + 1) * 60 - now) + 1)
+                raise ApiError(-1003, "Too many requests; current limit is %d request weight per 1 MINUTE." % self.limit,
+                               status=429, headers={"Retry-After": str(retry_after),
+                                                    "X-MBX-USED-WEIGHT-1M": str(self.used)})
+            self.used += weight
+            return self.used
+
+# ----------------------------------------------------------------------------
+# REST endpoints
+# ----------------------------------------------------------------------------
+
+def exchange_info(market, symbols):
+    entries = []
+    for symbol in symbols:
+        base, quote = split_symbol(symbol)
+        entries.append({
+            "symbol": symbol, "status": "TRADING", "baseAsset": base, "quoteAsset": quote,
+            "baseAssetPrecision": 8, "quotePrecision": 8, "quoteAssetPrecision": 8,
+            "orderTypes": ["LIMIT", "MARKET"], "isMarginTradingAllowed": True,
+            "filters": [
+                {"filterType": "PRICE_FILTER", "minPrice": "0.00000001", "maxPrice": "1000000", "tickSize": "0.00000001"},
+                {"filterType": "LOT_SIZE", "minQty": "0.001", "maxQty": "9000000", "stepSize": "0.001"},
+                {"filterType": "NOTIONAL", "minNotional": "5"},
+            ],
+        })
+    return {"timezone": "UTC", "serverTime": market.clock.now_ms(),
+            "rateLimits": [{"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1,
+                            "limit": WEIGHT_LIMIT_1M}],
+            "symbols": entries}
+
+
+def required(params, name):
+    if name not in params:
+        raise ApiError(-1102, f"Mandatory parameter '{name}' was not sent, was empty/null, or malformed.")
+    return params[name]
+
+
+def handle_rest(server, method, area, endpoint, params):
+    """Dispatch one REST call; returns the JSON-able response body."""
+    market, accounts = server.market, server.accounts
+    symbol = params.get("symbol", "").upper() or None
+
+    # Market data, served under /api and /fapi alike
+    if endpoint == "ping":
+        return {}
+    if endpoint == "time":
+        return {"serverTime": market.clock.now_ms()}
+    if endpoint == "exchangeInfo":
+        symbols = [symbol] if symbol else sorted(set(market.symbols()) | server.seen_symbols)
+        return exchange_info(market, symbols)
+    if endpoint == "klines":
+        if params.get("interval", "1m") != "1m":
+            raise ApiError(-1120, "Invalid interval: only 1m klines are served.")
+        server.seen_symbols.add(required(params, "symbol").upper())
+        start = int(params["startTime"]) if "startTime" in params else None
+        end = int(params["endTime"]) if "endTime" in params else None
+        return market.klines(symbol, start, end, min(int(params.get("limit", 500)), 1000))
+    if endpoint == "ticker/price":
+        if symbol:
+            server.seen_symbols.add(symbol)
+            return {"symbol": symbol, "price": fmt(market.price(symbol)), "time": market.clock.now_ms()}
+        return [{"symbol": s, "price": fmt(market.price(s))} for s in sorted(set(market.symbols()) | server.seen_symbols)]
+
+    if area == "sapi":
+        if endpoint == "margin/account":
+            return accounts.margin_account()
+        if endpoint == "margin/maxBorrowable":
+            return accounts.max_borrowable(required(params, "asset"))
+        if endpoint in ("margin/loan", "margin/repay", "margin/borrow-repay") and method == "POST":
+            kind = params.get("type", "REPAY" if endpoint == "margin/repay" else "BORROW")
+            asset, amount = required(params, "asset"), float(required(params, "amount"))
+            return accounts.borrow(asset, amount) if kind == "BORROW" else accounts.repay(asset, amount)
+        if endpoint == "margin/order" and method == "POST":
+            server.seen_symbols.add(required(params, "symbol").upper())
+            quantity = float(params["quantity"]) if "quantity" in params else None
+            quote_quantity = float(params["quoteOrderQty"]) if "quoteOrderQty" in params else None
+            if quantity is None and quote_quantity is None:
+                required(params, "quantity")
+            return accounts.margin_order(symbol, required(params, "side"), quantity, quote_quantity)
+
+    if area == "fapi":
+        if endpoint == "leverage" and method == "POST":
+            return accounts.set_leverage(required(params, "symbol").upper(), int(required(params, "leverage")))
+        if endpoint == "balance":
+            return accounts.futures_balance()
+        if endpoint == "account":
+            return accounts.futures_account()
+        if endpoint == "positionRisk":
+            return [p for p in accounts.position_risk() if symbol is None or p["symbol"] == symbol]
+        if endpoint == "order" and method == "POST":
+            server.seen_symbols.add(required(params, "symbol").upper())
+            if params.get("type", "MARKET") != "MARKET":
+                raise ApiError(-1116, "Invalid orderType: only MARKET orders are filled.")
+            reduce_only = str(params.get("reduceOnly", "false")).lower() == "true"
+            return accounts.futures_order(symbol, required(params, "side"), float(required(params, "quantity")), reduce_only)
+        if endpoint == "order" and method == "GET":
+            return accounts.futures_get_order(int(required(params, "orderId")))
+        if endpoint == "userTrades":
+            start = int(params["startTime"]) if "startTime" in params else None
+            end = int(params["endTime"]) if "endTime" in params else None
+            return accounts.user_trades(symbol, start, end, int(params.get("limit", 500)))
+
+    raise ApiError(-1000, f"{method} /{area}/.../{endpoint} is not served by the mock.", status=404)
+
+# ----------------------------------------------------------------------------
+# WebSocket kline feed (RFC 6455, server side, text frames only)
+# ----------------------------------------------------------------------------
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def ws_frame(payload, opcode=0x1):
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 1 << 16:
+        header += bytes([126]) + struct.pack(">H", length)
+    else:
+        header += bytes([127]) + struct.pack(">Q", length)
+    return header + payload
+
+
+def ws_read_frame(rfile):
+    """(opcode, payload) of the next client frame, None when the socket closed."""
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None
+    opcode, length = head[0] & 0x0F, head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", rfile.read(8))[0]
+    mask = rfile.read(4) if head[1] & 0x80 else b"\0\0\0\0"
+    data = rfile.read(length)
+    return opcode, bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+
+
+def kline_event(symbol, kline, closed, event_ms):
+    """Binance kline event for one raw REST kline."""
+    return {
+        "e": "kline", "E": event_ms, "s": symbol,
+        "k": {"t": kline[0], "T": kline[6], "s": symbol, "i": "1m", "f": 0, "L": 0,
+              "o": kline[1], "c": kline[4], "h": kline[2], "l": kline[3], "v": kline[5],
+              "n": kline[8], "x": closed, "q": kline[7], "V": kline[9], "Q": kline[10], "B": "0"},
+    }
+
+
+def parse_streams(path):
+    """(symbols, combined) from /ws/<stream> or /stream?streams=a/b paths."""
+    url = urlparse(path)
+    if url.path.startswith("/stream"):
+        streams = parse_qs(url.query).get("streams", [""])[0].split("/")
+        combined = True
+    else:
+        streams = url.path[len("/ws/"):].split("/")
+        combined = False
+    symbols = [s.split("@")[0].upper() for s in streams if s.endswith("@kline_1m")]
+    return symbols, combined
+
+# ----------------------------------------------------------------------------
+# HTTP handler
+# ----------------------------------------------------------------------------
+
+REST_PATH = re.compile(r"^/(api|sapi|fapi)/v\d+/(.+)$")
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out as separate writes: without this, Nagle and
+        # delayed ACKs add ~40 ms to every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def delay(self):
+        server = self.server
+        if server.latency or server.jitter:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def handle_rest_request(self, method):
+        url = urlparse(self.path)
+        match = REST_PATH.match(url.path)
+        if not match:
+            return self.send_json(404, {"code": -1000, "msg": f"Unknown path {url.path}"})
+        area, endpoint = match.groups()
+
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length).decode()
+            params.update({k: v[-1] for k, v in parse_qs(body).items()})
+
+        self.delay()
+        try:
+            used = self.server.weights.charge(ENDPOINT_WEIGHTS.get(endpoint, 1))
+            headers = {"X-MBX-USED-WEIGHT-1M": str(used)}
+            if self.server.error_rate and random.random() < self.server.error_rate:
+                raise ApiError(-1001, "Internal error; unable to process your request. Please try again.", status=503)
+            body = handle_rest(self.server, method, area, endpoint, params)
+            self.send_json(200, body, headers)
+        except ApiError as e:
+            self.send_json(e.status, {"code": e.code, "msg": e.msg}, e.headers)
+        except (KeyError, ValueError) as e:
+            self.send_json(400, {"code": -1100, "msg": f"Illegal characters found in a parameter: {e}"})
+
+    def do_GET(self):
+        if self.headers.get("Upgrade", "").lower() == "websocket":
+            return self.handle_websocket()
+        self.handle_rest_request("GET")
+
+    def do_POST(self):
+        self.handle_rest_request("POST")
+
+    def do_DELETE(self):
+        self.handle_rest_request("DELETE")
+
+    def handle_websocket(self):
+        symbols, combined = parse_streams(self.path)
+        if not symbols:
+            return self.send_json(400, {"code": -1000, "msg": "Only <symbol>@kline_1m streams are served."})
+
+        accept = base64.b64encode(hashlib.sha1((self.headers["Sec-WebSocket-Key"] + WS_GUID).encode()).digest())
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept.decode())
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        closed = threading.Event()
+        send_lock = threading.Lock()
+
+        def send(payload, opcode=0x1):
+            with send_lock:
+                self.wfile.write(ws_frame(payload, opcode))
+                self.wfile.flush()
+
+        def reader():
+            # Answer pings, stop on close frames or a dropped connection
+            try:
+                while not closed.is_set():
+                    frame = ws_read_frame(self.rfile)
+                    if frame is None or frame[0] == 0x8:
+                        break
+                    if frame[0] == 0x9:
+                        send(frame[1], 0xA)
+            except OSError:
+                pass
+            closed.set()
+
+        threading.Thread(target=reader, daemon=True).start()
+        try:
+            self.stream_klines(symbols, combined, send, closed)
+        except OSError:
+            pass
+        closed.set()
+        try:
+            send(b"", 0x8)
+        except OSError:
+            pass
+
+    def stream_klines(self, symbols, combined, send, closed):
+        """Push closed klines as the mock clock reaches them (plus optional updates)."""
+        market, clock = self.server.market, self.server.clock
+        sent = {symbol: clock.now_ms() // MINUTE_MS * MINUTE_MS - MINUTE_MS for symbol in symbols}
+        tick = clock.real_seconds(MINUTE_MS) / (self.server.open_updates + 1)
+
+        def emit(symbol, kline, is_closed):
+            event = kline_event(symbol, kline, is_closed, clock.now_ms())
+            if combined:
+                event = {"stream": f"{symbol.lower()}@kline_1m", "data": event}
+            self.delay()
+            send(json.dumps(event, separators=(",", ":")).encode())
+
+        while not closed.is_set():
+            now_ms = clock.now_ms()
+            current_minute = now_ms // MINUTE_MS * MINUTE_MS
+            for symbol in symbols:
+                # Every minute closed since the last message (several if the clock is fast)
+                for kline in market.klines(symbol, sent[symbol] + MINUTE_MS, current_minute - MINUTE_MS, 1000):
+                    emit(symbol, kline, True)
+                    sent[symbol] = kline[0]
+                if self.server.open_updates:
+                    current = market.klines(symbol, current_minute, current_minute, 1)
+                    if current:
+                        emit(symbol, current[0], False)
+            closed.wait(min(tick, max(0.001, clock.real_seconds(current_minute + MINUTE_MS - now_ms))))
+
+# ----------------------------------------------------------------------------
+# Server setup
+# ----------------------------------------------------------------------------
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(host="127.0.0.1", port=0, recordings=None, symbols=(), replay_minutes=1440, speed=1.0,
+                open_updates=0, latency=0.0, jitter=0.0, weight_limit=WEIGHT_LIMIT_1M, error_rate=0.0,
+                margin_balances=None, futures_balance=10000.0, verbose=False):
+    """
+    Build (but do not start) a mock server; run server.serve_forever() in a
+    thread and use server.base_url() as "rest_base_url"/"ws_base_url".
+    """
+    server = MockServer((host, port), MockHandler)
+    server.clock = MockClock(speed)
+    server.market = MarketData(server.clock, recordings, replay_minutes)
+    server.accounts = Accounts(server.market, margin_balances or {"USDT": 10000.0, "USDC": 10000.0}, futures_balance)
+    server.weights = WeightCounter(weight_limit)
+    server.seen_symbols = {symbol.upper() for symbol in symbols}
+    server.open_updates = open_updates
+    server.latency, server.jitter, server.error_rate = latency, jitter, error_rate
+    server.verbose = verbose
+    server.base_url = lambda scheme="http": f"{scheme}://{host}:{server.server_address[1]}"
+    return server
+
+
+def start_server(**kwargs):
+    """make_server() serving from a daemon thread; call server.shutdown() to stop."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def spawn_server(*cli_args, host="127.0.0.1", timeout=10.0):
+    """
+    Run the stand-in in its own process (so it does not compete with the code
+    under test for the GIL). cli_args are passed on, e.g. "--latency", "0.05".
+    Returns (process, base_url); terminate the process when done.
+    """
+    with socket.socket() as probe:
+        probe.bind((host, 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen([sys.executable, __file__, "--host", host, "--port", str(port), *cli_args],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://{host}:{port}"
+    deadline = time.time() + timeout
+    while True:
+        try:
+            urlopen(f"{base_url}/api/v3/ping", timeout=1).read()
+            return process, base_url
+        except OSError:
+            if process.poll() is not None or time.time() > deadline:
+                process.kill()
+                raise RuntimeError(f"Binance stand-in did not start on {base_url}")
+            time.sleep(0.05)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    recordings = {}
+    for item in args.data:
+        symbol, path = item.split("=", 1)
+        recordings[symbol.upper()] = load_recording(path)
+        print(f"Loaded {len(recordings[symbol.upper()]['Timestamp'])} klines for {symbol.upper()} from {path}")
+    balances = {asset.upper(): float(amount) for asset, amount in (b.split("=", 1) for b in args.balance)}
+
+    symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
+    server = make_server(args.host, args.port, recordings, symbols, args.replay_minutes, args.speed, args.open_updates,
+                         args.latency, args.jitter, args.weight_limit, args.error_rate, balances,
+                         args.futures_balance, verbose=True)
+    for symbol in server.market.symbols():
+        end = server.market.replay_end_ms(symbol)
+        print(f"{symbol}: replaying until {time.strftime('%Y-%m-%d %H:%M', time.gmtime(end / 1000))} UTC (mock clock)")
+    print(f"Binance stand-in listening on {server.base_url()} (WebSocket {server.base_url('ws')})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -4,6 +4,12 @@ from datetime import datetime, timezone
 from binance.client import Client
 from tqdm import tqdm
 import time
+import sys
+from pathlib import Path
+
+# Shared helpers live next to the compute scripts in src/dist
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "dist"))
+from binance_urls import make_client
 
 ORDER_TYPE_MARKET = "MARKET"
 
@@ -24,7 +30,7 @@ with open(config_file, "r") as json_file:
     api_secret = config.get("secret") 
 
 # Initialize Binance Futures Testnet Client
-client = Client(api_key, api_secret, testnet=True)
+client = make_client(config, api_key, api_secret, testnet=True)
 
 def get_open_positions():
     """
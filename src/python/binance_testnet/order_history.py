@@ -1,9 +1,14 @@
 import os
 import json5
 from datetime import datetime, timezone
-from binance.client import Client
 from tqdm import tqdm
 from collections import defaultdict
+import sys
+from pathlib import Path
+
+# Shared helpers live next to the compute scripts in src/dist
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "dist"))
+from binance_urls import make_client
 
 # Define paths
 config_file = "../../dist/apikey-crypto.json"
@@ -21,7 +26,7 @@ with open(config_file, "r") as json_file:
     api_secret = config.get("secret")  
 
 # Initialize Binance Client (for Testnet)
-client = Client(api_key, api_secret, testnet=True)
+client = make_client(config, api_key, api_secret, testnet=True)
 
 # Convert dates to timestamps (handle full datetime format)
 start_timestamp = int(datetime.strptime(start_date_str, "%Y-%m-%d %H:%M:%S")
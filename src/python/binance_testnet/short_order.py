@@ -4,6 +4,12 @@ from datetime import datetime, timezone
 from binance.client import Client
 from tqdm import tqdm
 from collections import defaultdict
+import sys
+from pathlib import Path
+
+# Shared helpers live next to the compute scripts in src/dist
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "dist"))
+from binance_urls import make_client
 
 # Define paths
 # relative to the path of execute_orders_testnet.py
@@ -24,7 +30,7 @@ with open(config_file, "r") as json_file:
     api_secret = config.get("secret")
 
 # Initialize Binance client for Testnet
-client = Client(api_key, api_secret, testnet=True)
+client = make_client(config, api_key, api_secret, testnet=True)
 
 # Ensure margin (leverage) is enabled
 try:
@@ -94,8 +94,14 @@ function plotData(logarithmic = false) {
         });
     }
 
+    // Bar size of the price trace: ?tf=5m|15m|1h|1d loads the pre-aggregated
+    // asset_<tf>.txt written by compute_asset.py instead of every bar of asset.txt
+    const timeframe = getQueryParam('tf');
+    const timeframeSeconds = { '5m': 300, '15m': 900, '1h': 3600, '1d': 86400 }[timeframe];
+    const assetFile = timeframeSeconds ? `./output/asset_${timeframe}.txt?` : './output/asset.txt?';
+
     // Parse asset data
-    const parseAsset = parseCSV('./output/asset.txt?' + Math.random(), (data) => {
+    const parseAsset = parseCSV(assetFile + Math.random(), (data) => {
         data.forEach(row => {
             if (row.length < 2) return;
             const [timestamp, value] = row;
@@ -210,8 +216,10 @@ function plotData(logarithmic = false) {
     function matchTradesToAsset() {
         rawTrades.forEach(trade => {
             const { timestamp, action, reason } = trade;
-            // Find matching timestamp in asset data
-            const idx = timestampsAsset.indexOf(timestamp);
+            // Find matching timestamp in asset data (the bar holding the trade
+            // when a coarser timeframe is shown)
+            const barTimestamp = timeframeSeconds ? timestamp - (timestamp % timeframeSeconds) : timestamp;
+            const idx = timestampsAsset.indexOf(barTimestamp);
             if (idx !== -1) {
                 const value = valuesAsset[idx];
                 if (action === 'buy') {